@@ -1,3 +1,305 @@
-from django.test import TestCase
+#file: core/tests.py
+# Az API végpontok tesztjei (kérés-ellenőrzés, szűrők, jogosultság).
 
-# Create your tests here.
+import json
+import time
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.views.rag_views import MAX_BATCH_QUERIES, MAX_BATCH_TOP_K
+from knowledge.models import KnowledgeItem
+from services.rag.scatter_gather import (
+    NODE_SEARCH_PATH,
+    NODE_TOKEN_HEADER,
+    decode_query_vector,
+    encode_query_vector,
+    parse_chunk_range,
+    scatter_search,
+)
+from services.rag.vector_index import VectorIndex
+
+
+# -------------------------------------------------------------------------
+# Batch RAG végpont – szűrők és korlátok
+# -------------------------------------------------------------------------
+class RagBatchViewTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch("core.views.rag_views.RAGService")
+        self.rag_service = patcher.start().return_value
+        self.rag_service.search_many.return_value = [[]]
+        self.addCleanup(patcher.stop)
+
+    def post(self, payload):
+        return self.client.post(
+            reverse("api_rag_batch"), data=json.dumps(payload), content_type="application/json"
+        )
+
+    def test_allowed_filters_are_passed_with_forced_is_active(self):
+        response = self.post({"queries": ["víz"], "filters": {"category_ids": [1, 2], "item_ids": None}})
+
+        self.assertEqual(response.status_code, 200)
+        filters = self.rag_service.search_many.call_args.kwargs["filters"]
+        self.assertEqual(filters, {"is_active": True, "category_ids": [1, 2]})
+
+    def test_missing_filters_still_restrict_to_active_items(self):
+        self.post({"queries": ["víz"]})
+
+        filters = self.rag_service.search_many.call_args.kwargs["filters"]
+        self.assertEqual(filters, {"is_active": True})
+
+    def test_rejected_filters(self):
+        for filters in (
+            {"is_active": None},
+            {"is_active": False},
+            {"unknown": [1]},
+            {"item_ids": "1,2"},
+            {"item_ids": [1, "2"]},
+            {"exclude_item_ids": [True]},
+            ["item_ids"],
+        ):
+            with self.subTest(filters=filters):
+                response = self.post({"queries": ["víz"], "filters": filters})
+                self.assertEqual(response.status_code, 400)
+
+        self.rag_service.search_many.assert_not_called()
+
+    def test_top_k_is_capped(self):
+        for top_k in (0, MAX_BATCH_TOP_K + 1, "sok"):
+            with self.subTest(top_k=top_k):
+                response = self.post({"queries": ["víz"], "top_k": top_k})
+                self.assertEqual(response.status_code, 400)
+
+        response = self.post({"queries": ["víz"], "top_k": MAX_BATCH_TOP_K})
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_threshold_and_queries_are_rejected(self):
+        for payload in (
+            {"queries": ["víz"], "threshold": "abc"},
+            {"queries": ["víz"], "threshold": [0.5]},
+            {"queries": ["víz", 42]},
+            {"queries": [["víz"]]},
+            {"queries": ["víz", None]},
+        ):
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+
+        self.rag_service.search_many.assert_not_called()
+
+
+# -------------------------------------------------------------------------
+# Belső keresőnódus végpont – token és szűrők
+# -------------------------------------------------------------------------
+NODE_RAG_SETTINGS = {"node_token": "titok"}
+
+
+class RagNodeSearchViewTests(TestCase):
+
+    def setUp(self):
+        index = VectorIndex(np.array([11, 12, 13]), np.eye(3, dtype=np.float32))
+        index.item_ids = np.array([1, 2, 3])
+        index.active_flags = np.array([True, True, False])
+
+        patcher = mock.patch("core.views.rag_views.get_vector_index", return_value=index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, payload, token=None):
+        headers = {"HTTP_" + NODE_TOKEN_HEADER.upper().replace("-", "_"): token} if token else {}
+        return self.client.post(
+            reverse("api_rag_node_search"), data=json.dumps(payload),
+            content_type="application/json", **headers
+        )
+
+    def payload(self, **extra):
+        return {"vectors": [encode_query_vector([0.0, 0.0, 1.0])], "top_k": 3, **extra}
+
+    @override_settings(RAG_SETTINGS={"node_token": ""})
+    def test_endpoint_is_closed_without_configured_token(self):
+        self.assertEqual(self.post(self.payload()).status_code, 403)
+        self.assertEqual(self.post(self.payload(), token="").status_code, 403)
+
+    @override_settings(RAG_SETTINGS=NODE_RAG_SETTINGS)
+    def test_token_is_required(self):
+        self.assertEqual(self.post(self.payload()).status_code, 403)
+        self.assertEqual(self.post(self.payload(), token="rossz").status_code, 403)
+
+    @override_settings(RAG_SETTINGS=NODE_RAG_SETTINGS)
+    def test_search_only_returns_active_items(self):
+        response = self.post(self.payload(), token="titok")
+
+        self.assertEqual(response.status_code, 200)
+        chunk_ids = [cid for cid, _ in response.json()["results"][0]]
+        self.assertEqual(sorted(chunk_ids), [11, 12])
+
+    @override_settings(RAG_SETTINGS=NODE_RAG_SETTINGS)
+    def test_filters_are_whitelisted(self):
+        response = self.post(self.payload(filters={"item_ids": [1]}), token="titok")
+        self.assertEqual([cid for cid, _ in response.json()["results"][0]], [11])
+
+        for filters in ({"is_active": False}, {"is_active": None}, {"foo": [1]}, {"item_ids": ["1"]}):
+            with self.subTest(filters=filters):
+                response = self.post(self.payload(filters=filters), token="titok")
+                self.assertEqual(response.status_code, 400)
+
+    @override_settings(RAG_SETTINGS=NODE_RAG_SETTINGS)
+    def test_top_k_and_vector_count_are_capped(self):
+        vector = encode_query_vector([0.0, 0.0, 1.0])
+        for payload in (
+            self.payload(top_k=0),
+            self.payload(top_k=-1),
+            self.payload(top_k=MAX_BATCH_TOP_K + 1),
+            {"vectors": [vector] * (MAX_BATCH_QUERIES + 1), "top_k": 3},
+            {"vectors": vector, "top_k": 3},
+        ):
+            with self.subTest(top_k=payload["top_k"], vectors=len(payload["vectors"])):
+                self.assertEqual(self.post(payload, token="titok").status_code, 400)
+
+        response = self.post({"vectors": [vector] * MAX_BATCH_QUERIES, "top_k": MAX_BATCH_TOP_K}, token="titok")
+        self.assertEqual(response.status_code, 200)
+
+
+# -------------------------------------------------------------------------
+# Batch RAG végpont – kérések
+# -------------------------------------------------------------------------
+class RagBatchRequestTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch("core.views.rag_views.RAGService")
+        self.rag_service = patcher.start().return_value
+        self.rag_service.search_many.return_value = [[], []]
+        self.addCleanup(patcher.stop)
+
+    def post(self, payload):
+        return self.client.post(
+            reverse("api_rag_batch"), data=json.dumps(payload), content_type="application/json"
+        )
+
+    def test_all_queries_are_searched_in_one_call(self):
+        response = self.post({"queries": [" víz ", "áram"], "top_k": 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.rag_service.search_many.assert_called_once()
+        self.assertEqual(self.rag_service.search_many.call_args.kwargs["queries"], ["víz", "áram"])
+        self.assertEqual([r["query"] for r in response.json()["results"]], ["víz", "áram"])
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.client.get(reverse("api_rag_batch")).status_code, 405)
+        self.assertEqual(self.post({"queries": []}).status_code, 400)
+        self.assertEqual(self.post({"queries": ["víz"] * (MAX_BATCH_QUERIES + 1)}).status_code, 400)
+
+        self.rag_service.search_many.assert_not_called()
+
+
+# -------------------------------------------------------------------------
+# Scatter-gather – query kódolás, chunk-tartomány
+# -------------------------------------------------------------------------
+class ScatterGatherTests(TestCase):
+
+    def test_query_vectors_travel_as_base64_float32(self):
+        vector = np.array([0.25, -1.5, 3.0])
+        self.assertEqual(decode_query_vector(encode_query_vector(vector)).tolist(), vector.tolist())
+        self.assertIsNone(encode_query_vector(None))
+        self.assertIsNone(decode_query_vector(None))
+
+    def test_chunk_range_bounds_are_optional(self):
+        self.assertEqual(parse_chunk_range("100-200"), (100, 200))
+        self.assertEqual(parse_chunk_range("5000-"), (5000, None))
+        self.assertEqual(parse_chunk_range("-5000"), (None, 5000))
+        self.assertEqual(parse_chunk_range(""), (None, None))
+
+
+# -------------------------------------------------------------------------
+# Scatter-gather koordinátor – csonkolt nódus-transzporttal
+# -------------------------------------------------------------------------
+class FakeResponse:
+
+    def __init__(self, results):
+        self.results = results
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"status": "ok", "results": self.results}
+
+
+class FakeNodeSession:
+    """requests.Session helyett: nódus URL → kezelőfüggvény(payload, headers)."""
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.requests = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        node = url[:-len(NODE_SEARCH_PATH)]
+        self.requests.append((node, json, headers))
+        return FakeResponse(self.handlers[node](json, headers))
+
+
+@override_settings(RAG_SETTINGS={"node_token": "titok", "node_timeout": 0.5})
+class ScatterSearchTests(TestCase):
+
+    def scatter(self, handlers, **kwargs):
+        session = FakeNodeSession(handlers)
+        with mock.patch("services.rag.scatter_gather._get_session", return_value=session):
+            results, failed = scatter_search(nodes=list(handlers), **kwargs)
+        return results, failed, session
+
+    def test_results_are_merged_by_best_score(self):
+        handlers = {
+            "http://a": lambda payload, headers: [[[1, 0.9], [2, 0.5]], []],
+            "http://b": lambda payload, headers: [[[2, 0.7], [3, 0.6]], [[4, 0.2]]],
+        }
+        results, failed, session = self.scatter(
+            handlers, query_vectors=[[1.0, 0.0], [0.0, 1.0]], top_k=2,
+            filters={"is_active": True, "item_ids": [5]},
+        )
+
+        self.assertEqual(failed, [])
+        self.assertEqual(results, [[(1, 0.9), (2, 0.7)], [(4, 0.2)]])
+
+        # A nódus a tokent és a (is_active nélküli) szűrőket kapja
+        for _node, payload, headers in session.requests:
+            self.assertEqual(headers[NODE_TOKEN_HEADER], "titok")
+            self.assertEqual(payload["filters"], {"item_ids": [5]})
+            self.assertEqual(decode_query_vector(payload["vectors"][0]).tolist(), [1.0, 0.0])
+
+    def test_failed_and_slow_nodes_are_reported(self):
+        def broken(payload, headers):
+            raise ConnectionError("nódus leállt")
+
+        def slow(payload, headers):
+            time.sleep(1.0)
+            return [[[9, 0.99]]]
+
+        handlers = {
+            "http://ok": lambda payload, headers: [[[1, 0.4]]],
+            "http://broken": broken,
+            "http://slow": slow,
+        }
+        results, failed, _session = self.scatter(handlers, query_vectors=[[1.0, 0.0]], top_k=3)
+
+        self.assertEqual(results, [[(1, 0.4)]])
+        self.assertEqual(sorted(failed), ["http://broken", "http://slow"])
+
+
+# -------------------------------------------------------------------------
+# Kapcsolódó tudáselemek végpont
+# -------------------------------------------------------------------------
+class RelatedItemsViewTests(TestCase):
+
+    def test_unknown_item_and_bad_limit(self):
+        item = KnowledgeItem.objects.create(title="Elem", content="")
+
+        self.assertEqual(self.client.get(reverse("api_related_items", args=[item.id + 1])).status_code, 404)
+        response = self.client.get(reverse("api_related_items", args=[item.id]), {"limit": "sok"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse("api_related_items", args=[item.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["related"], [])
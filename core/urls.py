@@ -1,5 +1,5 @@
 #file: core/urls.py
-# Fő URL konfiguráció: AI, RAG
+# Fő URL konfiguráció: AI, RAG, tudásbázis
 
 from django.urls import path
 from core.views import (
@@ -12,6 +12,11 @@ from core.views import (
     # RAG
     rag_test_view,
     rag_view,
+    rag_batch_view,
+    rag_node_search_view,
+
+    # Tudásbázis
+    related_items_view,
 )
 
 urlpatterns = [
@@ -27,5 +32,10 @@ urlpatterns = [
     # API végpontok
     path("api/chat", chat_view, name="api_chat"),
     path("api/rag", rag_view, name="api_rag"),
+    path("api/rag/batch", rag_batch_view, name="api_rag_batch"),
+    path("api/knowledge/<int:item_id>/related", related_items_view, name="api_related_items"),
+
+    # Belső keresőnódus végpont (sharded topológia)
+    path("api/rag/node/search", rag_node_search_view, name="api_rag_node_search"),
 
 ]
@@ -2,7 +2,8 @@
 
 from .base_views import index_view
 from .ai_views import ai_test_view, chat_view
-from .rag_views import rag_test_view, rag_view
+from .rag_views import rag_test_view, rag_view, rag_batch_view, rag_node_search_view
+from .knowledge_views import related_items_view
 
 __all__ = [
     "index_view",
@@ -10,4 +11,7 @@ __all__ = [
     "chat_view",
     "rag_test_view",
     "rag_view",
+    "rag_batch_view",
+    "rag_node_search_view",
+    "related_items_view",
 ]
@@ -0,0 +1,40 @@
+#file: core/views/knowledge_views.py
+# Tudásbázis API végpontok: kapcsolódó tudáselemek.
+
+from django.http import JsonResponse
+
+from knowledge.models import KnowledgeItem
+from services.rag.related_items import get_related_items
+
+
+def related_items_view(request, item_id):
+    """
+    Egy tudáselemhez legközelebb álló tudáselemek (előre kiszámolt kNN gráfból).
+    Opcionális ?limit= paraméter.
+    """
+
+    if request.method != "GET":
+        return JsonResponse(
+            {"status": "error", "message": "GET kérés szükséges."},
+            status=405
+        )
+
+    if not KnowledgeItem.objects.filter(pk=item_id).exists():
+        return JsonResponse(
+            {"status": "error", "message": "A tudáselem nem található."},
+            status=404
+        )
+
+    try:
+        limit = int(request.GET.get("limit", 0))
+    except ValueError:
+        return JsonResponse(
+            {"status": "error", "message": "A limit egész szám kell legyen."},
+            status=400
+        )
+
+    return JsonResponse({
+        "status": "ok",
+        "item_id": item_id,
+        "related": get_related_items(item_id, limit=max(limit, 0)),
+    })
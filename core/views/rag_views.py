@@ -1,14 +1,18 @@
 #file: core/views/rag_views.py
 # RAG teszt UI + RAG keresési API végpont.
 
+import hmac
 import json
 import markdown
+from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
 
 from services.rag.rag_service import RAGService
+from services.rag.scatter_gather import NODE_TOKEN_HEADER, decode_query_vector
+from services.rag.vector_index import get_vector_index
 from services.rag.prompt_builder import build_prompt
 from services.rag.category_detector import CategoryDetector   # <-- HELYES!
 from services.ai_provider import get_ai_client
@@ -37,6 +41,7 @@ def rag_view(request):
         llm = body.get("llm", "openai")
         top_k = int(body.get("top_k", 5))
         threshold = float(body.get("threshold", 0.35))
+        diversify = body.get("diversify")
 
         if not query:
             return JsonResponse(
@@ -48,7 +53,11 @@ def rag_view(request):
         # 1) Kategória felismerés LLM segítségével
         # ---------------------------------------------------------------------
         detector = CategoryDetector(llm_provider=llm)
-        detected_category = detector.detect_category(query)
+        detected_category, category_confidence = detector.detect_category_with_confidence(query)
+
+        # Csak elég biztos felismerés esetén szűkítjük a keresést a kategória shardjára
+        min_confidence = settings.RAG_SETTINGS.get("category_min_confidence", 0.5)
+        search_category = detected_category if category_confidence >= min_confidence else None
 
         # ---------------------------------------------------------------------
         # 2) SMART Classic Search
@@ -98,13 +107,17 @@ def rag_view(request):
         ]
 
         # ---------------------------------------------------------------------
-        # 3) Embedding keresés (változatlan)
+        # 3) Embedding keresés – a felismert kategória shardjában,
+        #    szükség esetén visszaesés a teljes indexre
         # ---------------------------------------------------------------------
         rag = RAGService()
         embedding_hits = rag.search(
             query=query,
             top_k=top_k,
-            threshold=threshold
+            threshold=threshold,
+            category_name=search_category,
+            fallback_to_global=True,
+            diversify=diversify,
         )
 
         embedding_results = [
@@ -146,6 +159,8 @@ def rag_view(request):
         return JsonResponse({
             "status": "ok",
             "detected_category": detected_category,
+            "category_confidence": category_confidence,
+            "search_scope": rag.last_search_scope,
             "classic_results": classic_results,
             "embedding_results": embedding_results,
             "final_answer": final_answer,
@@ -156,3 +171,234 @@ def rag_view(request):
             {"status": "error", "message": str(e)},
             status=500
         )
+
+
+# Egy batch kérésben legfeljebb ennyi kérdés engedélyezett
+MAX_BATCH_QUERIES = 100
+
+# Kérdésenként legfeljebb ennyi találat kérhető
+MAX_BATCH_TOP_K = 50
+
+# A kliens által küldhető metaadat-szűrők (mind egész számok listája).
+# Az is_active szűrőt mindig a szerver állítja: inaktív tudáselem nem kerülhet ki.
+ALLOWED_FILTER_KEYS = ("item_ids", "category_ids", "exclude_item_ids")
+
+
+def _parse_search_filters(raw) -> dict:
+    """
+    A kérés "filters" mezőjének ellenőrzése.
+    Csak az ALLOWED_FILTER_KEYS kulcsok engedélyezettek, egész számok listájával;
+    az eredményben mindig is_active=True szerepel.
+
+    Kivétel:
+        ValueError – ismeretlen kulcs vagy hibás érték (400-as válasz)
+    """
+    filters = {"is_active": True}
+    if raw is None:
+        return filters
+
+    if not isinstance(raw, dict):
+        raise ValueError("A 'filters' mezőnek objektumnak kell lennie.")
+
+    unknown = sorted(set(raw) - set(ALLOWED_FILTER_KEYS))
+    if unknown:
+        raise ValueError(f"Ismeretlen szűrő: {', '.join(unknown)}.")
+
+    for key, value in raw.items():
+        if value is None:
+            continue
+        if not isinstance(value, list) or not all(
+            isinstance(v, int) and not isinstance(v, bool) for v in value
+        ):
+            raise ValueError(f"A '{key}' szűrő értéke egész számok listája kell legyen.")
+        filters[key] = value
+
+    return filters
+
+
+@csrf_exempt
+def rag_batch_view(request):
+    """
+    Batch RAG keresési API végpont – sok kérdés egyetlen kérésben.
+    Csak embedding keresés (nincs kategóriadetektálás és LLM válasz).
+
+    Kérés:
+        {"queries": ["...", "..."], "top_k": 5, "threshold": 0.35,
+         "filters": {"category_ids": [...], "item_ids": [...], "exclude_item_ids": [...]}}
+    """
+
+    if request.method != "POST":
+        return JsonResponse(
+            {"status": "error", "message": "POST kérés szükséges."},
+            status=405
+        )
+
+    try:
+        body = json.loads(request.body)
+
+        queries = body.get("queries") or []
+
+        try:
+            threshold = float(body.get("threshold", 0.35))
+            top_k = int(body.get("top_k", 5))
+            filters = _parse_search_filters(body.get("filters"))
+        except (TypeError, ValueError) as e:
+            return JsonResponse(
+                {"status": "error", "message": str(e)},
+                status=400
+            )
+
+        if not 1 <= top_k <= MAX_BATCH_TOP_K:
+            return JsonResponse(
+                {"status": "error", "message": f"A 'top_k' értéke 1 és {MAX_BATCH_TOP_K} között lehet."},
+                status=400
+            )
+
+        if not isinstance(queries, list) or not queries:
+            return JsonResponse(
+                {"status": "error", "message": "A 'queries' mező kötelező (nem üres lista)."},
+                status=400
+            )
+
+        if len(queries) > MAX_BATCH_QUERIES:
+            return JsonResponse(
+                {"status": "error", "message": f"Legfeljebb {MAX_BATCH_QUERIES} kérdés küldhető egyszerre."},
+                status=400
+            )
+
+        if not all(isinstance(q, str) for q in queries):
+            return JsonResponse(
+                {"status": "error", "message": "A 'queries' lista elemei csak szövegek lehetnek."},
+                status=400
+            )
+
+        queries = [q.strip() for q in queries]
+
+        rag = RAGService()
+        all_hits = rag.search_many(
+            queries=queries,
+            top_k=top_k,
+            threshold=threshold,
+            filters=filters,
+        )
+
+        results = [
+            {
+                "query": query,
+                "embedding_results": [
+                    {
+                        "chunk_id": chunk.id,
+                        "item_id": chunk.item_id,
+                        "title": chunk.item_title,
+                        "chunk": chunk.content,
+                        "score": score,
+                        "is_above": score >= threshold
+                    }
+                    for chunk, score in hits
+                ],
+            }
+            for query, hits in zip(queries, all_hits)
+        ]
+
+        return JsonResponse({
+            "status": "ok",
+            "results": results,
+        })
+
+    except Exception as e:
+        return JsonResponse(
+            {"status": "error", "message": str(e)},
+            status=500
+        )
+
+
+@csrf_exempt
+def rag_node_search_view(request):
+    """
+    Belső keresőnódus végpont (sharded topológia) – a koordinátor hívja.
+    A nódus csak a saját tulajdonrészében keres, chunk-id + pontszám párokat ad vissza.
+    Csak beállított RAG_SETTINGS["node_token"] mellett érhető el (különben 403);
+    a szűrőkre, a top_k-ra és a query-k számára ugyanaz az ellenőrzés
+    vonatkozik, mint a batch végpontnál.
+
+    Kérés:
+        {"vectors": ["<base64 float32>", ...], "top_k": 5,
+         "category_name": null, "filters": {...}}
+    """
+
+    if request.method != "POST":
+        return JsonResponse(
+            {"status": "error", "message": "POST kérés szükséges."},
+            status=405
+        )
+
+    # Token nélkül a folyamat nincs keresőnódusnak beállítva – a végpont zárva
+    token = settings.RAG_SETTINGS.get("node_token")
+    if not token:
+        return JsonResponse(
+            {"status": "error", "message": "A keresőnódus végpont nincs engedélyezve (RAG_NODE_TOKEN)."},
+            status=403
+        )
+
+    received = request.headers.get(NODE_TOKEN_HEADER, "")
+    if not hmac.compare_digest(received.encode("utf-8"), token.encode("utf-8")):
+        return JsonResponse(
+            {"status": "error", "message": "Érvénytelen nódus token."},
+            status=403
+        )
+
+    try:
+        body = json.loads(request.body)
+
+        try:
+            top_k = int(body.get("top_k", 5))
+            filters = _parse_search_filters(body.get("filters"))
+        except (TypeError, ValueError) as e:
+            return JsonResponse(
+                {"status": "error", "message": str(e)},
+                status=400
+            )
+
+        if not 1 <= top_k <= MAX_BATCH_TOP_K:
+            return JsonResponse(
+                {"status": "error", "message": f"A 'top_k' értéke 1 és {MAX_BATCH_TOP_K} között lehet."},
+                status=400
+            )
+
+        raw_vectors = body.get("vectors") or []
+        if not isinstance(raw_vectors, list) or len(raw_vectors) > MAX_BATCH_QUERIES:
+            return JsonResponse(
+                {"status": "error", "message": f"A 'vectors' lista legfeljebb {MAX_BATCH_QUERIES} elemű lehet."},
+                status=400
+            )
+
+        vectors = [decode_query_vector(v) for v in raw_vectors]
+        category_name = body.get("category_name")
+
+        index = get_vector_index()
+        mask = index.filter_mask(**filters)
+
+        rows = None
+        if category_name:
+            rows = index.shard_rows(category_name)
+
+        if category_name and rows is None:
+            results = [[] for _ in vectors]
+        elif rows is None:
+            results = index.search_many(vectors, top_k=top_k, mask=mask)
+        else:
+            results = [
+                index.search(v, top_k=top_k, mask=mask, rows=rows) if v is not None else []
+                for v in vectors
+            ]
+
+        return JsonResponse({
+            "status": "ok",
+            "results": results,
+        })
+
+    except Exception as e:
+        return JsonResponse(
+            {"status": "error", "message": str(e)},
+            status=500
+        )
@@ -9,7 +9,10 @@ from .models import (
     KnowledgeChunk,
     KnowledgeEmbedding,
     KnowledgeSettings,
+    QueryEmbeddingCacheEntry,
 )
+from services.ai_provider import get_embedding_model_name
+from services.ingestion.pipeline import remove_chunks_from_index
 
 # -------------------------------------------------------------------------
 # Kategória admin
@@ -76,19 +79,67 @@ class KnowledgeChunkAdmin(admin.ModelAdmin):
 
     short_preview.short_description = "Tartalom előnézet"
 
+    # A törölt chunkok a keresőbackendből is kikerülnek (egy hívással, commit után)
+    def delete_model(self, request, obj):
+        chunk_id = obj.id
+        super().delete_model(request, obj)
+        remove_chunks_from_index([chunk_id])
+
+    def delete_queryset(self, request, queryset):
+        chunk_ids = list(queryset.values_list("id", flat=True))
+        super().delete_queryset(request, queryset)
+        remove_chunks_from_index(chunk_ids)
+
 
 # -------------------------------------------------------------------------
 # EMBEDDING admin – csak megtekintés
 # -------------------------------------------------------------------------
 @admin.register(KnowledgeEmbedding)
 class KnowledgeEmbeddingAdmin(admin.ModelAdmin):
-    list_display = ("chunk", "model_name", "created_at")
-    readonly_fields = ("chunk", "model_name", "vector", "created_at")
+    list_display = ("chunk", "model_name", "dtype", "dimensions", "created_at")
+    readonly_fields = ("chunk", "model_name", "dtype", "dimensions", "short_dimensions", "vector_preview", "created_at")
+    exclude = ("vector",)
     ordering = ("-created_at",)
 
+    def vector_preview(self, obj):
+        values = obj.get_vector()[:8]
+        return "[" + ", ".join(f"{v:.4f}" for v in values) + ", ...]"
+
+    vector_preview.short_description = "Vektor előnézet"
+
     def has_add_permission(self, request):
         return False  # csak automatikus generálás támogatott
 
+    # Csak az aktív modell vektorai vannak a keresőben; a többi törlése nem érinti
+    def delete_model(self, request, obj):
+        active = obj.model_name == get_embedding_model_name()
+        super().delete_model(request, obj)
+        if active:
+            remove_chunks_from_index([obj.chunk_id])
+
+    def delete_queryset(self, request, queryset):
+        chunk_ids = list(
+            queryset.filter(model_name=get_embedding_model_name()).values_list("chunk_id", flat=True)
+        )
+        super().delete_queryset(request, queryset)
+        remove_chunks_from_index(chunk_ids)
+
+
+# -------------------------------------------------------------------------
+# QUERY CACHE admin – gyakori kérdések, csak megtekintés
+# -------------------------------------------------------------------------
+@admin.register(QueryEmbeddingCacheEntry)
+class QueryEmbeddingCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("query_text", "model_name", "hit_count", "last_used_at", "created_at")
+    list_filter = ("model_name",)
+    search_fields = ("query_text",)
+    readonly_fields = ("model_name", "query_hash", "query_text", "dimensions", "hit_count", "last_used_at", "created_at")
+    exclude = ("vector",)
+    ordering = ("-hit_count",)
+
+    def has_add_permission(self, request):
+        return False  # a RAG keresés tölti fel
+
 
 # -------------------------------------------------------------------------
 # Tudásbázis beállítások admin – SINGLETON
@@ -0,0 +1,218 @@
+# Hiányzó chunk-embeddingek pótlása (modellcsere vagy adatbázis-visszaállítás után).
+# A be nem ágyazott chunkokat batchekben, párhuzamos provider hívásokkal ágyazza be,
+# a beállított kérés/token kereten belül. Megszakítás után ugyanott folytatja
+# (checkpoint fájl), és kiírja az átviteli sebességet és a becsült hátralévő időt.
+# Modellváltás: a (még nem aktív) új modell vektorai a régiek mellé készülnek,
+# a keresés közben a régi modellel fut; a váltás a teljes backfill után, --activate-tel.
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.ai_provider import get_embedding_client, get_embedding_model_name
+from services.clients.local_embedding_client import LocalEmbeddingClient
+from services.embedding.local_embedding import install_local_embedding_model
+from services.embedding.rate_limit import RateBudget
+from services.ingestion.backfill import (
+    DEFAULT_WORKERS,
+    EmbeddingBackfill,
+    activate_embedding_model,
+    clear_checkpoint,
+    get_checkpoint_path,
+    load_checkpoint,
+    unembedded_chunks,
+)
+from services.rag.related_items import build_related_graph
+from services.rag.retrieval_provider import get_retrieval_backend
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+
+class Command(BaseCommand):
+    help = "Be nem ágyazott chunkok embeddingjének pótlása (folytatható, párhuzamos)."
+
+    # ----------------------------------------------------------------------
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int,
+            default=getattr(settings, "EMBEDDING_BACKFILL_WORKERS", DEFAULT_WORKERS),
+            help="Párhuzamos embedding API hívások száma."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=getattr(settings, "EMBEDDING_BATCH_SIZE", 100),
+            help="Szövegek száma egy embedding API hívásban."
+        )
+        parser.add_argument(
+            "--rpm", type=int, default=getattr(settings, "EMBEDDING_RATE_LIMIT_RPM", 0),
+            help="Legfeljebb ennyi API hívás percenként (0 = korlátlan)."
+        )
+        parser.add_argument(
+            "--tpm", type=int, default=getattr(settings, "EMBEDDING_RATE_LIMIT_TPM", 0),
+            help="Legfeljebb ennyi (becsült) token percenként (0 = korlátlan)."
+        )
+        parser.add_argument(
+            "--limit", type=int, default=None,
+            help="Legfeljebb ennyi chunk ebben a futásban (a többi a következő futásra marad)."
+        )
+        parser.add_argument(
+            "--restart", action="store_true",
+            help="A checkpoint törlése, a backfill az elejéről indul."
+        )
+        parser.add_argument(
+            "--progress-interval", type=float, default=5.0,
+            help="Haladás kiírása ennyi másodpercenként."
+        )
+        parser.add_argument(
+            "--local-model", type=str, default=None,
+            help="A backfill ezzel a (még nem aktív) helyi modellfájllal fut (fit_local_embeddings "
+                 "kimenete); a keresés közben a régi modellel fut tovább."
+        )
+        parser.add_argument(
+            "--activate", action="store_true",
+            help="Teljes backfill után a modell aktiválása: a helyi modellfájl az aktív helyre kerül, "
+                 "a más modellel készült embeddingek törlődnek, a keresőbackend újraépül."
+        )
+        parser.add_argument(
+            "--skip-related", action="store_true",
+            help="A kapcsolódó tudáselemek gráfjának újraépítése kimarad."
+        )
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **options):
+        """
+        Fő parancs: backfill futtatása + a kapcsolódó tudáselemek gráfjának frissítése,
+        --activate esetén utána a modellváltás.
+        """
+        checkpoint_path = get_checkpoint_path()
+        if options["restart"]:
+            clear_checkpoint(checkpoint_path)
+
+        # Embedding provider (EMBEDDING_PROVIDER: openai vagy helyi modell),
+        # modellváltásnál a megadott, még nem aktív helyi modellfájl
+        if options["local_model"]:
+            client = LocalEmbeddingClient(model_path=options["local_model"])
+        else:
+            client = get_embedding_client()
+
+        backfill = EmbeddingBackfill(
+            client,
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            budget=RateBudget(options["rpm"], options["tpm"]),
+            checkpoint_path=checkpoint_path,
+        )
+
+        last_report = {"at": 0.0, "processed": None}
+
+        def report(stats, force=False):
+            if stats["processed"] == last_report["processed"]:
+                return
+            if not force and time.monotonic() - last_report["at"] < options["progress_interval"]:
+                return
+            last_report.update(at=time.monotonic(), processed=stats["processed"])
+
+            rate = stats["processed"] / stats["elapsed"] if stats["elapsed"] else 0.0
+            remaining = stats["total"] - stats["processed"]
+            eta = _format_duration(remaining / rate) if rate else "?"
+            percent = 100.0 * stats["processed"] / stats["total"] if stats["total"] else 100.0
+
+            self.stdout.write(
+                f"[Backfill] {stats['processed']}/{stats['total']} chunk ({percent:.1f}%), "
+                f"{stats['failed']} sikertelen, {rate:.1f} chunk/s, hátralévő idő: {eta}"
+            )
+
+        self.stdout.write(
+            f"Backfill indul: modell={backfill.model_name}, workers={backfill.workers}, "
+            f"batch={backfill.batch_size}, rpm={options['rpm'] or '∞'}, tpm={options['tpm'] or '∞'}"
+        )
+
+        if backfill.staging:
+            self.stdout.write(
+                f"Előkészítés: a(z) {backfill.model_name} modell még nem aktív, a keresés addig "
+                f"a(z) {get_embedding_model_name() or '?'} modellel fut."
+            )
+
+        resume_from = load_checkpoint(checkpoint_path).get("last_chunk_id")
+        if resume_from:
+            self.stdout.write(f"Folytatás a checkpointtól: chunk id > {resume_from}")
+
+        stats = backfill.run(limit=options["limit"], on_progress=report)
+
+        if stats["total"] == 0:
+            self.stdout.write(self.style.SUCCESS("✓ Nincs be nem ágyazott chunk."))
+        else:
+            report(stats, force=True)
+
+            # Előkészítésnél a kapcsolódó elemek gráfja a régi modellé marad (aktiváláskor épül újra)
+            if stats["embedded"] and not backfill.staging and not options["skip_related"]:
+                graph = build_related_graph()
+                self.stdout.write(f"Kapcsolódó tudáselemek frissítve: {graph['items']} tudáselem.")
+
+            summary = (
+                f"{stats['embedded']} beágyazva, {stats['failed']} sikertelen "
+                f"({_format_duration(stats['elapsed'])})"
+            )
+            if stats["completed"]:
+                self.stdout.write(self.style.SUCCESS(f"✓ Backfill kész: {summary}"))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"Backfill megállt: {summary} – újraindítva a checkpointtól folytatódik ({checkpoint_path})."
+                ))
+
+        if options["activate"]:
+            self._activate(backfill.model_name, options)
+
+    # ----------------------------------------------------------------------
+    def _activate(self, model_name: str, options):
+        """
+        Modellváltás: csak akkor, ha minden chunknak van model_name embeddingje.
+        Helyi modellnél előbb a modellfájl kerül az aktív helyre (a workerek a
+        következő kérésnél átállnak), utána törlődnek a régi modell embeddingjei.
+        """
+        missing = unembedded_chunks(model_name).count()
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"Az aktiválás elmarad: {missing} chunk még nincs beágyazva a(z) {model_name} modellel "
+                f"(a backfill újrafuttatható)."
+            ))
+            return
+
+        if options["local_model"]:
+            path = install_local_embedding_model(options["local_model"])
+            self.stdout.write(f"Helyi modellfájl aktiválva: {path}")
+
+        active = get_embedding_model_name()
+        if active != model_name:
+            self.stdout.write(self.style.WARNING(
+                f"A(z) {model_name} modell nem az aktív modell (aktív: {active or '?'}), a régi "
+                f"embeddingek megmaradnak. Az EMBEDDING_PROVIDER átállítása után: "
+                f"python manage.py backfill_embeddings --activate"
+            ))
+            return
+
+        removed = activate_embedding_model(model_name)
+        self.stdout.write(f"{removed} más modellel készült embedding törölve.")
+
+        rebuilt = get_retrieval_backend().rebuild()
+        if rebuilt:
+            self.stdout.write(f"Keresőbackend újraindexelve: {rebuilt} chunk.")
+
+        if not options["skip_related"]:
+            graph = build_related_graph()
+            self.stdout.write(f"Kapcsolódó tudáselemek frissítve: {graph['items']} tudáselem.")
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Aktív embedding modell: {model_name}"))
+        self.stdout.write(
+            "Vektor snapshot / IVF index használatakor újraépítendő: "
+            "python manage.py build_vector_snapshot, python manage.py build_ann_index"
+        )
@@ -0,0 +1,64 @@
+# IVF közelítő keresőindex tanítása és mentése (RAG_SETTINGS["ann_backend"] = "ivf").
+# A workerek a mentett centroidokat használják; az azóta érkező új embeddingek
+# újratanítás nélkül, inkrementálisan sorolódnak be.
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.rag.ivf_index import IVFIndex
+from services.rag.vector_index import VectorIndex, get_ivf_path
+
+
+class Command(BaseCommand):
+    help = "IVF (közelítő legközelebbi-szomszéd) index tanítása az embeddingeken."
+
+    # ----------------------------------------------------------------------
+    def add_arguments(self, parser):
+        rag_settings = getattr(settings, "RAG_SETTINGS", {})
+
+        parser.add_argument(
+            "--nlist", type=int, default=rag_settings.get("ivf_nlist", 64),
+            help="Klaszterek száma."
+        )
+        parser.add_argument(
+            "--nprobe", type=int, default=rag_settings.get("ivf_nprobe", 8),
+            help="Alapértelmezett vizsgált klaszterszám keresésenként."
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=15,
+            help="k-means iterációk száma."
+        )
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **options):
+        """
+        Fő parancs: index betöltése + IVF tanítás + mentés.
+        """
+        index = VectorIndex.from_database()
+        if len(index) == 0:
+            self.stdout.write(self.style.WARNING("Nincs embedding az adatbázisban, nincs mit tanítani."))
+            return
+
+        started = time.perf_counter()
+        ann = IVFIndex.train(
+            index.chunk_ids,
+            index.matrix,
+            nlist=options["nlist"],
+            nprobe=options["nprobe"],
+            iterations=options["iterations"],
+            model_name=index.model_name,
+        )
+
+        path = get_ivf_path()
+        ann.save(path)
+
+        sizes = [ids.size for ids in ann.lists]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ IVF index kész: {len(index)} vektor, nlist={ann.nlist}, "
+                f"listaméret min/átlag/max = {min(sizes)}/{sum(sizes) / len(sizes):.1f}/{max(sizes)} "
+                f"({time.perf_counter() - started:.2f} s) → {path}"
+            )
+        )
@@ -0,0 +1,51 @@
+# Kapcsolódó tudáselemek kNN gráfjának teljes (offline) felépítése.
+# Először újraszámolja a tudáselem-embeddingeket (chunkvektorok normalizált átlaga),
+# majd minden tudáselemhez eltárolja a k legközelebbi szomszédját. Ezután a gráfot
+# az embedding signal tudáselemenként, inkrementálisan frissíti.
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.rag.related_items import DEFAULT_RELATED_K, build_related_graph
+
+
+class Command(BaseCommand):
+    help = "Kapcsolódó tudáselemek kNN gráfjának felépítése a tudáselem-embeddingekből."
+
+    # ----------------------------------------------------------------------
+    def add_arguments(self, parser):
+        rag_settings = getattr(settings, "RAG_SETTINGS", {})
+
+        parser.add_argument(
+            "--k", type=int, default=rag_settings.get("related_items_k", DEFAULT_RELATED_K),
+            help="Szomszédok száma tudáselemenként."
+        )
+        parser.add_argument(
+            "--skip-item-embeddings", action="store_true",
+            help="A meglévő tudáselem-embeddingek használata újraszámolás nélkül."
+        )
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **options):
+        """
+        Fő parancs: tudáselem-embeddingek + kNN gráf építése.
+        """
+        started = time.perf_counter()
+        stats = build_related_graph(
+            k=options["k"],
+            refresh_embeddings=not options["skip_item_embeddings"],
+        )
+
+        if stats["items"] == 0:
+            self.stdout.write(self.style.WARNING("Nincs embedding az adatbázisban, nincs mit építeni."))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Kapcsolódó tudáselemek kész: {stats['items']} tudáselem, "
+                f"{stats['links']} él, k={options['k']} "
+                f"({time.perf_counter() - started:.2f} s)"
+            )
+        )
@@ -0,0 +1,41 @@
+# Vektorindex snapshot írása a lemezre (.npy mátrix + chunk-id oldalfájl).
+# Deploy után / nagyobb tudásbázis-betöltés után érdemes futtatni, így minden
+# worker memory-mappelt snapshotból indul, adatbázis-dekódolás nélkül.
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.rag.index_sync import latest_generation
+from services.rag.vector_index import VectorIndex
+from services.rag.vector_snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Memory-mappelhető vektorindex snapshot készítése a workerek számára."
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **kwargs):
+        """
+        Fő parancs: index felépítése az adatbázisból + snapshot írása.
+        """
+        started = time.perf_counter()
+
+        # A generációt a betöltés ELŐTT rögzítjük: a közben érkező írásokat
+        # a workerek a snapshot betöltése után a változásnaplóból (idempotensen) pótolják.
+        generation = latest_generation()
+        index = VectorIndex.from_database()
+
+        target = write_snapshot(
+            index.chunk_ids, index.matrix, generation, index.short_matrix, model_name=index.model_name
+        )
+
+        elapsed = time.perf_counter() - started
+        size_mb = index.matrix.nbytes / (1024 * 1024)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Snapshot kész: {len(index)} vektor, {index.dim} dimenzió ({index.model_name}), "
+                f"{size_mb:.1f} MB → {target} ({elapsed:.2f} s)"
+            )
+        )
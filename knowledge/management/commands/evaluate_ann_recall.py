@@ -0,0 +1,62 @@
+# A közelítő (IVF) keresés recall@k mérése a pontos kereséshez képest.
+# Segít kiválasztani azt az nprobe értéket, amely még elég pontos, de már gyors.
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from services.rag.ivf_index import IVFIndex, evaluate_recall
+from services.rag.vector_index import VectorIndex, get_ivf_path
+
+
+class Command(BaseCommand):
+    help = "IVF index recall@k összevetése a brute force kereséssel, több nprobe értékre."
+
+    # ----------------------------------------------------------------------
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=10, help="TOP-K a recall@k-hoz.")
+        parser.add_argument("--queries", type=int, default=200, help="Minta query-k száma.")
+        parser.add_argument(
+            "--nprobe", type=str, default="1,2,4,8,16,32",
+            help="Vesszővel elválasztott nprobe értékek."
+        )
+        parser.add_argument(
+            "--noise", type=float, default=0.05,
+            help="A mintavett chunk vektorokhoz adott zaj (query szimulációhoz)."
+        )
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **options):
+        """
+        Fő parancs: mentett (vagy frissen tanított) IVF index mérése.
+        Query-knek a tárolt chunk vektorok zajjal perturbált másolatait használjuk.
+        """
+        index = VectorIndex.from_database()
+        if len(index) == 0:
+            self.stdout.write(self.style.WARNING("Nincs embedding az adatbázisban."))
+            return
+
+        ann = IVFIndex.load(get_ivf_path())
+        if ann is None or ann.centroids.shape[1] != index.dim or ann.model_name != index.model_name:
+            self.stdout.write("ℹ Nincs az aktív modellhez mentett IVF index, ideiglenes tanítás...")
+            ann = IVFIndex.train(index.chunk_ids, index.matrix, model_name=index.model_name)
+
+        index.attach_ann(ann)
+
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(index), min(options["queries"], len(index)), replace=False)
+        queries = np.asarray(index.matrix[sample], dtype=np.float32)
+        queries = queries + rng.normal(0, options["noise"] / np.sqrt(index.dim), queries.shape)
+
+        nprobe_values = [int(v) for v in options["nprobe"].split(",") if v.strip()]
+        results = evaluate_recall(index, queries, top_k=options["k"], nprobe_values=nprobe_values)
+
+        self.stdout.write(
+            f"\n{len(index)} vektor, nlist={ann.nlist}, {len(queries)} query, k={options['k']}\n"
+        )
+        self.stdout.write(f"{'nprobe':>7} {'recall@k':>9} {'ANN ms':>8} {'exact ms':>9} {'pontozott':>10}")
+
+        for row in results:
+            self.stdout.write(
+                f"{row['nprobe']:>7} {row['recall']:>9.3f} {row['ann_ms']:>8.3f} "
+                f"{row['exact_ms']:>9.3f} {row['scanned_ratio'] * 100:>9.1f}%"
+            )
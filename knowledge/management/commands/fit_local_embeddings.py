@@ -0,0 +1,106 @@
+# Helyi (offline) embedding modell tanítása a tudásbázis chunkjain.
+# Hash-elt karakter n-gram TF-IDF + vetítés (SVD-ből tanult irányok és véletlen
+# vetítés). Utána EMBEDDING_PROVIDER=local mellett a chunkok és a kérdések
+# embeddingje API hívás nélkül, helyben készül.
+# A modell verziózott fájlba kerül az aktív mellé: a futó workerek a régi modellel
+# keresnek tovább, amíg a backfill_embeddings --activate át nem állítja őket.
+
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from knowledge.models import KnowledgeChunk
+from services.embedding.local_embedding import (
+    DEFAULT_BUCKETS,
+    DEFAULT_DIMENSIONS,
+    DEFAULT_MIN_DF,
+    DEFAULT_NGRAM_RANGE,
+    DEFAULT_SVD_COMPONENTS,
+    fit_local_embedding_model,
+    get_local_embedding_settings,
+    versioned_model_path,
+)
+
+
+class Command(BaseCommand):
+    help = "Helyi embedding modell tanítása a chunkokon (EMBEDDING_PROVIDER=local)."
+
+    # ----------------------------------------------------------------------
+    def add_arguments(self, parser):
+        local_settings = get_local_embedding_settings()
+
+        parser.add_argument(
+            "--dimensions", type=int, default=local_settings.get("dimensions", DEFAULT_DIMENSIONS),
+            help="Az embedding vektorok mérete."
+        )
+        parser.add_argument(
+            "--buckets", type=int, default=local_settings.get("buckets", DEFAULT_BUCKETS),
+            help="A hash-elt n-gram tér mérete."
+        )
+        parser.add_argument(
+            "--svd-components", type=int,
+            default=local_settings.get("svd_components", DEFAULT_SVD_COMPONENTS),
+            help="A korpuszból (SVD) tanult dimenziók száma; a többi véletlen vetítés."
+        )
+        parser.add_argument(
+            "--min-df", type=int, default=local_settings.get("min_df", DEFAULT_MIN_DF),
+            help="Az SVD csak a legalább ennyi chunkban előforduló n-gramokból tanul."
+        )
+        parser.add_argument(
+            "--ngram-min", type=int, default=local_settings.get("ngram_min", DEFAULT_NGRAM_RANGE[0]),
+            help="Legrövidebb karakter n-gram."
+        )
+        parser.add_argument(
+            "--ngram-max", type=int, default=local_settings.get("ngram_max", DEFAULT_NGRAM_RANGE[1]),
+            help="Leghosszabb karakter n-gram."
+        )
+        parser.add_argument(
+            "--output", type=str, default=None,
+            help="A modellfájl (.npz) helye (alapértelmezés: az aktív modellfájl mellett, "
+                 "a modell hash-ével verziózva)."
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Véletlenszám-mag.")
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **options):
+        """
+        Fő parancs: korpusz betöltése → tanítás → modellfájl mentése.
+        """
+        texts = list(KnowledgeChunk.objects.order_by("id").values_list("content", flat=True))
+        if not texts:
+            self.stdout.write(self.style.WARNING("Nincs chunk az adatbázisban, nincs min tanítani."))
+            return
+
+        started = time.perf_counter()
+        model = fit_local_embedding_model(
+            texts,
+            dimensions=options["dimensions"],
+            n_buckets=options["buckets"],
+            svd_components=options["svd_components"],
+            ngram_range=(options["ngram_min"], options["ngram_max"]),
+            min_df=options["min_df"],
+            seed=options["seed"],
+        )
+        if model is None:
+            self.stdout.write(self.style.WARNING("A chunkokból nem képezhető egyetlen n-gram sem."))
+            return
+
+        output = Path(options["output"]) if options["output"] else versioned_model_path(model)
+        model.save(output)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Helyi embedding modell kész: {model.model_name} – {model.meta['documents']} chunk, "
+                f"{model.dimensions} dimenzió ({model.meta['svd_components']} tanult), "
+                f"{model.n_buckets} bucket ({time.perf_counter() - started:.2f} s) → {output}"
+            )
+        )
+
+        self.stdout.write(
+            f"Beágyazás az új modellel (a keresés közben a régi modellel fut), majd aktiválás: "
+            f"python manage.py backfill_embeddings --local-model {output} --activate"
+        )
+        if getattr(settings, "EMBEDDING_PROVIDER", "openai") != "local":
+            self.stdout.write("Használat: EMBEDDING_PROVIDER=local a .env-ben.")
@@ -0,0 +1,43 @@
+# A beállított keresőbackend teljes újraindexelése az adatbázisból
+# (RAG_SETTINGS["index_mode"] = "elasticsearch" esetén az ES index újraépítése).
+# A memória- és SQLite backendnek nincs külön indexe, ott nincs teendő.
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.rag.retrieval_provider import get_retrieval_backend
+
+
+class Command(BaseCommand):
+    help = "A keresőbackend (pl. Elasticsearch) teljes újraindexelése az embeddingekből."
+
+    # ----------------------------------------------------------------------
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mode", type=str, default=None,
+            help="Backend neve (alapértelmezés: RAG_SETTINGS['index_mode'])."
+        )
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **options):
+        """
+        Fő parancs: backend kiválasztása + újraindexelés.
+        """
+        backend = get_retrieval_backend(options["mode"])
+
+        started = time.perf_counter()
+        total = backend.rebuild()
+
+        if not total:
+            self.stdout.write(
+                self.style.WARNING(f"A(z) '{backend.name}' backendnek nincs külön indexe, vagy nincs embedding.")
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ '{backend.name}' backend újraindexelve: {total} chunk "
+                f"({time.perf_counter() - started:.2f} s)"
+            )
+        )
@@ -0,0 +1,129 @@
+# Háttérworker a tudáselem-feldolgozáshoz (anonimizálás, chunkolás, embedding)
+# és a kapcsolódó tudáselemek újrabeágyazás utáni frissítéséhez.
+# A KnowledgeJob sorból bérlettel vesz fel feladatokat, hiba esetén backoff-fal
+# újrapróbál, és rendszeresen kiírja a sor mélységét és késését.
+# Több példány is futhat párhuzamosan (akár több gépen, közös adatbázissal).
+
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.ingestion.job_queue import (
+    claim_jobs,
+    complete_job,
+    fail_job,
+    queue_stats,
+    renew_lease,
+    retry_failed_jobs,
+)
+from services.ingestion.pipeline import run_job
+
+
+class Command(BaseCommand):
+    help = "Tudáselem-feldolgozási feladatok futtatása a KnowledgeJob sorból."
+
+    # ----------------------------------------------------------------------
+    def add_arguments(self, parser):
+        worker_settings = getattr(settings, "KNOWLEDGE_WORKER_SETTINGS", {})
+
+        parser.add_argument(
+            "--once", action="store_true",
+            help="A sor kiürítése után kilép (pl. cron / CI)."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=worker_settings.get("batch_size", 10),
+            help="Egyszerre felvett feladatok száma."
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=worker_settings.get("poll_interval", 2.0),
+            help="Üres sornál ennyi másodpercet vár a következő lekérdezésig."
+        )
+        parser.add_argument(
+            "--stats-interval", type=float, default=worker_settings.get("stats_interval", 30.0),
+            help="A sor állapotának kiírása ennyi másodpercenként."
+        )
+        parser.add_argument(
+            "--stats", action="store_true",
+            help="Csak a sor állapotának kiírása, feldolgozás nélkül."
+        )
+        parser.add_argument(
+            "--retry-failed", action="store_true",
+            help="A véglegesen sikertelen feladatok visszaállítása indulás előtt."
+        )
+
+    # ----------------------------------------------------------------------
+    def _write_stats(self):
+        stats = queue_stats()
+        self.stdout.write(
+            f"[Worker] sor: {stats['pending']} várakozó ({stats['ready']} esedékes), "
+            f"{stats['running']} fut, {stats['failed']} sikertelen, "
+            f"késés: {stats['lag_seconds']:.1f} s"
+        )
+
+    # ----------------------------------------------------------------------
+    def handle(self, *args, **options):
+        """
+        Fő parancs: feladatok felvétele + feldolgozása, amíg le nem állítják.
+        """
+        if options["stats"]:
+            self._write_stats()
+            return
+
+        if options["retry_failed"]:
+            self.stdout.write(f"[Worker] {retry_failed_jobs()} sikertelen feladat újra sorban.")
+
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(self.style.SUCCESS(f"✓ Knowledge worker indul: {worker_id}"))
+        self._write_stats()
+
+        processed = failed = 0
+        last_stats = time.monotonic()
+
+        try:
+            while True:
+                jobs = claim_jobs(worker_id, limit=options["batch_size"])
+
+                for job in jobs:
+                    # Az előző feladatok alatt a bérlet lejárhatott: futtatás előtt megújítjuk,
+                    # a közben más worker által átvett feladat kimarad
+                    if not renew_lease(job):
+                        self.stdout.write(
+                            f"[Worker] Kihagyva: {job.kind} – tudáselem #{job.item_id} (a bérletet más worker vette át)"
+                        )
+                        continue
+
+                    started = time.perf_counter()
+                    try:
+                        run_job(job)
+                    except Exception as e:
+                        fail_job(job, str(e))
+                        failed += 1
+                        self.stdout.write(self.style.WARNING(
+                            f"[Worker] Hiba: {job.kind} – tudáselem #{job.item_id} ({job.attempts}. próbálkozás): {e}"
+                        ))
+                        continue
+
+                    complete_job(job)
+                    processed += 1
+                    self.stdout.write(
+                        f"[Worker] Kész: {job.kind} – tudáselem #{job.item_id} "
+                        f"({time.perf_counter() - started:.2f} s)"
+                    )
+
+                if time.monotonic() - last_stats >= options["stats_interval"]:
+                    self._write_stats()
+                    last_stats = time.monotonic()
+
+                if not jobs:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+
+        except KeyboardInterrupt:
+            self.stdout.write("[Worker] Leállítás...")
+
+        self._write_stats()
+        self.stdout.write(self.style.SUCCESS(f"✓ Feldolgozva: {processed}, sikertelen próbálkozás: {failed}"))
@@ -0,0 +1,91 @@
+# Embedding vektorok átállítása JSON listáról nyers bináris (float32/float16) tárolásra.
+# Adatmigráció: a meglévő JSON vektorokat float32 bájtsorrá alakítjuk.
+
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+
+STORAGE_DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+
+def json_to_binary(apps, schema_editor):
+    KnowledgeEmbedding = apps.get_model("knowledge", "KnowledgeEmbedding")
+
+    for emb in KnowledgeEmbedding.objects.only("id", "vector_json").iterator():
+        vector = emb.vector_json
+        if isinstance(vector, str):
+            vector = json.loads(vector)
+
+        data = np.asarray(vector or [], dtype=STORAGE_DTYPES["float32"])
+        KnowledgeEmbedding.objects.filter(pk=emb.pk).update(
+            vector_binary=data.tobytes(),
+            dtype="float32",
+            dimensions=data.shape[0],
+        )
+
+
+def binary_to_json(apps, schema_editor):
+    KnowledgeEmbedding = apps.get_model("knowledge", "KnowledgeEmbedding")
+
+    for emb in KnowledgeEmbedding.objects.only("id", "vector_binary", "dtype").iterator():
+        data = np.frombuffer(emb.vector_binary or b"", dtype=STORAGE_DTYPES[emb.dtype])
+        KnowledgeEmbedding.objects.filter(pk=emb.pk).update(
+            vector_json=[float(x) for x in data]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0004_knowledgechunk_is_embedded_and_more'),
+    ]
+
+    operations = [
+        # 1) Új oszlopok
+        migrations.AddField(
+            model_name='knowledgeembedding',
+            name='vector_binary',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='knowledgeembedding',
+            name='dtype',
+            field=models.CharField(choices=[('float32', 'float32'), ('float16', 'float16')], default='float32', help_text='A vektor tárolási típusa (float32 vagy float16).', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='knowledgeembedding',
+            name='dimensions',
+            field=models.PositiveIntegerField(default=0, help_text='A vektor dimenziószáma.'),
+        ),
+
+        # 2) JSON → bináris konverzió (visszafelé is)
+        migrations.RenameField(
+            model_name='knowledgeembedding',
+            old_name='vector',
+            new_name='vector_json',
+        ),
+        migrations.AlterField(
+            model_name='knowledgeembedding',
+            name='vector_json',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+
+        # 3) Régi oszlop eltávolítása, az új átnevezése
+        migrations.RemoveField(
+            model_name='knowledgeembedding',
+            name='vector_json',
+        ),
+        migrations.RenameField(
+            model_name='knowledgeembedding',
+            old_name='vector_binary',
+            new_name='vector',
+        ),
+        migrations.AlterField(
+            model_name='knowledgeembedding',
+            name='vector',
+            field=models.BinaryField(help_text='Embedding vektor nyers little-endian bájtsorként (lásd: dtype).'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Matryoshka-előtag vektorok (short_vector) a kétlépcsős kereséshez.
+# Adatmigráció: a meglévő embeddingekből képezzük az újranormalizált előtagot.
+
+import numpy as np
+from django.db import migrations, models
+
+
+STORAGE_DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+# A migráció idején érvényes EMBEDDING_SHORT_DIMENSIONS alapérték, rögzítve:
+# a migráció kimenete nem függhet a futtató környezet beállításaitól.
+# Eltérő beállításnál a Matryoshka kvantáló az index építésekor maga képzi az
+# előtagot (a tárolt short_vector csak egyező méretnél kerül felhasználásra).
+SHORT_DIMENSIONS = 256
+
+
+def fill_short_vectors(apps, schema_editor):
+    KnowledgeEmbedding = apps.get_model("knowledge", "KnowledgeEmbedding")
+    short_dimensions = SHORT_DIMENSIONS
+
+    for emb in KnowledgeEmbedding.objects.only("id", "vector", "dtype").iterator():
+        dtype = STORAGE_DTYPES[emb.dtype]
+        vector = np.frombuffer(emb.vector or b"", dtype=dtype).astype(np.float32)
+
+        if vector.shape[0] <= short_dimensions:
+            continue
+
+        prefix = vector[:short_dimensions]
+        norm = np.linalg.norm(prefix) or 1.0
+        KnowledgeEmbedding.objects.filter(pk=emb.pk).update(
+            short_vector=(prefix / norm).astype(dtype).tobytes(),
+            short_dimensions=short_dimensions,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0005_knowledgeembedding_binary_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgeembedding',
+            name='short_vector',
+            field=models.BinaryField(blank=True, help_text='A vektor első short_dimensions eleme, újranormalizálva (durva kereséshez).', null=True),
+        ),
+        migrations.AddField(
+            model_name='knowledgeembedding',
+            name='short_dimensions',
+            field=models.PositiveIntegerField(default=0, help_text='A rövidített (Matryoshka) vektor dimenziószáma; 0 = nincs.'),
+        ),
+        migrations.RunPython(fill_short_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0006_knowledgeembedding_short_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeIndexChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_id', models.BigIntegerField(db_index=True)),
+                ('action', models.CharField(choices=[('add', 'Hozzáadás'), ('remove', 'Törlés'), ('update', 'Metaadat módosítás')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Indexváltozás',
+                'verbose_name_plural': 'Indexváltozások',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0007_knowledgeindexchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeItemEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField(help_text='A chunk embeddingek normalizált átlaga, float32 bájtsorként.')),
+                ('dimensions', models.PositiveIntegerField(default=0)),
+                ('chunk_count', models.PositiveIntegerField(default=0, help_text='Hány chunk embeddingből készült az átlag.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='item_embedding', to='knowledge.knowledgeitem')),
+            ],
+            options={
+                'verbose_name': 'Tudáselem embedding',
+                'verbose_name_plural': 'Tudáselem embeddingek',
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedKnowledgeItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Koszinusz hasonlóság a két tudáselem embeddingje között.')),
+                ('rank', models.PositiveIntegerField(help_text='Sorszám a tudáselem szomszédai között (0 = legközelebbi).')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='knowledge.knowledgeitem')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='knowledge.knowledgeitem')),
+            ],
+            options={
+                'verbose_name': 'Kapcsolódó tudáselem',
+                'verbose_name_plural': 'Kapcsolódó tudáselemek',
+                'ordering': ['item', 'rank'],
+                'unique_together': {('item', 'related')},
+            },
+        ),
+    ]
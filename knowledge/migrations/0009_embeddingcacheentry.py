@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0008_related_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=200)),
+                ('content_hash', models.CharField(help_text='A beágyazott (előkészített) szöveg sha256 hash-e hexában.', max_length=64)),
+                ('vector', models.BinaryField(help_text='Embedding vektor float32 bájtsorként.')),
+                ('dimensions', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='Utolsó találat ideje – a méretkorlát a legrégebben használtakat törli.')),
+            ],
+            options={
+                'verbose_name': 'Embedding cache bejegyzés',
+                'verbose_name_plural': 'Embedding cache bejegyzések',
+                'unique_together': {('model_name', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0009_embeddingcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgeitem',
+            name='content_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Az eredeti tartalom sha256 hash-e – változatlan tartalomnál a mentés kihagyja az anonimizálást, chunkolást és embeddinget.', max_length=64),
+        ),
+    ]
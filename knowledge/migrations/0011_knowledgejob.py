@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0010_knowledgeitem_content_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Várakozik'), ('running', 'Fut'), ('failed', 'Sikertelen')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(help_text='Ettől kezdve vehető fel (újrapróbálásnál a backoff utáni időpont).')),
+                ('lease_expires_at', models.DateTimeField(blank=True, help_text='A futó feladat bérletének lejárata – utána másik worker átveheti.', null=True)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='knowledge.knowledgeitem')),
+            ],
+            options={
+                'verbose_name': 'Feldolgozási feladat',
+                'verbose_name_plural': 'Feldolgozási feladatok',
+                'ordering': ['available_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='knowledge_k_status_1c16b1_idx')],
+            },
+        ),
+    ]
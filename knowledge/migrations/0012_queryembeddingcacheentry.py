@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0011_knowledgejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryEmbeddingCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=200)),
+                ('query_hash', models.CharField(help_text='A normalizált kérdés sha256 hash-e hexában.', max_length=64)),
+                ('query_text', models.TextField(help_text='A normalizált kérdés (statisztikához).')),
+                ('vector', models.BinaryField(help_text='Query embedding float32 bájtsorként.')),
+                ('dimensions', models.PositiveIntegerField(default=0)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='A TTL ettől számít.')),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='Utolsó találat ideje – a méretkorlát a legrégebben használtakat törli.')),
+            ],
+            options={
+                'verbose_name': 'Query embedding cache bejegyzés',
+                'verbose_name_plural': 'Query embedding cache bejegyzések',
+                'unique_together': {('model_name', 'query_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0012_queryembeddingcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgejob',
+            name='kind',
+            field=models.CharField(choices=[('process', 'Feldolgozás'), ('related', 'Kapcsolódó elemek')], default='process', max_length=10),
+        ),
+    ]
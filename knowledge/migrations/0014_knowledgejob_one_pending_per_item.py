@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def drop_duplicate_pending_jobs(apps, schema_editor):
+    """A korábbi (versenyhelyzetből maradt) ismétlődő várakozó feladatokból a legrégebbi marad."""
+    KnowledgeJob = apps.get_model("knowledge", "KnowledgeJob")
+
+    seen = set()
+    duplicates = []
+    for job_id, item_id, kind in (
+        KnowledgeJob.objects.filter(status="pending").order_by("id").values_list("id", "item_id", "kind")
+    ):
+        if (item_id, kind) in seen:
+            duplicates.append(job_id)
+        seen.add((item_id, kind))
+
+    KnowledgeJob.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0013_knowledgejob_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_pending_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='knowledgejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('item', 'kind'), name='knowledge_job_one_pending_per_item'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0014_knowledgejob_one_pending_per_item'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='knowledgeembedding',
+            name='chunk',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='knowledge.knowledgechunk'),
+        ),
+        migrations.AddConstraint(
+            model_name='knowledgeembedding',
+            constraint=models.UniqueConstraint(fields=('chunk', 'model_name'), name='knowledge_embedding_one_per_model'),
+        ),
+    ]
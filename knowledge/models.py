@@ -5,6 +5,15 @@
 from django.db import models
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
+from django.conf import settings
+
+from services.embedding.vector_codec import (
+    VECTOR_DTYPES,
+    DEFAULT_VECTOR_DTYPE,
+    encode_vector,
+    decode_vector,
+    truncate_vector,
+)
 
 
 # -------------------------------------------------------------------------
@@ -55,6 +64,15 @@ class KnowledgeItem(models.Model):
         help_text="Anonimizált (PII-mentesített) tartalom, amelyen a RAG pipeline dolgozik."
     )
 
+    content_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        editable=False,
+        help_text="Az eredeti tartalom sha256 hash-e – változatlan tartalomnál a "
+                  "mentés kihagyja az anonimizálást, chunkolást és embeddinget."
+    )
+
     category = models.ForeignKey(
         "KnowledgeCategory",
         on_delete=models.SET_NULL,
@@ -123,17 +141,42 @@ class KnowledgeChunk(models.Model):
 
 
 # -------------------------------------------------------------------------
-# EMBEDDING modell – minden chunk embeddingje
+# EMBEDDING modell – minden chunk embeddingje (modellenként legfeljebb egy)
 # -------------------------------------------------------------------------
 class KnowledgeEmbedding(models.Model):
-    chunk = models.OneToOneField(
+    # Modellváltáskor az új modell vektorai a régiek mellé készülnek, a keresés
+    # közben az aktív modellel fut tovább (lásd services.ingestion.backfill)
+    chunk = models.ForeignKey(
         KnowledgeChunk,
         on_delete=models.CASCADE,
-        related_name="embedding"
+        related_name="embeddings"
+    )
+
+    vector = models.BinaryField(
+        help_text="Embedding vektor nyers little-endian bájtsorként (lásd: dtype)."
+    )
+
+    dtype = models.CharField(
+        max_length=10,
+        choices=[(name, name) for name in VECTOR_DTYPES],
+        default=DEFAULT_VECTOR_DTYPE,
+        help_text="A vektor tárolási típusa (float32 vagy float16)."
+    )
+
+    dimensions = models.PositiveIntegerField(
+        default=0,
+        help_text="A vektor dimenziószáma."
+    )
+
+    short_vector = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text="A vektor első short_dimensions eleme, újranormalizálva (durva kereséshez)."
     )
 
-    vector = models.JSONField(
-        help_text="Embedding vektor float listaként."
+    short_dimensions = models.PositiveIntegerField(
+        default=0,
+        help_text="A rövidített (Matryoshka) vektor dimenziószáma; 0 = nincs."
     )
 
     model_name = models.CharField(
@@ -147,10 +190,290 @@ class KnowledgeEmbedding(models.Model):
     class Meta:
         verbose_name = "Embedding"
         verbose_name_plural = "Embeddingek"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chunk", "model_name"], name="knowledge_embedding_one_per_model"
+            ),
+        ]
 
     def __str__(self):
         return f"Embedding – chunk #{self.chunk.index} ({self.model_name})"
 
+    def set_vector(self, vector, dtype: str = None):
+        """
+        Vektor beállítása bináris formában.
+        A tárolási típus alapértelmezése: settings.EMBEDDING_STORAGE_DTYPE.
+        """
+        self.dtype = dtype or getattr(settings, "EMBEDDING_STORAGE_DTYPE", DEFAULT_VECTOR_DTYPE)
+        self.vector = encode_vector(vector, self.dtype)
+        self.dimensions = len(vector)
+
+        # Matryoshka előtag – a text-embedding-3 modellek "dimensions" paramétere
+        # pontosan ezt adja vissza, így külön API hívás nélkül is előállítható
+        short_dimensions = getattr(settings, "EMBEDDING_SHORT_DIMENSIONS", 0)
+        if 0 < short_dimensions < self.dimensions:
+            self.short_vector = encode_vector(truncate_vector(vector, short_dimensions), self.dtype)
+            self.short_dimensions = short_dimensions
+        else:
+            self.short_vector = None
+            self.short_dimensions = 0
+
+    def get_vector(self):
+        """A tárolt vektor float32 numpy tömbként."""
+        return decode_vector(self.vector, self.dtype)
+
+    def get_short_vector(self):
+        """A rövidített vektor float32 numpy tömbként (None, ha nincs)."""
+        if not self.short_vector:
+            return None
+        return decode_vector(self.short_vector, self.dtype)
+
+
+# -------------------------------------------------------------------------
+# Tudáselem szintű embedding – a chunkvektorok normalizált átlaga
+# -------------------------------------------------------------------------
+class KnowledgeItemEmbedding(models.Model):
+    item = models.OneToOneField(
+        KnowledgeItem,
+        on_delete=models.CASCADE,
+        related_name="item_embedding"
+    )
+
+    vector = models.BinaryField(
+        help_text="A chunk embeddingek normalizált átlaga, float32 bájtsorként."
+    )
+
+    dimensions = models.PositiveIntegerField(default=0)
+    chunk_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Hány chunk embeddingből készült az átlag."
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Tudáselem embedding"
+        verbose_name_plural = "Tudáselem embeddingek"
+
+    def __str__(self):
+        return f"Tudáselem embedding – {self.item.title}"
+
+    def get_vector(self):
+        """A tárolt vektor float32 numpy tömbként."""
+        return decode_vector(self.vector, "float32")
+
+
+# -------------------------------------------------------------------------
+# Kapcsolódó tudáselemek – előre kiszámolt kNN gráf
+# -------------------------------------------------------------------------
+class RelatedKnowledgeItem(models.Model):
+    item = models.ForeignKey(
+        KnowledgeItem,
+        on_delete=models.CASCADE,
+        related_name="related_links"
+    )
+
+    related = models.ForeignKey(
+        KnowledgeItem,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+
+    score = models.FloatField(help_text="Koszinusz hasonlóság a két tudáselem embeddingje között.")
+    rank = models.PositiveIntegerField(help_text="Sorszám a tudáselem szomszédai között (0 = legközelebbi).")
+
+    class Meta:
+        verbose_name = "Kapcsolódó tudáselem"
+        verbose_name_plural = "Kapcsolódó tudáselemek"
+        ordering = ["item", "rank"]
+        unique_together = ("item", "related")
+
+    def __str__(self):
+        return f"{self.item.title} → {self.related.title} ({self.score:.3f})"
+
+
+# -------------------------------------------------------------------------
+# Keresőindex változásnapló – a workerek ebből frissítik a memóriaindexüket
+# -------------------------------------------------------------------------
+class KnowledgeIndexChange(models.Model):
+    """
+    Egy chunk keresőindexbeli változása.
+    Az id egyben generációszámláló: a legnagyobb id a tudásbázis aktuális
+    verziója, a worker az utoljára látott id utáni bejegyzéseket alkalmazza.
+    """
+
+    ACTION_ADD = "add"
+    ACTION_REMOVE = "remove"
+    ACTION_UPDATE = "update"
+
+    ACTION_CHOICES = [
+        (ACTION_ADD, "Hozzáadás"),
+        (ACTION_REMOVE, "Törlés"),
+        (ACTION_UPDATE, "Metaadat módosítás"),
+    ]
+
+    # Nem ForeignKey: a törölt chunkok azonosítója is a naplóban marad
+    chunk_id = models.BigIntegerField(db_index=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Indexváltozás"
+        verbose_name_plural = "Indexváltozások"
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"#{self.id} {self.action} – chunk #{self.chunk_id}"
+
+
+# -------------------------------------------------------------------------
+# Háttérfeldolgozási feladatsor – külső broker nélkül, az adatbázisban
+# -------------------------------------------------------------------------
+class KnowledgeJob(models.Model):
+    """
+    Egy tudáselem feldolgozása a kérés útvonalán kívül: a signalok és a
+    pipeline sorba teszik, a manage.py run_knowledge_worker parancs dolgozza fel.
+    - process: anonimizálás, chunkolás, embedding
+    - related: a kapcsolódó tudáselemek listájának frissítése újrabeágyazás után
+    """
+
+    KIND_PROCESS = "process"
+    KIND_RELATED = "related"
+
+    KIND_CHOICES = [
+        (KIND_PROCESS, "Feldolgozás"),
+        (KIND_RELATED, "Kapcsolódó elemek"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Várakozik"),
+        (STATUS_RUNNING, "Fut"),
+        (STATUS_FAILED, "Sikertelen"),
+    ]
+
+    item = models.ForeignKey(
+        KnowledgeItem,
+        on_delete=models.CASCADE,
+        related_name="jobs"
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_PROCESS)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+
+    available_at = models.DateTimeField(
+        help_text="Ettől kezdve vehető fel (újrapróbálásnál a backoff utáni időpont)."
+    )
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="A futó feladat bérletének lejárata – utána másik worker átveheti."
+    )
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Feldolgozási feladat"
+        verbose_name_plural = "Feldolgozási feladatok"
+        ordering = ["available_at", "id"]
+        indexes = [models.Index(fields=["status", "available_at"])]
+        constraints = [
+            # Tudáselemenként és típusonként legfeljebb egy várakozó feladat
+            # (párhuzamos mentéseknél is – a sorba állítás ütközéskor nem hoz létre újat)
+            models.UniqueConstraint(
+                fields=["item", "kind"],
+                condition=models.Q(status="pending"),
+                name="knowledge_job_one_pending_per_item",
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} {self.status} – {self.item_id} ({self.attempts}. próbálkozás)"
+
+
+# -------------------------------------------------------------------------
+# Embedding cache – (modell, sha256(szöveg)) → vektor
+# A változatlan chunkok (újrachunkolás után) és az elemek közötti azonos
+# szövegrészek így provider hívás nélkül kapják vissza a vektorukat.
+# -------------------------------------------------------------------------
+class EmbeddingCacheEntry(models.Model):
+    model_name = models.CharField(max_length=200)
+    content_hash = models.CharField(
+        max_length=64,
+        help_text="A beágyazott (előkészített) szöveg sha256 hash-e hexában."
+    )
+
+    vector = models.BinaryField(help_text="Embedding vektor float32 bájtsorként.")
+    dimensions = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Utolsó találat ideje – a méretkorlát a legrégebben használtakat törli."
+    )
+
+    class Meta:
+        verbose_name = "Embedding cache bejegyzés"
+        verbose_name_plural = "Embedding cache bejegyzések"
+        unique_together = ("model_name", "content_hash")
+
+    def __str__(self):
+        return f"{self.model_name} – {self.content_hash[:12]}"
+
+    def get_vector(self):
+        """A tárolt vektor float32 numpy tömbként."""
+        return decode_vector(self.vector, "float32")
+
+
+# -------------------------------------------------------------------------
+# Query embedding cache – (modell, normalizált kérdés) → vektor
+# A folyamatonkénti LRU mögötti, workerek között megosztott szint; a gyakori
+# kérdések így embedding API hívás nélkül kapják meg a query vektort.
+# -------------------------------------------------------------------------
+class QueryEmbeddingCacheEntry(models.Model):
+    model_name = models.CharField(max_length=200)
+    query_hash = models.CharField(
+        max_length=64,
+        help_text="A normalizált kérdés sha256 hash-e hexában."
+    )
+    query_text = models.TextField(help_text="A normalizált kérdés (statisztikához).")
+
+    vector = models.BinaryField(help_text="Query embedding float32 bájtsorként.")
+    dimensions = models.PositiveIntegerField(default=0)
+
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="A TTL ettől számít."
+    )
+    last_used_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Utolsó találat ideje – a méretkorlát a legrégebben használtakat törli."
+    )
+
+    class Meta:
+        verbose_name = "Query embedding cache bejegyzés"
+        verbose_name_plural = "Query embedding cache bejegyzések"
+        unique_together = ("model_name", "query_hash")
+
+    def __str__(self):
+        return f"{self.model_name} – {self.query_text[:60]}"
+
+    def get_vector(self):
+        """A tárolt vektor float32 numpy tömbként."""
+        return decode_vector(self.vector, "float32")
+
 
 # -------------------------------------------------------------------------
 # Tudásbázis beállítások (singleton)
@@ -1,14 +1,32 @@
 #file: knowledge/signals.py
 # Signalok a tudáselemek automatikus anonimizálásához, chunkolásához és embeddingeléséhez.
+# A lépések a services/ingestion/pipeline.py-ban vannak; háttérfeldolgozásnál
+# (KNOWLEDGE_WORKER_SETTINGS["async_ingestion"]) a mentés csak sorba teszi a
+# tudáselemet, és a manage.py run_knowledge_worker dolgozza fel.
 
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, pre_delete
 from django.dispatch import receiver
 
-from knowledge.models import KnowledgeItem, KnowledgeChunk, KnowledgeEmbedding
-from services.anonymization.anonymizer_service import TextAnonymizerService
-from services.chunking.chunk_service import chunk_text
-from services.embedding.embedding_service import EmbeddingService
-from services.ai_provider import get_ai_client
+from knowledge.models import KnowledgeItem
+from services.ingestion.job_queue import enqueue_item, is_async_ingestion
+from services.ingestion.pipeline import (
+    INDEXED_ITEM_FIELDS,
+    anonymize_content,
+    content_fingerprint,
+    embed_item_chunks,
+    rechunk_item,
+    refresh_item_metadata,
+    remove_chunks_from_index,
+)
+from services.rag.sqlite_search import register_vector_functions
+
+
+# -------------------------------------------------------------------------
+# SQLite kapcsolatok: vector_cosine SQL függvény regisztrálása
+# -------------------------------------------------------------------------
+connection_created.connect(register_vector_functions, dispatch_uid="knowledge_vector_functions")
 
 
 # -------------------------------------------------------------------------
@@ -19,14 +37,36 @@ def anonymize_knowledge_item_content(sender, instance, **kwargs):
     """
     A tudáselem eredeti tartalmát anonimizáljuk mentés előtt,
     majd az eredményt az anonymized_content mezőben tároljuk.
+    Ha a tartalom ujjlenyomata nem változott (pl. csak az is_active, a
+    kategória vagy a cím módosult), az anonimizálás és a chunkolás kimarad.
+    Háttérfeldolgozásnál az anonimizálást is a worker végzi.
     """
 
-    if not instance.content:
+    previous = None
+    if instance.pk:
+        previous = (
+            KnowledgeItem.objects.filter(pk=instance.pk)
+            .values("content_fingerprint", *INDEXED_ITEM_FIELDS)
+            .first()
+        )
+
+    fingerprint = content_fingerprint(instance.content)
+
+    # A post_save signalok ezek alapján döntenek
+    instance._content_changed = not (
+        previous
+        and previous["content_fingerprint"] == fingerprint
+        and instance.anonymized_content
+    )
+    instance._metadata_changed = bool(previous) and any(
+        previous[field] != getattr(instance, field) for field in INDEXED_ITEM_FIELDS
+    )
+    instance.content_fingerprint = fingerprint
+
+    if not instance._content_changed or not instance.content or is_async_ingestion():
         return
 
-    anonymizer = TextAnonymizerService()
-    cleaned_text = anonymizer.anonymize_text(instance.content)
-    instance.anonymized_content = cleaned_text
+    instance.anonymized_content = anonymize_content(instance.content)
 
 
 # -------------------------------------------------------------------------
@@ -36,25 +76,21 @@ def anonymize_knowledge_item_content(sender, instance, **kwargs):
 def chunk_knowledge_item(sender, instance, created, **kwargs):
     """
     A tudáselem anonimizált tartalmából automatikusan chunkokat készítünk.
-    - Először töröljük a régi chunkokat
-    - Majd új chunkokat generálunk
+    - Változatlan tartalomnál nincs újrachunkolás (csak a metaadatok frissülnek
+      a keresőbackendben)
+    - Változott tartalomnál csak a szövegükben változott chunkok cserélődnek;
+      a változatlan chunkok (és embeddingjeik) megmaradnak
+    - Háttérfeldolgozásnál a tudáselem a tranzakció lezárulta után a sorba kerül
     """
 
-    if not instance.anonymized_content:
-        return
-
-    # Régi chunkok törlése
-    instance.chunks.all().delete()
-
-    chunks = chunk_text(instance.anonymized_content, max_chars=400)
+    if getattr(instance, "_content_changed", True):
+        if is_async_ingestion():
+            transaction.on_commit(lambda: enqueue_item(instance.id))
+        elif instance.anonymized_content:
+            rechunk_item(instance)
 
-    for idx, chunk_text_value in enumerate(chunks):
-        KnowledgeChunk.objects.create(
-            item=instance,
-            index=idx,
-            content=chunk_text_value,
-            is_embedded=False
-        )
+    if getattr(instance, "_metadata_changed", False):
+        refresh_item_metadata(instance)
 
 
 # -------------------------------------------------------------------------
@@ -65,35 +101,26 @@ def embed_knowledge_chunks(sender, instance, created, **kwargs):
     """
     A tudáselemhez tartozó chunkok automatikus beágyazása.
     Minden olyan chunkra fut, amely még nincs embeddingelve.
-    ÉLES RENDSZEREKBEN AJÁNLOTT HÁTTÉRFELADAKÉNT KEZELNI.
+    Háttérfeldolgozásnál (async_ingestion) ezt a worker végzi.
     """
 
-    # AI provider kiválasztása (.env / settings alapján)
-    try:
-        client = get_ai_client("openai")  # <-- később adminból is választható lehet
-    except Exception as e:
-        print(f"❌ LLM provider inicializálása sikertelen: {e}")
+    if is_async_ingestion():
         return
 
-    embedding_service = EmbeddingService(client)
-
-    # Minden olyan chunk, ami nincs embedelve
-    chunks_to_process = instance.chunks.filter(is_embedded=False)
-
-    for chunk in chunks_to_process:
-        vector = embedding_service.create_embedding(chunk.content)
-
-        if vector is None:
-            print(f"❌ Nem sikerült embeddinget generálni: chunk #{chunk.index}")
-            continue
+    try:
+        embed_item_chunks(instance)
+    except Exception as e:
+        print(f"❌ Embedding generálás sikertelen: {e}")
 
-        # Embedding rekord mentése
-        KnowledgeEmbedding.objects.create(
-            chunk=chunk,
-            vector=vector,
-            model_name=client.embedding_model
-        )
 
-        # Chunk státusz frissítése
-        chunk.is_embedded = True
-        chunk.save(update_fields=["is_embedded"])
+# -------------------------------------------------------------------------
+# Tudáselem törlése – chunkjai egy hívással kerülnek ki a keresőből
+# -------------------------------------------------------------------------
+@receiver(pre_delete, sender=KnowledgeItem)
+def remove_item_chunks_from_index(sender, instance, **kwargs):
+    """
+    A tudáselem chunkjait (és embeddingjeit) a kaszkád törlés soronkénti
+    signal nélkül törli; a keresőbackendből a chunkok a tranzakció lezárulta
+    után, egyetlen hívással kerülnek ki.
+    """
+    remove_chunks_from_index(instance.chunks.values_list("id", flat=True))
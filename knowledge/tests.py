@@ -1,3 +1,1706 @@
-from django.test import TestCase
+#file: knowledge/tests.py
+# A tudásbázis ingestion és vektorindex rétegének tesztjei.
+# Az embedding provider helyett determinisztikus, hálózat nélküli kliens fut.
 
-# Create your tests here.
+import hashlib
+import io
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from knowledge.models import (
+    EmbeddingCacheEntry,
+    KnowledgeCategory,
+    KnowledgeChunk,
+    KnowledgeEmbedding,
+    KnowledgeItem,
+    KnowledgeJob,
+    QueryEmbeddingCacheEntry,
+    RelatedKnowledgeItem,
+)
+from services.ai_provider import get_embedding_client, get_embedding_model_name
+from services.anonymization.anonymizer_service import TextAnonymizerService
+from services.embedding.embedding_cache import evict_embedding_cache
+from services.embedding.embedding_service import EmbeddingService
+from services.embedding.local_embedding import LocalEmbeddingModel, fit_local_embedding_model
+from services.embedding.query_cache import QueryEmbeddingCache
+from services.embedding.vector_codec import decode_vector, encode_vector, truncate_vector
+from services.ingestion import job_queue
+from services.clients.local_embedding_client import LocalEmbeddingClient
+from services.ingestion.backfill import EmbeddingBackfill, activate_embedding_model, load_checkpoint
+from services.ingestion.pipeline import sync_item_chunks
+from services.rag import vector_index
+from services.rag.backends.base_backend import BaseRetrievalBackend
+from services.rag.backends.elasticsearch_backend import ElasticsearchRetrievalBackend
+from services.rag.backends.numpy_backend import NumpyRetrievalBackend
+from services.rag.backends.sqlite_backend import SQLiteRetrievalBackend
+from services.rag.index_sync import latest_generation, record_changes
+from services.rag.ivf_index import IVFIndex
+from services.rag.mmr import mmr_select
+from services.rag.parallel_search import ParallelScorer
+from services.rag.quantization import (
+    BinaryQuantizer,
+    Int8Quantizer,
+    MatryoshkaQuantizer,
+    popcount_rows,
+)
+from services.rag.rag_service import RAGService
+from services.rag.related_items import build_related_graph, get_related_items, refresh_related_items
+from services.rag.retrieval_provider import get_retrieval_backend
+from services.rag.search_result import ChunkResult, hydrate_hits
+from services.rag.sqlite_search import sql_search
+from services.rag.stacked_rows import StackedRows
+from services.rag.vector_index import VectorIndex, invalidate_vector_index, normalize_rows
+from services.rag.vector_snapshot import load_snapshot
+
+
+# -------------------------------------------------------------------------
+# Teszt segédek
+# -------------------------------------------------------------------------
+class FakeEmbeddingClient:
+    """Szavanként hash-elt, determinisztikus embedding (API hívás nélkül)."""
+
+    embedding_model = "fake-embedding"
+
+    def __init__(self, dim: int = 32):
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str):
+        vector = np.full(self.dim, 0.01)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return vector.tolist()
+
+    def get_embedding(self, text, dimensions=None):
+        self.calls += 1
+        return self._vector(text)
+
+    def get_embeddings(self, texts, dimensions=None):
+        self.calls += 1
+        return [self._vector(text) for text in texts]
+
+
+class KnowledgeTestCase(TestCase):
+    """Közös beállítás: hamis embedding kliens + üres folyamat-szintű index."""
+
+    def setUp(self):
+        self.client_stub = FakeEmbeddingClient()
+        patcher = mock.patch(
+            "services.ingestion.pipeline.get_embedding_client", return_value=self.client_stub
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Az aktív embedding modell (get_embedding_model_name) is a hamis kliensé;
+        # modellváltáshoz a self.active_client visszatérési értéke cserélhető
+        settings_override = override_settings(EMBEDDING_PROVIDER="fake")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        patcher = mock.patch("services.ai_provider.get_embedding_client", return_value=self.client_stub)
+        self.active_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        invalidate_vector_index()
+        self.addCleanup(invalidate_vector_index)
+
+    def create_item(self, title: str, content: str, **kwargs) -> KnowledgeItem:
+        return KnowledgeItem.objects.create(title=title, content=content, **kwargs)
+
+    def embedded_chunk_ids(self):
+        return sorted(KnowledgeEmbedding.objects.values_list("chunk_id", flat=True))
+
+
+def live_chunk_ids(index) -> list:
+    """A vektorindex élő (nem tombstone) sorainak chunk-id-jei, rendezve."""
+    rows = index.live_rows()
+    chunk_ids = index.chunk_ids if rows is None else index.chunk_ids[rows]
+    return sorted(chunk_ids.tolist())
+
+
+# -------------------------------------------------------------------------
+# Vektorindex snapshot + változásnapló
+# -------------------------------------------------------------------------
+class VectorSnapshotTests(KnowledgeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+
+        settings_override = override_settings(VECTOR_SNAPSHOT_DIR=snapshot_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_snapshot_is_reused_after_writes(self):
+        first = self.create_item("Víz", "A víz forráspontja száz fok.")
+        self.create_item("Fény", "A fény sebessége vákuumban állandó.")
+        call_command("build_vector_snapshot", stdout=mock.MagicMock())
+
+        # A snapshot után: új tudáselem + egy törölt tudáselem
+        self.create_item("Hang", "A hang terjedéséhez közeg kell.")
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        with mock.patch.object(
+            vector_index.VectorIndex, "from_database", wraps=vector_index.VectorIndex.from_database
+        ) as from_database:
+            index = vector_index._load_index()
+
+        # Teljes adatbázis-betöltés nem volt, csak a delta chunkjait olvastuk
+        self.assertTrue(from_database.called)
+        for call in from_database.call_args_list:
+            self.assertIsNotNone(call.kwargs.get("chunk_ids"))
+
+        self.assertEqual(live_chunk_ids(index), self.embedded_chunk_ids())
+        self.assertEqual(len(self.embedded_chunk_ids()), 2)
+
+    def test_snapshot_of_another_model_is_not_loaded(self):
+        self.create_item("Víz", "A víz forráspontja száz fok.")
+        call_command("build_vector_snapshot", stdout=mock.MagicMock())
+
+        self.assertIsNotNone(load_snapshot("fake-embedding"))
+        self.assertIsNone(load_snapshot("új-modell"))
+
+
+# -------------------------------------------------------------------------
+# IVF index – delta-szinkron
+# -------------------------------------------------------------------------
+class IVFDeltaTests(KnowledgeTestCase):
+
+    def test_updated_vector_is_reassigned_to_nearest_centroid(self):
+        for i in range(6):
+            self.create_item(f"Elem {i}", f"szöveg{i} tartalom{i} példa{i}")
+
+        index = vector_index.VectorIndex.from_database()
+        index.load_metadata()
+        index.attach_ann(IVFIndex.train(index.chunk_ids, index.matrix, nlist=3))
+
+        # Az első chunk új vektora egy másik klaszter centroidja felé mutat
+        chunk_id = int(index.chunk_ids[0])
+        old_list = int(index.ann.assign(index.matrix[:1])[0])
+        target_list = (old_list + 1) % index.ann.nlist
+
+        embedding = KnowledgeEmbedding.objects.get(chunk_id=chunk_id)
+        embedding.set_vector(index.ann.centroids[target_list].tolist())
+        embedding.save()
+
+        updated = index.apply_delta([chunk_id])
+
+        lists_with_chunk = [n for n, ids in enumerate(updated.ann.lists) if chunk_id in ids]
+        self.assertEqual(lists_with_chunk, [target_list])
+
+
+# -------------------------------------------------------------------------
+# Delta-szinkron – overlay + tombstone
+# -------------------------------------------------------------------------
+class VectorIndexDeltaTests(KnowledgeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.items = [
+            self.create_item(f"Elem {i}", f"téma{i} leírás{i} részlet{i % 3}") for i in range(6)
+        ]
+
+    def load_index(self) -> vector_index.VectorIndex:
+        index = vector_index.VectorIndex.from_database()
+        index.load_metadata()
+        index.generation = latest_generation()
+        return index
+
+    def change_knowledge_base(self):
+        """Egy új, egy módosított és egy törölt tudáselem; visszatér a változott chunkokkal."""
+        before = set(self.embedded_chunk_ids())
+
+        self.create_item("Új elem", "egészen új téma friss leírás")
+
+        updated = self.items[1]
+        updated.content = "teljesen átírt tartalom más szavakkal"
+        updated.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[2].delete()
+
+        after = set(self.embedded_chunk_ids())
+        return sorted(before ^ after)
+
+    def assert_same_results(self, index, reference, queries):
+        for text in queries:
+            query = self.client_stub.get_embedding(text)
+            found = index.search(query, 4, mask=index.filter_mask())
+            expected = reference.search(query, 4, mask=reference.filter_mask())
+            self.assertEqual([round(score, 5) for _, score in found], [round(score, 5) for _, score in expected])
+            self.assertEqual(len({cid for cid, _ in found}), len(found))
+
+    def test_apply_delta_keeps_base_matrix_and_matches_full_reload(self):
+        index = self.load_index()
+        base = index.matrix
+
+        changed = self.change_knowledge_base()
+        updated = index.apply_delta(changed)
+
+        # Az alap mátrix nem másolódott, csak az új sorok kerültek az overlay-be
+        self.assertIs(updated.matrix.base, base)
+        self.assertGreater(updated.overlay_rows, 0)
+        self.assertEqual(live_chunk_ids(updated), self.embedded_chunk_ids())
+
+        self.assert_same_results(
+            updated, self.load_index(), ["téma1 leírás1", "egészen új téma", "átírt tartalom", "téma2"]
+        )
+
+    def test_apply_delta_with_ann_quantizer_and_item_centroids(self):
+        index = self.load_index()
+        index.attach_ann(IVFIndex.train(index.chunk_ids, index.matrix, nlist=2, nprobe=2))
+        index.attach_quantizer(Int8Quantizer(), oversample=10)
+        index.attach_item_centroids(top_m=10)
+
+        updated = index.apply_delta(self.change_knowledge_base())
+
+        self.assertEqual(updated.quantizer.codes.shape[0], len(updated))
+        live = set(live_chunk_ids(updated))
+        ann_ids = set(np.concatenate(updated.ann.lists).tolist())
+        self.assertEqual(ann_ids, live)
+
+        self.assert_same_results(updated, self.load_index(), ["téma1 leírás1", "egészen új téma", "téma2"])
+
+    def test_parallel_scorer_is_not_rebuilt_on_delta(self):
+        index = self.load_index()
+        scorer = ParallelScorer(index.matrix, workers=1, min_rows=0)
+        self.addCleanup(scorer.close)
+        index.attach_parallel(scorer)
+
+        updated = index.apply_delta(self.change_knowledge_base())
+
+        self.assertIs(updated.parallel, scorer)
+        self.assert_same_results(updated, self.load_index(), ["egészen új téma", "átírt tartalom"])
+
+    def test_default_filter_skips_inactive_items_without_gathering_rows(self):
+        inactive = self.create_item("Inaktív", "téma1 leírás1 részlet1", is_active=False)
+        index = self.load_index()
+        updated = index.apply_delta(self.change_knowledge_base())
+        self.assertIsNotNone(updated.tombstones)
+
+        inactive_chunks = set(inactive.chunks.values_list("id", flat=True))
+        query = self.client_stub.get_embedding("téma1 leírás1 részlet1")
+
+        # Sűrű maszk: a teljes mátrixot pontozzuk, sorok kigyűjtése (másolás) nélkül
+        with mock.patch.object(StackedRows, "__getitem__", side_effect=AssertionError("sorgyűjtés")):
+            found = updated.search(query, len(updated), mask=updated.filter_mask())
+            found_many = updated.search_many([query], len(updated), mask=updated.filter_mask())[0]
+
+        for hits in (found, found_many):
+            ids = {chunk_id for chunk_id, _ in hits}
+            self.assertTrue(ids)
+            self.assertFalse(ids & inactive_chunks)
+            self.assertTrue(ids <= set(live_chunk_ids(updated)))
+
+        self.assert_same_results(updated, self.load_index(), ["téma1 leírás1 részlet1", "egészen új téma"])
+
+    def test_sync_index_applies_log_and_merges_large_overlay(self):
+        index = self.load_index()
+        self.create_item("Új elem", "egészen új téma friss leírás")
+        self.create_item("Másik új elem", "még egy friss bejegyzés")
+
+        synced = vector_index._sync_index(index)
+        self.assertEqual(synced.generation, latest_generation())
+        self.assertEqual(live_chunk_ids(synced), self.embedded_chunk_ids())
+        self.assertEqual(synced.overlay_rows, 2)
+
+        # Egyetlen naplózott változás (a lemaradás a korlát alatt), de az overlay
+        # már nagyobb a korlátnál → teljes újratöltés, összeolvasztott mátrix
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[0].delete()
+        self.assertEqual(latest_generation() - synced.generation, 1)
+        with override_settings(RAG_SETTINGS={"sync_max_delta": 1}):
+            reloaded = vector_index._sync_index(synced)
+
+        self.assertEqual(reloaded.overlay_rows, 0)
+        self.assertIsNone(reloaded.tombstones)
+        self.assertEqual(live_chunk_ids(reloaded), self.embedded_chunk_ids())
+
+
+# -------------------------------------------------------------------------
+# Kapcsolódó tudáselemek – frissítés a háttérsorban
+# -------------------------------------------------------------------------
+class RelatedItemsQueueTests(KnowledgeTestCase):
+
+    def test_save_only_enqueues_related_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_item("Víz", "a víz forráspontja száz fok")
+            second = self.create_item("Jég", "a víz fagyáspontja nulla fok")
+            first.content = "a víz forráspontja tengerszinten száz fok"
+            first.save()
+
+        # A mentés nem számolt szomszédokat, tudáselemenként egy feladat vár
+        self.assertFalse(RelatedKnowledgeItem.objects.exists())
+        jobs = KnowledgeJob.objects.filter(kind=KnowledgeJob.KIND_RELATED)
+        self.assertEqual(sorted(jobs.values_list("item_id", flat=True)), [first.id, second.id])
+
+        call_command("run_knowledge_worker", "--once", stdout=mock.MagicMock())
+
+        self.assertFalse(KnowledgeJob.objects.exists())
+        self.assertEqual(
+            list(RelatedKnowledgeItem.objects.filter(item=first).values_list("related_id", flat=True)),
+            [second.id],
+        )
+
+
+# -------------------------------------------------------------------------
+# Szöveges keresés – ékezetes kis- és nagybetűk
+# -------------------------------------------------------------------------
+class TextSearchTests(KnowledgeTestCase):
+
+    def test_accented_capitals_match_case_insensitively(self):
+        titled = self.create_item("Árvíz", "Az ÁRVÍZ idején a gátakat árvíz ellen erősítik.")
+        other = self.create_item("Gát", "A gát mögött ÁRVÍZTŰRŐ tükörfúrógép áll.")
+        self.create_item("Hegy", "A hegyek magasak.")
+
+        results = BaseRetrievalBackend().search_text("árvíz", 5)
+
+        chunk_ids = {chunk.item_id: chunk.id for chunk in titled.chunks.all() | other.chunks.all()}
+        self.assertEqual(results, [(chunk_ids[titled.id], 4.0), (chunk_ids[other.id], 1.0)])
+        self.assertEqual(BaseRetrievalBackend().search_text("ŐSZ", 5), [])
+
+
+# -------------------------------------------------------------------------
+# Modellváltás – előkészítés a régi modell mellett, explicit aktiválás
+# -------------------------------------------------------------------------
+class ModelSwitchTests(KnowledgeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.create_item(f"Elem {i}", f"modellváltás szöveg{i}")
+        self.chunk_ids = self.embedded_chunk_ids()
+
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint_path = f"{checkpoint_dir.name}/backfill.json"
+
+        self.target = FakeEmbeddingClient(dim=16)
+        self.target.embedding_model = "új-modell"
+
+    def stage(self):
+        backend = mock.Mock()
+        with mock.patch("services.ingestion.backfill.get_retrieval_backend", return_value=backend):
+            stats = EmbeddingBackfill(self.target, workers=1, checkpoint_path=self.checkpoint_path).run()
+        return stats, backend
+
+    def test_staged_backfill_keeps_search_on_the_active_model(self):
+        stats, backend = self.stage()
+
+        self.assertEqual((stats["embedded"], stats["completed"]), (5, True))
+        backend.index.assert_not_called()
+        self.assertEqual(KnowledgeEmbedding.objects.filter(model_name="új-modell").count(), 5)
+        self.assertEqual(KnowledgeChunk.objects.filter(is_embedded=True).count(), 5)
+
+        # A keresés a régi modell vektoraival fut, a két modell vektorai nem keverednek
+        index = vector_index.get_vector_index()
+        self.assertEqual((index.model_name, index.dim), ("fake-embedding", 32))
+        self.assertEqual(live_chunk_ids(index), self.chunk_ids)
+
+        query = self.client_stub.get_embedding("modellváltás")
+        self.assertEqual(sorted(chunk_id for chunk_id, _ in sql_search(query, top_k=20)), self.chunk_ids)
+
+    def test_activation_switches_the_index_and_prunes_old_vectors(self):
+        self.stage()
+        self.assertEqual(vector_index.get_vector_index().model_name, "fake-embedding")
+
+        # Az aktív modell cseréje a sync_interval letelte előtt is újratöltést vált ki
+        self.active_client.return_value = self.target
+        index = vector_index.get_vector_index()
+        self.assertEqual((index.model_name, index.dim), ("új-modell", 16))
+        self.assertEqual(live_chunk_ids(index), self.chunk_ids)
+
+        # A régi modell dimenziójú query nem pontozódik az új vektorokon
+        self.assertEqual(index.search(np.ones(32), top_k=3), [])
+
+        with mock.patch("services.ingestion.pipeline.get_retrieval_backend") as index_backend:
+            removed = activate_embedding_model("új-modell", batch_size=2)
+
+        self.assertEqual(removed, 5)
+        index_backend.assert_not_called()
+        self.assertEqual(set(KnowledgeEmbedding.objects.values_list("model_name", flat=True)), {"új-modell"})
+        self.assertEqual(KnowledgeChunk.objects.filter(is_embedded=True).count(), 5)
+
+
+class LocalModelSwitchCommandTests(KnowledgeTestCase):
+    """fit_local_embeddings → backfill_embeddings --local-model ... --activate, valódi helyi modellel."""
+
+    def setUp(self):
+        super().setUp()
+        for title, content in (
+            ("Víz", "A víz forráspontja tengerszinten száz fok."),
+            ("Fény", "A fény sebessége vákuumban állandó."),
+            ("Hang", "A hang terjedéséhez közeg kell, vákuumban nem terjed."),
+            ("Vulkán", "A vulkánkitörést a felszín alatti magma nyomása okozza."),
+        ):
+            self.create_item(title, content)
+        self.chunk_ids = self.embedded_chunk_ids()
+
+        model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(model_dir.cleanup)
+        self.model_dir = model_dir.name
+
+        settings_override = override_settings(
+            EMBEDDING_PROVIDER="local",
+            LOCAL_EMBEDDING_SETTINGS={"model_path": f"{self.model_dir}/active.npz"},
+            EMBEDDING_BACKFILL_CHECKPOINT=f"{self.model_dir}/backfill.json",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # Az aktív modell a LOCAL_EMBEDDING_SETTINGS["model_path"] fájlból jön
+        self.active_client.return_value = None
+        self.active_client.side_effect = LocalEmbeddingClient
+
+    def fit(self, dimensions: int) -> str:
+        out = io.StringIO()
+        call_command(
+            "fit_local_embeddings", "--dimensions", str(dimensions), "--svd-components", "2",
+            "--min-df", "1", "--buckets", "1024", stdout=out,
+        )
+        return out.getvalue().split("--local-model ")[1].split()[0]
+
+    def backfill(self, *args) -> str:
+        out = io.StringIO()
+        call_command("backfill_embeddings", "--workers", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_new_model_is_served_only_after_complete_backfill(self):
+        first = self.fit(24)
+        self.assertNotEqual(first, f"{self.model_dir}/active.npz")
+
+        self.backfill("--local-model", first, "--activate")
+        first_model = LocalEmbeddingClient(model_path=first).embedding_model
+        self.assertEqual(set(KnowledgeEmbedding.objects.values_list("model_name", flat=True)), {first_model})
+        self.assertEqual(vector_index.get_vector_index().model_name, first_model)
+
+        # Újratanítás: a részleges backfill után az aktiválás elmarad, a régi modell szolgál ki
+        second = self.fit(16)
+        output = self.backfill("--local-model", second, "--limit", "2", "--activate")
+        self.assertIn("Az aktiválás elmarad", output)
+
+        index = vector_index.get_vector_index()
+        self.assertEqual((index.model_name, index.dim), (first_model, 24))
+        self.assertEqual(live_chunk_ids(index), self.chunk_ids)
+
+        self.backfill("--local-model", second, "--activate")
+        second_model = LocalEmbeddingClient(model_path=second).embedding_model
+
+        index = vector_index.get_vector_index()
+        self.assertEqual((index.model_name, index.dim), (second_model, 16))
+        self.assertEqual(live_chunk_ids(index), self.chunk_ids)
+        self.assertEqual(set(KnowledgeEmbedding.objects.values_list("model_name", flat=True)), {second_model})
+
+
+# -------------------------------------------------------------------------
+# Query embedding cache
+# -------------------------------------------------------------------------
+class QueryEmbeddingCacheTests(TestCase):
+
+    def test_vectors_are_cached_as_read_only_float32_arrays(self):
+        cache = QueryEmbeddingCache(lru_size=10, max_entries=100, ttl_seconds=0)
+        cache.set("modell", "Mi a  VÍZ?", [0.5, 0.25])
+
+        with self.assertNumQueries(0):
+            vector = cache.get("modell", "mi a víz?")
+
+        self.assertIsInstance(vector, np.ndarray)
+        self.assertEqual(vector.dtype, np.float32)
+        self.assertFalse(vector.flags.writeable)
+        self.assertEqual(vector.tolist(), [0.5, 0.25])
+
+        # Üres LRU mellett a megosztott táblából jön, ugyanígy ndarray-ként
+        cache.clear_local()
+        from_db = cache.get_many("modell", ["MI A VÍZ?", "ismeretlen"])
+        self.assertEqual(from_db[0].tolist(), [0.5, 0.25])
+        self.assertIsNone(from_db[1])
+        self.assertEqual((cache.hits, cache.db_hits, cache.misses), (1, 1, 1))
+
+    def test_eviction_is_throttled(self):
+        cache = QueryEmbeddingCache(lru_size=0, max_entries=100, ttl_seconds=60)
+
+        with mock.patch.object(cache, "evict") as evict:
+            for i in range(9):
+                cache.set("modell", f"kérdés {i}", [1.0])
+            evict.assert_not_called()
+
+            # A korlát 10%-ának megfelelő írás után takarít
+            cache.set("modell", "kérdés 9", [1.0])
+            self.assertEqual(evict.call_count, 1)
+
+            # ... vagy ha letelt az időköz
+            cache._last_evict -= 3600
+            cache.set("modell", "kérdés 10", [1.0])
+            self.assertEqual(evict.call_count, 2)
+
+
+# -------------------------------------------------------------------------
+# RAGService – sharded koordinátor
+# -------------------------------------------------------------------------
+class ShardedSearchTests(KnowledgeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            self.create_item(f"Víz {i}", f"víz forráspont száz fok tenger{i}")
+        self.create_item("Jég", "víz fagyáspont nulla fok jég")
+        self.create_item("Gőz", "víz gőz forráspont pára")
+
+        self.index = vector_index.VectorIndex.from_database()
+        self.index.load_metadata()
+        self.scattered = []
+
+    def scatter(self, query_vectors, top_k, category_name=None, filters=None):
+        # Egyetlen "nódus": a teljes index, a koordinátor összefésülése után
+        self.scattered.append(top_k)
+        mask = self.index.filter_mask(**(filters or {}))
+        return [self.index.search(v, top_k, mask=mask) for v in query_vectors], []
+
+    def search(self, **kwargs):
+        rag_settings = {"search_nodes": ["http://a"], "mmr_lambda": 0.3, "mmr_pool_size": 10}
+        with override_settings(RAG_SETTINGS=rag_settings), \
+                mock.patch("services.rag.rag_service.scatter_search", side_effect=self.scatter):
+            hits = RAGService(embedding_client=self.client_stub).search("víz forráspont fok", top_k=3, **kwargs)
+        return [chunk.id for chunk, _ in hits]
+
+    def test_mmr_is_applied_to_the_merged_node_results(self):
+        query = self.client_stub.get_embedding("víz forráspont fok")
+        expected = self.index.search(
+            query, 3, mask=self.index.filter_mask(), mmr_lambda=0.3, mmr_pool_size=10
+        )
+
+        diversified = self.search(diversify=True)
+        self.assertEqual(self.scattered, [10])
+        self.assertEqual(diversified, [chunk_id for chunk_id, _ in expected])
+
+        self.assertNotEqual(self.search(diversify=False), diversified)
+        self.assertEqual(self.scattered, [10, 3])
+
+
+# -------------------------------------------------------------------------
+# RAGService – azonos találati lista minden index_mode-ban
+# -------------------------------------------------------------------------
+class SearchThresholdTests(KnowledgeTestCase):
+
+    def test_threshold_does_not_change_results_between_backends(self):
+        for i in range(4):
+            self.create_item(f"Elem {i}", f"közös szó{i} egyedi{i} tartalom")
+        self.create_item("Más", "teljesen eltérő dolog")
+
+        results = {}
+        for mode in ("memory", "sqlite"):
+            with override_settings(RAG_SETTINGS={"index_mode": mode}):
+                rag = RAGService(embedding_client=self.client_stub)
+                hits = rag.search("közös szó0 egyedi0", top_k=4, threshold=0.9)
+                (many,) = rag.search_many(["közös szó0 egyedi0"], top_k=4, threshold=0.9)
+            results[mode] = [[round(score, 4) for _, score in found] for found in (hits, many)]
+
+        self.assertEqual(results["memory"], results["sqlite"])
+
+        # A threshold alatti találatok is visszajönnek (a hívó jelöli őket)
+        scores = results["sqlite"][0]
+        self.assertEqual(len(scores), 4)
+        self.assertLess(min(scores), 0.9)
+
+
+# -------------------------------------------------------------------------
+# Vektorindex – pontos TOP-K keresés
+# -------------------------------------------------------------------------
+class VectorIndexSearchTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.vectors = rng.normal(size=(40, 16))
+        self.chunk_ids = np.arange(100, 140)
+        self.index = VectorIndex(self.chunk_ids, normalize_rows(self.vectors))
+
+    def brute_force(self, query, top_k, rows=None):
+        unit = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        scores = unit @ (query / np.linalg.norm(query))
+        rows = np.arange(len(scores)) if rows is None else rows
+        best = rows[np.argsort(-scores[rows])][:top_k]
+        return [(int(self.chunk_ids[pos]), float(scores[pos])) for pos in best]
+
+    def assert_hits(self, found, expected):
+        self.assertEqual([chunk_id for chunk_id, _ in found], [chunk_id for chunk_id, _ in expected])
+        for (_, score), (_, expected_score) in zip(found, expected):
+            self.assertAlmostEqual(score, expected_score, places=5)
+
+    def test_top_k_matches_brute_force_cosine(self):
+        query = self.vectors[3] + 0.1
+        self.assert_hits(self.index.search(query, 5), self.brute_force(query, 5))
+        self.assertEqual(len(self.index.search(query, 100)), 40)
+
+    def test_mask_limits_the_scanned_rows(self):
+        mask = np.zeros(40, dtype=bool)
+        mask[::3] = True
+        query = self.vectors[4]
+        expected = self.brute_force(query, 4, np.flatnonzero(mask))
+        self.assert_hits(self.index.search(query, 4, mask=mask), expected)
+
+    def test_empty_or_mismatched_query_has_no_hits(self):
+        self.assertEqual(self.index.search(np.zeros(16), 3), [])
+        self.assertEqual(self.index.search(np.ones(8), 3), [])
+        self.assertEqual(VectorIndex().search(np.ones(16), 3), [])
+
+
+# -------------------------------------------------------------------------
+# Bináris vektortárolás
+# -------------------------------------------------------------------------
+class VectorCodecTests(TestCase):
+
+    def test_float32_round_trip_is_exact(self):
+        vector = np.linspace(-1.0, 1.0, 12)
+        data = encode_vector(vector)
+
+        self.assertEqual(len(data), 12 * 4)
+        decoded = decode_vector(data)
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_array_equal(decoded, vector.astype(np.float32))
+
+    def test_float16_halves_the_size(self):
+        vector = np.linspace(-1.0, 1.0, 12)
+        data = encode_vector(vector, "float16")
+
+        self.assertEqual(len(data), 12 * 2)
+        decoded = decode_vector(data, "float16")
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_allclose(decoded, vector, atol=1e-3)
+
+    def test_empty_and_unknown_types(self):
+        self.assertEqual(decode_vector(b"").size, 0)
+        with self.assertRaises(ValueError):
+            encode_vector([1.0], "float64")
+
+
+def store_embeddings(vectors, title: str = "Elem", **item_fields) -> list:
+    """Tudáselem chunkokkal és közvetlenül tárolt embeddingekkel (embedding provider nélkül)."""
+    item = KnowledgeItem.objects.create(title=title, content="", **item_fields)
+    chunk_ids = []
+    for idx, vector in enumerate(vectors):
+        chunk = KnowledgeChunk.objects.create(item=item, index=idx, content=f"{title} {idx}", is_embedded=True)
+        embedding = KnowledgeEmbedding(chunk=chunk, model_name=get_embedding_model_name())
+        embedding.set_vector(list(vector))
+        embedding.save()
+        chunk_ids.append(chunk.id)
+    return chunk_ids
+
+
+# -------------------------------------------------------------------------
+# Memory-mappelt snapshot
+# -------------------------------------------------------------------------
+class MappedSnapshotTests(TestCase):
+
+    def setUp(self):
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+
+        settings_override = override_settings(VECTOR_SNAPSHOT_DIR=snapshot_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        vector_index.invalidate_vector_index()
+        self.addCleanup(vector_index.invalidate_vector_index)
+
+    def test_workers_map_the_snapshot_instead_of_decoding_the_database(self):
+        chunk_ids = store_embeddings(np.eye(4)[:3] + 0.1)
+        call_command("build_vector_snapshot", stdout=mock.MagicMock())
+
+        with mock.patch.object(vector_index.VectorIndex, "from_database") as from_database:
+            index = vector_index.get_vector_index()
+
+        from_database.assert_not_called()
+        self.assertEqual(sorted(index.chunk_ids.tolist()), chunk_ids)
+        self.assertEqual(index.search(np.eye(4)[1], 1)[0][0], chunk_ids[1])
+
+
+# -------------------------------------------------------------------------
+# IVF közelítő keresés
+# -------------------------------------------------------------------------
+class IVFIndexTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        centers = rng.normal(size=(4, 16)) * 4
+        self.vectors = normalize_rows(np.repeat(centers, 25, axis=0) + rng.normal(size=(100, 16)))
+        self.chunk_ids = np.arange(1, 101)
+        self.queries = self.vectors[::10] + 0.05
+
+    def ivf_index(self, nprobe):
+        index = VectorIndex(self.chunk_ids, self.vectors)
+        index.attach_ann(IVFIndex.train(self.chunk_ids, index.matrix, nlist=4, nprobe=nprobe))
+        return index
+
+    def test_probing_every_list_equals_exact_search(self):
+        exact = VectorIndex(self.chunk_ids, self.vectors)
+        approximate = self.ivf_index(nprobe=4)
+
+        for query in self.queries:
+            self.assertEqual(approximate.search(query, 5), exact.search(query, 5))
+
+    def test_single_probe_scores_one_list_with_exact_cosines(self):
+        exact = VectorIndex(self.chunk_ids, self.vectors)
+        approximate = self.ivf_index(nprobe=1)
+        exact_scores = dict(exact.search(self.queries[0], 100))
+
+        hits = approximate.search(self.queries[0], 5)
+        self.assertTrue(hits)
+        found = {chunk_id for chunk_id, _ in hits}
+        self.assertTrue(any(found <= set(ids.tolist()) for ids in approximate.ann.lists))
+        for chunk_id, score in hits:
+            self.assertAlmostEqual(score, exact_scores[chunk_id], places=5)
+
+    def test_saved_index_reattaches_and_assigns_new_chunks(self):
+        trained = IVFIndex.train(self.chunk_ids[:80], self.vectors[:80], nlist=4, nprobe=4)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/ivf.npz"
+            trained.save(path)
+            loaded = IVFIndex.load(path)
+
+        index = VectorIndex(self.chunk_ids, self.vectors)
+        index.attach_ann(loaded)
+
+        self.assertEqual(sorted(np.concatenate(loaded.lists).tolist()), self.chunk_ids.tolist())
+        self.assertEqual(index.search(self.vectors[95], 1)[0][0], 96)
+
+
+# -------------------------------------------------------------------------
+# Kvantált előszűrés
+# -------------------------------------------------------------------------
+class QuantizedShortlistTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.vectors = normalize_rows(rng.normal(size=(200, 32)))
+        self.chunk_ids = np.arange(1, 201)
+        self.exact = VectorIndex(self.chunk_ids, self.vectors)
+
+    def test_popcount_counts_set_bits(self):
+        bits = np.array([[0, 1, 3], [2**63, 2**64 - 1, 0]], dtype=np.uint64)
+        self.assertEqual(popcount_rows(bits).tolist(), [3, 65])
+
+    def test_shortlist_is_rescored_with_the_full_vectors(self):
+        for quantizer in (Int8Quantizer(), BinaryQuantizer()):
+            index = VectorIndex(self.chunk_ids, self.vectors)
+            index.attach_quantizer(quantizer, oversample=10)
+
+            for query in self.vectors[:20] + 0.01:
+                hits = index.search(query, 5)
+                exact_scores = dict(self.exact.search(query, 200))
+                self.assertEqual(hits[0], self.exact.search(query, 1)[0])
+                for chunk_id, score in hits:
+                    self.assertAlmostEqual(score, exact_scores[chunk_id], places=5)
+
+    def test_shortlist_respects_the_row_mask(self):
+        index = VectorIndex(self.chunk_ids, self.vectors)
+        index.attach_quantizer(Int8Quantizer(), oversample=4)
+        mask = np.zeros(200, dtype=bool)
+        mask[100:] = True
+
+        hits = index.search(self.vectors[0], 5, mask=mask)
+
+        self.assertEqual(len(hits), 5)
+        self.assertTrue(all(chunk_id > 100 for chunk_id, _ in hits))
+
+
+# -------------------------------------------------------------------------
+# Matryoshka előtag-vektorok
+# -------------------------------------------------------------------------
+class MatryoshkaTests(TestCase):
+
+    def test_truncated_prefix_is_unit_length(self):
+        short = truncate_vector([3.0, 4.0, 12.0], 2)
+        np.testing.assert_allclose(short, [0.6, 0.8], atol=1e-6)
+
+    @override_settings(EMBEDDING_SHORT_DIMENSIONS=8)
+    def test_embedding_stores_the_short_prefix(self):
+        vector = np.arange(1, 33, dtype=np.float32)
+        store_embeddings([vector])
+        embedding = KnowledgeEmbedding.objects.get()
+
+        self.assertEqual(embedding.short_dimensions, 8)
+        np.testing.assert_allclose(embedding.get_short_vector(), truncate_vector(vector, 8), atol=1e-6)
+
+    @override_settings(EMBEDDING_SHORT_DIMENSIONS=8)
+    def test_two_stage_search_rescores_with_the_full_vectors(self):
+        rng = np.random.default_rng(3)
+        vectors = rng.normal(size=(30, 32))
+        chunk_ids = store_embeddings(vectors)
+
+        index = VectorIndex.from_database()
+        self.assertEqual(index.short_matrix.shape, (30, 8))
+
+        exact = VectorIndex(index.chunk_ids, index.matrix)
+        quantizer = MatryoshkaQuantizer(dimensions=8)
+        quantizer.codes = index.short_matrix
+        index.attach_quantizer(quantizer, oversample=10)
+
+        query = vectors[7] + 0.01
+        exact_scores = dict(exact.search(query, 30))
+        hits = index.search(query, 3)
+        self.assertEqual(hits[0][0], chunk_ids[7])
+        for chunk_id, score in hits:
+            self.assertAlmostEqual(score, exact_scores[chunk_id], places=5)
+
+
+# -------------------------------------------------------------------------
+# Kategória-shardok
+# -------------------------------------------------------------------------
+class CategoryShardTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        self.vectors = rng.normal(size=(12, 16))
+        hr, it = (KnowledgeCategory.objects.create(name=name) for name in ("HR", "IT"))
+        self.hr_ids = store_embeddings(self.vectors[:6], "HR", category=hr)
+        self.it_ids = store_embeddings(self.vectors[6:], "IT", category=it)
+
+        self.index = VectorIndex.from_database()
+        self.index.load_metadata()
+
+    def test_shards_hold_their_category_rows(self):
+        self.assertEqual(sorted(self.index.chunk_ids[self.index.shard_rows("HR")].tolist()), self.hr_ids)
+        self.assertEqual(sorted(self.index.chunk_ids[self.index.shard_rows("IT")].tolist()), self.it_ids)
+        self.assertIsNone(self.index.shard_rows("Ismeretlen"))
+
+    def test_shard_search_only_returns_its_category(self):
+        query = self.vectors[0]
+        hits = self.index.search(query, 3, rows=self.index.shard_rows("IT"))
+
+        self.assertEqual(len(hits), 3)
+        self.assertTrue(all(chunk_id in self.it_ids for chunk_id, _ in hits))
+        self.assertEqual(self.index.search(query, 1, rows=self.index.shard_rows("HR"))[0][0], self.hr_ids[0])
+
+
+# -------------------------------------------------------------------------
+# Metaadat-szűrés maszkokkal
+# -------------------------------------------------------------------------
+class FilterMaskTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(13)
+        self.vectors = rng.normal(size=(9, 16))
+        self.category = KnowledgeCategory.objects.create(name="Jog")
+        self.active_ids = store_embeddings(self.vectors[:3], "Aktív")
+        self.inactive_ids = store_embeddings(self.vectors[3:6], "Inaktív", is_active=False)
+        self.category_ids = store_embeddings(self.vectors[6:], "Kategória", category=self.category)
+
+        self.index = VectorIndex.from_database()
+        self.index.load_metadata()
+
+    def found(self, **filters):
+        hits = self.index.search(self.vectors[4], 9, mask=self.index.filter_mask(**filters))
+        return sorted(chunk_id for chunk_id, _ in hits)
+
+    def test_inactive_items_are_excluded_by_default(self):
+        self.assertEqual(self.found(), sorted(self.active_ids + self.category_ids))
+        self.assertEqual(self.found(is_active=False), self.inactive_ids)
+        self.assertEqual(len(self.found(is_active=None)), 9)
+
+    def test_filters_combine_with_and(self):
+        item_id = KnowledgeChunk.objects.get(id=self.active_ids[0]).item_id
+
+        self.assertEqual(self.found(category_ids=[self.category.id]), self.category_ids)
+        self.assertEqual(self.found(item_ids=[item_id]), self.active_ids)
+        self.assertEqual(self.found(exclude_item_ids=[item_id]), self.category_ids)
+        self.assertIsNone(VectorIndex(np.arange(2), np.eye(2)).filter_mask())
+
+
+# -------------------------------------------------------------------------
+# Batch keresés
+# -------------------------------------------------------------------------
+class SearchManyTests(TestCase):
+
+    def test_batch_matches_single_queries(self):
+        rng = np.random.default_rng(17)
+        index = VectorIndex(np.arange(1, 51), normalize_rows(rng.normal(size=(50, 16))))
+        queries = rng.normal(size=(6, 16))
+        mask = np.arange(50) % 2 == 0
+
+        for batch, query in zip(index.search_many(queries, 4), queries):
+            self.assertEqual([c for c, _ in batch], [c for c, _ in index.search(query, 4)])
+        for batch, query in zip(index.search_many(queries, 4, mask=mask), queries):
+            self.assertEqual([c for c, _ in batch], [c for c, _ in index.search(query, 4, mask=mask)])
+
+    def test_missing_query_vectors_have_no_hits(self):
+        index = VectorIndex(np.arange(1, 4), np.eye(3))
+        self.assertEqual(index.search_many([None, [1.0, 0.0, 0.0]], 1), [[], [(1, 1.0)]])
+
+
+# -------------------------------------------------------------------------
+# MMR diverzifikálás
+# -------------------------------------------------------------------------
+class MMRTests(TestCase):
+
+    def setUp(self):
+        # Két majdnem azonos és egy eltérő irányú jelölt
+        self.candidates = normalize_rows(np.array([[1.0, 0.0, 0.0], [0.99, 0.05, 0.0], [0.6, 0.8, 0.0]]))
+        self.relevance = np.array([0.9, 0.89, 0.7])
+
+    def test_pure_relevance_keeps_the_score_order(self):
+        self.assertEqual(mmr_select(self.candidates, self.relevance, 3, lambda_=1.0).tolist(), [0, 1, 2])
+
+    def test_near_duplicates_are_pushed_back(self):
+        self.assertEqual(mmr_select(self.candidates, self.relevance, 2, lambda_=0.5).tolist(), [0, 2])
+        self.assertEqual(mmr_select(self.candidates, self.relevance, 0).size, 0)
+
+    def test_index_search_diversifies_the_candidate_pool(self):
+        index = VectorIndex(np.array([10, 11, 12]), self.candidates)
+        query = np.array([1.0, 0.0, 0.0])
+
+        self.assertEqual([c for c, _ in index.search(query, 2)], [10, 11])
+        self.assertEqual([c for c, _ in index.search(query, 2, mmr_lambda=0.3)], [10, 12])
+
+
+# -------------------------------------------------------------------------
+# Találatok betöltése
+# -------------------------------------------------------------------------
+class HydrateHitsTests(TestCase):
+
+    def test_hits_keep_their_order_in_one_query(self):
+        chunk_ids = store_embeddings(np.eye(3), "Kézikönyv")
+        hits = [(chunk_ids[2], 0.9), (chunk_ids[0], 0.5)]
+
+        with self.assertNumQueries(1):
+            results = hydrate_hits(hits)
+
+        self.assertEqual([(chunk.id, score) for chunk, score in results], hits)
+        chunk, _ = results[0]
+        self.assertIsInstance(chunk, ChunkResult)
+        self.assertEqual((chunk.item_title, chunk.index, chunk.content), ("Kézikönyv", 2, "Kézikönyv 2"))
+
+    def test_deleted_chunks_are_skipped(self):
+        chunk_ids = store_embeddings(np.eye(2))
+        self.assertEqual(hydrate_hits([(chunk_ids[0] + 100, 0.9)]), [])
+        with self.assertNumQueries(0):
+            self.assertEqual(hydrate_hits([]), [])
+
+
+# -------------------------------------------------------------------------
+# Adatbázison belüli (SQLite) vektorkeresés
+# -------------------------------------------------------------------------
+class SQLiteSearchTests(KnowledgeTestCase):
+
+    def test_matches_memory_index_and_applies_threshold(self):
+        for i in range(5):
+            self.create_item(f"Elem {i}", f"közös szó{i} egyedi{i} tartalom")
+        self.create_item("Inaktív", "közös szó0 egyedi0 tartalom", is_active=False)
+
+        index = vector_index.VectorIndex.from_database()
+        index.load_metadata()
+        query = self.client_stub.get_embedding("közös szó0 egyedi0")
+
+        expected = index.search(query, 3, mask=index.filter_mask())
+        found = sql_search(query, 3)
+        # Azonos pontszámú sorok sorrendje eltérhet, ezért a pontszámokat vetjük össze
+        self.assertEqual(found[0][0], expected[0][0])
+        self.assertEqual(len(found), len(expected))
+        for (_, score), (_, expected_score) in zip(found, expected):
+            self.assertAlmostEqual(score, expected_score, places=4)
+
+        threshold = expected[1][1] - 1e-6
+        self.assertEqual(len(sql_search(query, 3, min_score=threshold)), 2)
+
+
+# -------------------------------------------------------------------------
+# Párhuzamos pontozás (shared memory + process pool)
+# -------------------------------------------------------------------------
+class ParallelScorerTests(TestCase):
+
+    def test_sharded_scoring_matches_the_single_process_scan(self):
+        rng = np.random.default_rng(23)
+        matrix = normalize_rows(rng.normal(size=(300, 16)))
+        exact = VectorIndex(np.arange(300), matrix)
+
+        index = VectorIndex(np.arange(300), matrix)
+        scorer = ParallelScorer(index.matrix, workers=2, shard_count=3, min_rows=0)
+        self.addCleanup(scorer.close)
+        index.attach_parallel(scorer)
+
+        mask = np.arange(300) % 3 == 1
+        for query in rng.normal(size=(3, 16)):
+            self.assertEqual(index.search(query, 5), exact.search(query, 5))
+            self.assertEqual(index.search(query, 5, mask=mask), exact.search(query, 5, mask=mask))
+
+
+# -------------------------------------------------------------------------
+# Változásnapló alapú indexszinkron
+# -------------------------------------------------------------------------
+class ChangeLogSyncTests(TestCase):
+
+    def setUp(self):
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+
+        rag_settings = {**getattr(settings, "RAG_SETTINGS", {}), "sync_interval": 0}
+        settings_override = override_settings(VECTOR_SNAPSHOT_DIR=snapshot_dir.name, RAG_SETTINGS=rag_settings)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        vector_index.invalidate_vector_index()
+        self.addCleanup(vector_index.invalidate_vector_index)
+
+    def test_workers_apply_logged_changes_without_a_full_reload(self):
+        first_ids = store_embeddings(np.eye(4)[:2])
+        record_changes(added=first_ids)
+        before = vector_index.get_vector_index()
+        self.assertEqual(sorted(c for c, _ in before.search(np.ones(4), 10)), first_ids)
+
+        new_ids = store_embeddings(np.eye(4)[2:])
+        KnowledgeEmbedding.objects.filter(chunk_id=first_ids[0]).delete()
+        record_changes(added=new_ids, removed=first_ids[:1])
+
+        after = vector_index.get_vector_index()
+
+        self.assertEqual(sorted(c for c, _ in after.search(np.ones(4), 10)), first_ids[1:] + new_ids)
+        self.assertEqual(after.generation, latest_generation())
+        self.assertEqual(after.search(np.eye(4)[3], 1)[0][0], new_ids[1])
+        self.assertEqual(sorted(c for c, _ in before.search(np.ones(4), 10)), first_ids)
+
+
+# -------------------------------------------------------------------------
+# Keresőnódus tulajdonrésze
+# -------------------------------------------------------------------------
+class NodeOwnershipTests(TestCase):
+
+    def test_node_index_only_loads_its_own_slice(self):
+        category = KnowledgeCategory.objects.create(name="Pénzügy")
+        own_ids = store_embeddings(np.eye(4)[:2], category=category)
+        store_embeddings(np.eye(4)[2:])
+
+        with override_settings(RAG_SETTINGS={"node_categories": ["Pénzügy"]}):
+            self.assertEqual(sorted(VectorIndex.from_database().chunk_ids.tolist()), own_ids)
+
+        with override_settings(RAG_SETTINGS={"node_chunk_range": f"{own_ids[1]}-"}):
+            self.assertEqual(len(VectorIndex.from_database()), 3)
+
+        self.assertEqual(len(VectorIndex.from_database()), 4)
+
+
+# -------------------------------------------------------------------------
+# Kétszintű keresés tudáselem-centroidokkal
+# -------------------------------------------------------------------------
+class ItemCentroidTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(29)
+        self.directions = np.eye(3, 16) * 5
+        self.item_chunk_ids = [
+            store_embeddings(direction + rng.normal(scale=0.3, size=(4, 16)), f"Elem {i}")
+            for i, direction in enumerate(self.directions)
+        ]
+        self.index = VectorIndex.from_database()
+        self.index.load_metadata()
+
+    def test_centroid_is_the_normalized_chunk_mean(self):
+        self.index.attach_item_centroids(top_m=1)
+
+        self.assertEqual(self.index.item_centroids.shape, (3, 16))
+        np.testing.assert_allclose(np.linalg.norm(self.index.item_centroids, axis=1), 1.0, atol=1e-5)
+
+    def test_only_the_best_items_chunks_are_scored(self):
+        self.index.attach_item_centroids(top_m=1)
+
+        hits = self.index.search(self.directions[1], 10)
+
+        self.assertEqual(sorted(c for c, _ in hits), self.item_chunk_ids[1])
+        # A kizárt tudáselem helyett a következő legjobb kerül sorra
+        item_id = KnowledgeChunk.objects.get(id=hits[0][0]).item_id
+        mask = self.index.filter_mask(exclude_item_ids=[item_id])
+        hits = self.index.search(self.directions[1], 10, mask=mask)
+        self.assertTrue(hits)
+        self.assertTrue({c for c, _ in hits}.isdisjoint(self.item_chunk_ids[1]))
+
+
+# -------------------------------------------------------------------------
+# Kapcsolódó tudáselemek (kNN gráf)
+# -------------------------------------------------------------------------
+class RelatedItemsTests(TestCase):
+
+    def setUp(self):
+        self.first = self.create_item("Első", [1.0, 0.1, 0.0])
+        self.close = self.create_item("Közeli", [0.9, 0.2, 0.0])
+        self.far = self.create_item("Távoli", [0.0, 0.1, 1.0])
+
+    def create_item(self, title, direction, **fields):
+        chunk_ids = store_embeddings([direction, direction], title, **fields)
+        return KnowledgeChunk.objects.get(id=chunk_ids[0]).item_id
+
+    def related_ids(self, item_id):
+        return [related["item_id"] for related in get_related_items(item_id)]
+
+    def test_graph_orders_neighbours_by_similarity(self):
+        stats = build_related_graph(k=2)
+
+        self.assertEqual(stats, {"items": 3, "links": 6})
+        self.assertEqual(self.related_ids(self.first), [self.close, self.far])
+        self.assertEqual(self.related_ids(self.far)[0], self.close)
+
+    def test_inactive_items_are_not_served(self):
+        build_related_graph(k=2)
+        KnowledgeItem.objects.filter(id=self.close).update(is_active=False)
+
+        self.assertEqual(self.related_ids(self.first), [self.far])
+
+    def test_new_item_enters_the_affected_lists_only(self):
+        build_related_graph(k=1)
+        newcomer = self.create_item("Új", [0.0, 0.0, 1.0])
+
+        refresh_related_items(newcomer, k=1)
+
+        self.assertEqual(self.related_ids(newcomer), [self.far])
+        self.assertEqual(self.related_ids(self.far), [newcomer])
+        self.assertEqual(self.related_ids(self.first), [self.close])
+
+
+# -------------------------------------------------------------------------
+# Keresőbackendek
+# -------------------------------------------------------------------------
+class RetrievalBackendTests(TestCase):
+
+    def test_backend_is_selected_by_mode(self):
+        self.assertIsInstance(get_retrieval_backend("memory"), NumpyRetrievalBackend)
+        self.assertIsInstance(get_retrieval_backend("SQLite"), SQLiteRetrievalBackend)
+        self.assertIs(get_retrieval_backend("sqlite"), get_retrieval_backend("sqlite"))
+
+        with override_settings(RAG_SETTINGS={"index_mode": "sqlite"}):
+            self.assertIsInstance(get_retrieval_backend(), SQLiteRetrievalBackend)
+
+        with self.assertRaises(ValueError):
+            get_retrieval_backend("ismeretlen")
+
+
+# -------------------------------------------------------------------------
+# Elasticsearch adapter – hamis klienssel (elasticsearch csomag nélkül)
+# -------------------------------------------------------------------------
+class FakeElasticsearch:
+    """A backend által használt kliens-metódusok; a kéréseket rögzíti, a válasz előre megadott."""
+
+    def __init__(self, hits=None):
+        self.indices = mock.MagicMock()
+        self.indices.exists.return_value = False
+        self.operations = []
+        self.searches = []
+        self.hits = hits or []
+
+    def bulk(self, operations):
+        self.operations.extend(operations)
+        return {"errors": False, "items": []}
+
+    def search(self, index, **body):
+        self.searches.append(body)
+        return {"hits": {"hits": self.hits}}
+
+    def msearch(self, searches):
+        self.searches.extend(searches[1::2])
+        return {"responses": [{"hits": {"hits": self.hits}} for _ in searches[1::2]]}
+
+
+class ElasticsearchBackendTests(KnowledgeTestCase):
+
+    def test_index_sends_documents_and_deletes_missing_chunks(self):
+        item = self.create_item("Víz", "A víz forráspontja száz fok.")
+        chunk_id = self.embedded_chunk_ids()[0]
+        client = FakeElasticsearch()
+
+        ElasticsearchRetrievalBackend(client=client, index_name="test").index([chunk_id, 999999])
+
+        mappings = client.indices.create.call_args.kwargs["mappings"]
+        self.assertEqual(mappings["properties"]["vector"]["dims"], self.client_stub.dim)
+
+        (index_op, document, delete_op) = client.operations
+        self.assertEqual(index_op, {"index": {"_index": "test", "_id": str(chunk_id)}})
+        self.assertEqual(document["item_id"], item.id)
+        self.assertTrue(document["is_active"])
+        self.assertEqual(len(document["vector"]), self.client_stub.dim)
+        self.assertEqual(delete_op, {"delete": {"_index": "test", "_id": "999999"}})
+
+    def test_vector_search_converts_scores_and_applies_filters(self):
+        client = FakeElasticsearch(hits=[{"_id": "7", "_score": 0.9}, {"_id": "3", "_score": 0.6}])
+        backend = ElasticsearchRetrievalBackend(client=client, index_name="test")
+
+        results = backend.search_vector(
+            [1.0, 0.0], 2, filters={"item_ids": [1, 2], "exclude_item_ids": [3]}, min_score=0.1
+        )
+
+        # ES cosine _score = (1 + cos) / 2 → vissza nyers koszinuszra
+        self.assertEqual([cid for cid, _ in results], [7, 3])
+        self.assertAlmostEqual(results[0][1], 0.8)
+        self.assertAlmostEqual(results[1][1], 0.2)
+
+        knn = client.searches[0]["knn"]
+        self.assertEqual(knn["similarity"], 0.1)
+        self.assertEqual(knn["filter"], [
+            {"term": {"is_active": True}},
+            {"terms": {"item_id": [1, 2]}},
+            {"bool": {"must_not": {"terms": {"item_id": [3]}}}},
+        ])
+
+        self.assertEqual(backend.search_vector_many([[1.0, 0.0], []], 2), [results, []])
+        self.assertEqual(len(client.searches), 2)
+
+    def test_text_search_and_client_errors(self):
+        client = FakeElasticsearch(hits=[{"_id": "5", "_score": 3.5}])
+        backend = ElasticsearchRetrievalBackend(client=client, index_name="test")
+
+        self.assertEqual(backend.search_text("víz", 3, category_name="Fizika"), [(5, 3.5)])
+        query = client.searches[0]["query"]["bool"]
+        self.assertEqual(query["must"]["multi_match"]["query"], "víz")
+        self.assertIn({"term": {"category_name": "Fizika"}}, query["filter"])
+
+        # Elérhetetlen cluster: üres találat, nem kivétel
+        client.search = mock.Mock(side_effect=ConnectionError("nincs kapcsolat"))
+        self.assertEqual(backend.search_text("víz", 3), [])
+        self.assertEqual(backend.search_vector([1.0, 0.0], 3), [])
+
+
+class BatchEmbeddingClient:
+    """Batch embedding kliens: minden get_embeddings hívást rögzít, a "hiba" szövegre kivételt dob."""
+
+    embedding_model = "batch-embedding"
+
+    def __init__(self):
+        self.batches = []
+
+    def get_embedding(self, text):
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts):
+        self.batches.append(list(texts))
+        if "hiba" in texts:
+            raise RuntimeError("provider hiba")
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+# -------------------------------------------------------------------------
+# Batch embedding generálás
+# -------------------------------------------------------------------------
+class BatchEmbeddingTests(TestCase):
+
+    @override_settings(EMBEDDING_BATCH_SIZE=2)
+    def test_texts_are_sent_in_batches(self):
+        client = BatchEmbeddingClient()
+        vectors = EmbeddingService(client).create_embeddings(["a", "bb", "", "ccc", "dddd", "eeeee"])
+
+        self.assertEqual(client.batches, [["a", "bb"], ["ccc", "dddd"], ["eeeee"]])
+        self.assertEqual([v and v[0] for v in vectors], [1.0, 2.0, None, 3.0, 4.0, 5.0])
+
+    @override_settings(EMBEDDING_BATCH_SIZE=2)
+    def test_failed_batch_only_loses_its_own_texts(self):
+        vectors = EmbeddingService(BatchEmbeddingClient()).create_embeddings(["a", "hiba", "ccc"])
+
+        self.assertEqual(vectors, [None, None, [3.0, 1.0]])
+
+
+# -------------------------------------------------------------------------
+# Perzisztens embedding cache
+# -------------------------------------------------------------------------
+class EmbeddingCacheTests(TestCase):
+
+    def test_cached_texts_skip_the_provider(self):
+        client = BatchEmbeddingClient()
+        service = EmbeddingService(client)
+
+        first = service.create_embeddings(["közös bevezető", "első", "közös bevezető"], use_cache=True)
+        second = service.create_embeddings(["közös bevezető", "második"], use_cache=True)
+
+        self.assertEqual(client.batches, [["közös bevezető", "első"], ["második"]])
+        self.assertEqual(first[0], first[2])
+        self.assertEqual(second[0], first[0])
+        self.assertEqual(EmbeddingCacheEntry.objects.count(), 3)
+
+    def test_cache_is_separate_per_model(self):
+        client = BatchEmbeddingClient()
+        EmbeddingService(client).create_embeddings(["szöveg"], use_cache=True)
+        client.embedding_model = "másik-modell"
+        EmbeddingService(client).create_embeddings(["szöveg"], use_cache=True)
+
+        self.assertEqual(len(client.batches), 2)
+
+    @override_settings(EMBEDDING_CACHE_MAX_ENTRIES=0)
+    def test_zero_limit_disables_the_cache(self):
+        client = BatchEmbeddingClient()
+        for _ in range(2):
+            EmbeddingService(client).create_embeddings(["szöveg"], use_cache=True)
+
+        self.assertEqual(len(client.batches), 2)
+        self.assertFalse(EmbeddingCacheEntry.objects.exists())
+
+    def test_least_recently_used_entries_are_evicted(self):
+        texts = [f"szöveg {i}" for i in range(12)]
+        EmbeddingService(BatchEmbeddingClient()).create_embeddings(texts, use_cache=True)
+
+        self.assertEqual(evict_embedding_cache(max_entries=10), 3)
+        self.assertEqual(EmbeddingCacheEntry.objects.count(), 9)
+
+
+# -------------------------------------------------------------------------
+# Chunk-diff – csak a változott szövegű chunkok cserélődnek
+# -------------------------------------------------------------------------
+class SyncItemChunksTests(KnowledgeTestCase):
+
+    def test_unchanged_chunks_keep_their_rows_and_embeddings(self):
+        item = self.create_item("Elem", "első")
+        sync_item_chunks(item, ["alfa", "béta", "gamma", "béta"])
+        item.chunks.update(is_embedded=True)
+        before = {(c.content, c.index): c.id for c in item.chunks.all()}
+
+        # béta (1) megmarad és 0-ra lép; gamma törlődik; a második béta
+        # a helyén marad; delta új, alfa a végére kerül
+        added, removed = sync_item_chunks(item, ["béta", "delta", "béta", "alfa"])
+
+        self.assertEqual((added, removed), (1, 1))
+        after = list(item.chunks.order_by("index").values_list("id", "content", "index", "is_embedded"))
+        self.assertEqual([(content, index) for _, content, index, _ in after],
+                         [("béta", 0), ("delta", 1), ("béta", 2), ("alfa", 3)])
+
+        ids = {index: chunk_id for chunk_id, _, index, _ in after}
+        self.assertEqual(ids[0], before[("béta", 1)])
+        self.assertEqual(ids[2], before[("béta", 3)])
+        self.assertEqual(ids[3], before[("alfa", 0)])
+        self.assertNotIn(ids[1], before.values())
+        self.assertEqual([embedded for _, _, _, embedded in after], [True, False, True, True])
+
+    def test_identical_texts_touch_nothing(self):
+        item = self.create_item("Elem", "első")
+        sync_item_chunks(item, ["alfa", "béta"])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(sync_item_chunks(item, ["alfa", "béta"]), (0, 0))
+
+    def test_stale_chunks_leave_the_backend_in_one_call_after_commit(self):
+        item = self.create_item("Elem", "első")
+        sync_item_chunks(item, ["alfa", "béta", "gamma"])
+        stale = sorted(item.chunks.exclude(content="alfa").values_list("id", flat=True))
+
+        backend = mock.Mock()
+        with mock.patch("services.ingestion.pipeline.get_retrieval_backend", return_value=backend):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(sync_item_chunks(item, ["alfa"]), (0, 2))
+                backend.delete.assert_not_called()
+
+        backend.delete.assert_called_once_with(stale)
+
+    def test_rolled_back_delete_keeps_chunks_in_the_backend(self):
+        item = self.create_item("Elem", "első")
+        sync_item_chunks(item, ["alfa", "béta"])
+        item_id = item.id
+
+        backend = mock.Mock()
+        with mock.patch("services.ingestion.pipeline.get_retrieval_backend", return_value=backend):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        sync_item_chunks(item, ["alfa"])
+                        item.delete()
+                        raise RuntimeError("visszagörgetés")
+
+        self.assertEqual(callbacks, [])
+        backend.delete.assert_not_called()
+        self.assertEqual(KnowledgeChunk.objects.filter(item_id=item_id).count(), 2)
+
+    def test_item_delete_removes_all_chunks_in_one_call(self):
+        item = self.create_item("Elem", "első mondat. második mondat.")
+        sync_item_chunks(item, ["alfa", "béta", "gamma"])
+        chunk_ids = sorted(item.chunks.values_list("id", flat=True))
+
+        backend = mock.Mock()
+        with mock.patch("services.ingestion.pipeline.get_retrieval_backend", return_value=backend):
+            with self.captureOnCommitCallbacks(execute=True):
+                item.delete()
+
+        backend.delete.assert_called_once()
+        self.assertEqual(sorted(backend.delete.call_args.args[0]), chunk_ids)
+        self.assertFalse(KnowledgeChunk.objects.filter(id__in=chunk_ids).exists())
+
+
+# -------------------------------------------------------------------------
+# Változatlan tartalom – nincs újra-anonimizálás, chunkolás, embedding
+# -------------------------------------------------------------------------
+class UnchangedContentTests(KnowledgeTestCase):
+
+    def test_metadata_only_save_skips_the_pipeline(self):
+        item = self.create_item("Víz", "A víz forráspontja száz fok.")
+        chunk_ids = self.embedded_chunk_ids()
+        calls = self.client_stub.calls
+
+        with mock.patch.object(TextAnonymizerService, "anonymize_text") as anonymize_text:
+            item.title = "A víz forráspontja"
+            item.is_active = False
+            item.save()
+
+        anonymize_text.assert_not_called()
+        self.assertEqual(self.client_stub.calls, calls)
+        self.assertEqual(self.embedded_chunk_ids(), chunk_ids)
+
+    def test_changed_content_is_processed_again(self):
+        item = self.create_item("Víz", "A víz forráspontja száz fok.")
+        chunk_ids = self.embedded_chunk_ids()
+        calls = self.client_stub.calls
+
+        item.content = "A jég nulla fokon olvad."
+        item.save()
+
+        self.assertGreater(self.client_stub.calls, calls)
+        self.assertEqual(len(self.embedded_chunk_ids()), 1)
+        self.assertNotEqual(self.embedded_chunk_ids(), chunk_ids)
+
+
+# -------------------------------------------------------------------------
+# Feladatsor – bérlet, újrapróbálás, egy várakozó feladat tudáselemenként
+# -------------------------------------------------------------------------
+@override_settings(KNOWLEDGE_WORKER_SETTINGS={"max_attempts": 2, "lease_seconds": 60, "backoff_base": 10})
+class JobQueueTests(KnowledgeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.item = self.create_item("Elem", "tartalom")
+        KnowledgeJob.objects.all().delete()
+
+    def expire_lease(self, job):
+        KnowledgeJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_enqueue_keeps_one_pending_job_per_item_and_kind(self):
+        for _ in range(3):
+            job_queue.enqueue_item(self.item.id)
+        job_queue.enqueue_item(self.item.id, kind=KnowledgeJob.KIND_RELATED)
+
+        pending = KnowledgeJob.objects.filter(status=KnowledgeJob.STATUS_PENDING)
+        self.assertEqual(sorted(pending.values_list("kind", flat=True)), ["process", "related"])
+
+        # Futó feladat mellett új várakozó kerülhet sorba
+        job_queue.claim_jobs("w1", limit=2)
+        job_queue.enqueue_item(self.item.id)
+        self.assertEqual(pending.count(), 1)
+
+    def test_lease_blocks_other_workers_until_it_expires(self):
+        job_queue.enqueue_item(self.item.id)
+
+        (job,) = job_queue.claim_jobs("w1")
+        self.assertEqual((job.status, job.locked_by, job.attempts), ("running", "w1", 1))
+        self.assertEqual(job_queue.claim_jobs("w2"), [])
+
+        self.expire_lease(job)
+        (taken_over,) = job_queue.claim_jobs("w2")
+        self.assertEqual((taken_over.id, taken_over.locked_by, taken_over.attempts), (job.id, "w2", 2))
+
+        # A régi worker már nem zárhatja le a más által átvett feladatot
+        job_queue.complete_job(job)
+        self.assertTrue(KnowledgeJob.objects.filter(id=job.id).exists())
+
+    def test_renewed_lease_keeps_a_late_batch_job(self):
+        second = self.create_item("Másik", "másik tartalom")
+        job_queue.enqueue_item(self.item.id)
+        job_queue.enqueue_item(second.id)
+
+        first, late = job_queue.claim_jobs("w1", limit=2)
+        self.expire_lease(first)
+        self.expire_lease(late)
+
+        # Futtatás előtt megújítva a késői feladatot más worker nem veheti át
+        self.assertTrue(job_queue.renew_lease(late))
+        self.assertEqual([job.id for job in job_queue.claim_jobs("w2", limit=2)], [first.id])
+        self.assertFalse(job_queue.renew_lease(first))
+
+    def test_worker_skips_batch_job_taken_over_after_its_lease_expired(self):
+        second = self.create_item("Másik", "másik tartalom")
+        KnowledgeJob.objects.all().delete()
+        job_queue.enqueue_item(self.item.id)
+        job_queue.enqueue_item(second.id)
+        taken_over = []
+
+        def slow_job(job):
+            # Az első feladat alatt a batch második feladatának bérlete lejár, és w2 átveszi
+            KnowledgeJob.objects.exclude(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+            taken_over.extend(job_queue.claim_jobs("w2", limit=2))
+
+        with mock.patch(
+            "knowledge.management.commands.run_knowledge_worker.run_job", side_effect=slow_job
+        ) as run_job:
+            call_command("run_knowledge_worker", once=True, batch_size=2, stdout=io.StringIO())
+
+        self.assertEqual(run_job.call_count, 1)
+        (job,) = taken_over
+        self.assertEqual(job.item_id, second.id)
+        self.assertEqual(KnowledgeJob.objects.get().locked_by, "w2")
+
+    def test_expired_lease_after_last_attempt_fails_the_job(self):
+        job_queue.enqueue_item(self.item.id)
+        for worker in ("w1", "w2"):
+            (job,) = job_queue.claim_jobs(worker)
+            self.expire_lease(job)
+
+        self.assertEqual(job_queue.claim_jobs("w3"), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.lease_expires_at), ("failed", 2, None))
+        self.assertEqual(job_queue.queue_stats()["ready"], 0)
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        job_queue.enqueue_item(self.item.id)
+
+        (job,) = job_queue.claim_jobs("w1")
+        job_queue.fail_job(job, "hiba")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ("pending", "hiba"))
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertEqual(job_queue.claim_jobs("w1"), [])
+
+        KnowledgeJob.objects.filter(id=job.id).update(available_at=timezone.now())
+        (job,) = job_queue.claim_jobs("w1")
+        job_queue.fail_job(job, "megint hiba")
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+        self.assertEqual(job_queue.retry_failed_jobs(), 1)
+        (retried,) = KnowledgeJob.objects.all()
+        self.assertEqual((retried.status, retried.attempts), ("pending", 0))
+
+    def test_failed_retry_yields_to_newer_pending_job(self):
+        job_queue.enqueue_item(self.item.id)
+        (job,) = job_queue.claim_jobs("w1")
+        job_queue.enqueue_item(self.item.id)
+
+        job_queue.fail_job(job, "hiba")
+
+        (pending,) = KnowledgeJob.objects.all()
+        self.assertNotEqual(pending.id, job.id)
+        self.assertEqual((pending.status, pending.attempts), ("pending", 0))
+
+
+# -------------------------------------------------------------------------
+# Embedding backfill – checkpoint, modellváltás
+# -------------------------------------------------------------------------
+class EmbeddingBackfillTests(KnowledgeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.create_item(f"Elem {i}", f"backfill szöveg{i}")
+
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint_path = f"{checkpoint_dir.name}/backfill.json"
+
+    def backfill(self, **kwargs):
+        return EmbeddingBackfill(
+            self.client_stub, workers=1, batch_size=1, checkpoint_path=self.checkpoint_path, **kwargs
+        )
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        chunk_ids = sorted(KnowledgeChunk.objects.values_list("id", flat=True))
+        KnowledgeEmbedding.objects.all().delete()
+        KnowledgeChunk.objects.update(is_embedded=False)
+
+        first = self.backfill().run(limit=2)
+        self.assertEqual((first["embedded"], first["completed"]), (2, False))
+        self.assertEqual(load_checkpoint(self.checkpoint_path)["last_chunk_id"], chunk_ids[1])
+
+        calls_before = self.client_stub.calls
+        second = self.backfill().run()
+
+        self.assertEqual(second["resumed_from"], chunk_ids[1])
+        self.assertEqual((second["total"], second["embedded"], second["completed"]), (3, 3, True))
+        self.assertEqual(self.client_stub.calls - calls_before, 3)
+        self.assertEqual(self.embedded_chunk_ids(), chunk_ids)
+        self.assertEqual(load_checkpoint(self.checkpoint_path), {})
+
+
+# -------------------------------------------------------------------------
+# Query embedding cache – kulcs, TTL, méretkorlát
+# -------------------------------------------------------------------------
+class QueryCacheLimitsTests(TestCase):
+
+    def test_keys_are_per_model_and_normalized(self):
+        cache = QueryEmbeddingCache(lru_size=10, max_entries=100, ttl_seconds=0)
+        cache.set("modell-a", "Mi a  víz?", [1.0, 0.0])
+
+        self.assertEqual(np.asarray(cache.get("modell-a", " MI A VÍZ? ")).tolist(), [1.0, 0.0])
+        self.assertIsNone(cache.get("modell-b", "Mi a víz?"))
+
+        # Kikapcsolt cache: se olvasás, se írás
+        disabled = QueryEmbeddingCache(lru_size=0, max_entries=0)
+        disabled.set("modell-a", "új kérdés", [1.0])
+        self.assertIsNone(disabled.get("modell-a", "Mi a víz?"))
+        self.assertEqual(QueryEmbeddingCacheEntry.objects.count(), 1)
+
+    def test_expired_entries_are_ignored_and_evicted(self):
+        cache = QueryEmbeddingCache(lru_size=10, max_entries=100, ttl_seconds=60)
+        cache.set("modell", "régi kérdés", [1.0])
+
+        QueryEmbeddingCacheEntry.objects.update(created_at=timezone.now() - timedelta(seconds=120))
+        cache.clear_local()
+
+        self.assertIsNone(cache.get("modell", "régi kérdés"))
+        self.assertEqual(cache.evict(), 1)
+
+    def test_table_keeps_the_most_recently_used_entries(self):
+        cache = QueryEmbeddingCache(lru_size=0, max_entries=10, ttl_seconds=0)
+        cache.set_many("modell", {f"kérdés {i}": [float(i)] for i in range(10)})
+        cache.get("modell", "kérdés 0")
+
+        cache.set("modell", "új kérdés", [1.0])
+        cache.evict()
+
+        remaining = set(QueryEmbeddingCacheEntry.objects.values_list("query_text", flat=True))
+        self.assertEqual(len(remaining), 9)
+        self.assertIn("kérdés 0", remaining)
+        self.assertIn("új kérdés", remaining)
+        self.assertFalse(remaining & {"kérdés 1", "kérdés 2"})
+
+
+# -------------------------------------------------------------------------
+# Helyi embedding modell – tanítás, mentés, kliens
+# -------------------------------------------------------------------------
+class LocalEmbeddingTests(TestCase):
+
+    TEXTS = [
+        "A víz forráspontja tengerszinten száz fok.",
+        "A víz fagyáspontja nulla fok.",
+        "A fény sebessége vákuumban állandó.",
+        "A vulkánkitörést a magma nyomása okozza.",
+    ]
+
+    def setUp(self):
+        self.model = fit_local_embedding_model(
+            self.TEXTS, dimensions=16, n_buckets=1024, svd_components=2, min_df=1
+        )
+        model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(model_dir.cleanup)
+        self.model_path = f"{model_dir.name}/local.npz"
+
+    def test_embeddings_are_normalized_and_reproducible(self):
+        water, ice, light = (np.array(self.model.embed(text)) for text in self.TEXTS[:3])
+
+        self.assertEqual(water.shape, (16,))
+        self.assertAlmostEqual(float(np.linalg.norm(water)), 1.0, places=5)
+        self.assertGreater(water @ ice, water @ light)
+        self.assertEqual(self.model.embed(""), [])
+
+        self.model.save(self.model_path)
+        loaded = LocalEmbeddingModel.load(self.model_path)
+        self.assertEqual(loaded.model_name, self.model.model_name)
+        self.assertEqual(loaded.embed(self.TEXTS[0]), self.model.embed(self.TEXTS[0]))
+
+    def test_embedding_client_follows_embedding_provider(self):
+        self.model.save(self.model_path)
+
+        with override_settings(EMBEDDING_PROVIDER="local", LOCAL_EMBEDDING_SETTINGS={"model_path": self.model_path}):
+            client = get_embedding_client()
+            self.assertIsInstance(client, LocalEmbeddingClient)
+            self.assertEqual(client.embedding_model, self.model.model_name)
+            self.assertEqual(client.get_embeddings(self.TEXTS[:2]), [self.model.embed(t) for t in self.TEXTS[:2]])
+
+        missing = {"model_path": f"{self.model_path}.hiányzik"}
+        with override_settings(EMBEDDING_PROVIDER="local", LOCAL_EMBEDDING_SETTINGS=missing):
+            with self.assertRaises(ValueError):
+                get_embedding_client()
@@ -179,3 +179,174 @@ PERPLEXITY_SETTINGS = {
     "api_key": os.getenv("PER_API_KEY"),
     "base_url": os.getenv("PER_BASE_URL"),
 }
+
+
+# -------------------------------------------------------------------------
+# Elasticsearch keresőbackend (RAG_SETTINGS["index_mode"] = "elasticsearch")
+# A chunkok embeddingje és metaadatai egy dense_vector indexbe kerülnek;
+# teljes újraépítés: manage.py rebuild_search_backend
+# -------------------------------------------------------------------------
+ELASTICSEARCH_SETTINGS = {
+    "url": os.getenv("ELASTICSEARCH_URL", "http://localhost:9200"),
+    "api_key": os.getenv("ELASTICSEARCH_API_KEY"),
+    "index": os.getenv("ELASTICSEARCH_INDEX", "knowledge_chunks"),
+    "timeout": float(os.getenv("ELASTICSEARCH_TIMEOUT", "10")),
+    "num_candidates": int(os.getenv("ELASTICSEARCH_NUM_CANDIDATES", "100")),
+}
+
+
+# -------------------------------------------------------------------------
+# Embedding provider
+# openai: API hívás (text-embedding-3-large)
+# local:  offline, helyi modell (hash-elt karakter n-gram TF-IDF + tanult vetítés),
+#         tanítás: manage.py fit_local_embeddings (verziózott fájlba); modellváltás:
+#         manage.py backfill_embeddings --local-model <fájl> --activate
+# A keresés mindig csak az aktív modell embeddingjeit használja; a váltás előtt
+# az új modell vektorai a régiek mellé készülnek, így a keresés közben sem ürül ki.
+# A lokális modell paraméterei a fit_local_embeddings alapértékei.
+# -------------------------------------------------------------------------
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+
+LOCAL_EMBEDDING_SETTINGS = {
+    "model_path": Path(os.getenv("LOCAL_EMBEDDING_MODEL_PATH", BASE_DIR / "local_embedding_model.npz")),
+    "dimensions": int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "256")),
+    "buckets": int(os.getenv("LOCAL_EMBEDDING_BUCKETS", "16384")),
+    "svd_components": int(os.getenv("LOCAL_EMBEDDING_SVD_COMPONENTS", "128")),
+    "min_df": int(os.getenv("LOCAL_EMBEDDING_MIN_DF", "2")),
+    "ngram_min": int(os.getenv("LOCAL_EMBEDDING_NGRAM_MIN", "3")),
+    "ngram_max": int(os.getenv("LOCAL_EMBEDDING_NGRAM_MAX", "5")),
+}
+
+
+# -------------------------------------------------------------------------
+# Embedding tárolás
+# A vektorok nyers bináris formában kerülnek az adatbázisba:
+# float32 (pontos) vagy float16 (fele akkora, minimális pontosságvesztéssel).
+# -------------------------------------------------------------------------
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+
+# Matryoshka-előtag: minden embedding mellé eltároljuk az első N dimenziót
+# (újranormalizálva) a kétlépcsős kereséshez. 0 = kikapcsolva.
+EMBEDDING_SHORT_DIMENSIONS = int(os.getenv("EMBEDDING_SHORT_DIMENSIONS", "256"))
+
+# Egy batch embedding API hívásban legfeljebb ennyi szöveg megy fel
+# (a tudáselem mentésekor az összes chunk ilyen batchekben ágyazódik be).
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+
+# Embedding cache: (modell, sha256(chunk szöveg)) → vektor. Egy cím-javítás miatti
+# újrachunkolás így nem ágyazza be újra a változatlan chunkokat. Legfeljebb ennyi
+# bejegyzés marad (a legrégebben használtak törlődnek); 0 = kikapcsolva.
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+
+# Query embedding cache: (modell, normalizált kérdés) → query vektor, két szinten –
+# folyamatonkénti LRU (LRU_SIZE kérdés) és megosztott adatbázistábla (MAX_ENTRIES
+# bejegyzés). Egy bejegyzés TTL_SECONDS után lejár. 0 = az adott szint / lejárat ki.
+EMBEDDING_QUERY_CACHE_LRU_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_LRU_SIZE", "1000"))
+EMBEDDING_QUERY_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_QUERY_CACHE_MAX_ENTRIES", "20000"))
+EMBEDDING_QUERY_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_QUERY_CACHE_TTL_SECONDS", "604800"))
+
+# Embedding backfill (manage.py backfill_embeddings): párhuzamos API hívások száma,
+# percenkénti kérés- és (becsült) tokenkeret (0 = korlátlan), valamint a checkpoint
+# fájl, amelyből egy megszakított futás folytatódik.
+EMBEDDING_BACKFILL_WORKERS = int(os.getenv("EMBEDDING_BACKFILL_WORKERS", "4"))
+EMBEDDING_RATE_LIMIT_RPM = int(os.getenv("EMBEDDING_RATE_LIMIT_RPM", "0"))
+EMBEDDING_RATE_LIMIT_TPM = int(os.getenv("EMBEDDING_RATE_LIMIT_TPM", "0"))
+EMBEDDING_BACKFILL_CHECKPOINT = Path(
+    os.getenv("EMBEDDING_BACKFILL_CHECKPOINT", BASE_DIR / "embedding_backfill.json")
+)
+
+
+# -------------------------------------------------------------------------
+# Háttérfeldolgozás (manage.py run_knowledge_worker)
+# async_ingestion: True esetén a tudáselem mentése csak sorba teszi az
+#              anonimizálást, chunkolást és embeddinget (KnowledgeJob tábla),
+#              False esetén a signalok szinkron futtatják (alapértelmezés)
+#              A kapcsolódó tudáselemek frissítése mindkét módban a sorba kerül
+#              (szinkron módban is kell worker, pl. cron: run_knowledge_worker --once)
+# lease_seconds: a felvett feladat bérlete – utána másik worker átveheti
+#                (a worker minden feladat futtatása előtt megújítja)
+# max_attempts, backoff_*: újrapróbálás exponenciális várakozással
+# batch_size, poll_interval, stats_interval: a worker ciklusa
+# -------------------------------------------------------------------------
+KNOWLEDGE_WORKER_SETTINGS = {
+    "async_ingestion": os.getenv("KNOWLEDGE_ASYNC_INGESTION", "False") == "True",
+    "lease_seconds": float(os.getenv("KNOWLEDGE_JOB_LEASE_SECONDS", "300")),
+    "max_attempts": int(os.getenv("KNOWLEDGE_JOB_MAX_ATTEMPTS", "5")),
+    "backoff_base": float(os.getenv("KNOWLEDGE_JOB_BACKOFF_BASE", "10")),
+    "backoff_max": float(os.getenv("KNOWLEDGE_JOB_BACKOFF_MAX", "3600")),
+    "batch_size": int(os.getenv("KNOWLEDGE_WORKER_BATCH_SIZE", "10")),
+    "poll_interval": float(os.getenv("KNOWLEDGE_WORKER_POLL_INTERVAL", "2.0")),
+    "stats_interval": float(os.getenv("KNOWLEDGE_WORKER_STATS_INTERVAL", "30")),
+}
+
+
+# -------------------------------------------------------------------------
+# Vektorindex snapshot (manage.py build_vector_snapshot)
+# A workerek innen memory-mappelik a közös embedding mátrixot.
+# -------------------------------------------------------------------------
+VECTOR_SNAPSHOT_DIR = Path(os.getenv("VECTOR_SNAPSHOT_DIR", BASE_DIR / "vector_snapshot"))
+
+
+# -------------------------------------------------------------------------
+# RAG keresés beállításai
+# index_mode:  a keresőbackend (services/rag/retrieval_provider.py):
+#              "memory" (folyamat-szintű NumPy vektorindex), "sqlite" (rezidens index
+#              nélkül: a pontozás egy SQL függvénnyel az adatbázisban fut, csak a
+#              threshold feletti TOP-K sor jön vissza; ANN / kvantálás / MMR itt nincs)
+#              vagy "elasticsearch" (dense_vector kNN, lásd ELASTICSEARCH_SETTINGS)
+# ann_backend: "exact" (pontos, brute force) vagy "ivf" (közelítő, klaszterezett)
+# ivf_nlist:   klaszterek száma (manage.py build_ann_index tanítja)
+# ivf_nprobe:  keresésenként vizsgált klaszterek – a recall/sebesség kompromisszum
+#              (manage.py evaluate_ann_recall segít a választásban)
+# quantization: "none", "int8" (4x kisebb), "binary" (32x kisebb) vagy "matryoshka"
+#              (a tárolt rövid előtag-vektorokon, EMBEDDING_SHORT_DIMENSIONS) előszűrő réteg
+# oversample:  a kvantált shortlist mérete = top_k * oversample; ezeket pontozzuk
+#              újra teljes pontossággal (nagyobb érték → pontosabb, lassabb)
+# category_min_confidence: a rag_view csak ennél biztosabb LLM kategóriafelismerés
+#              esetén keres a kategória shardjában, egyébként a teljes indexben
+# mmr_*:       Maximal Marginal Relevance diverzifikálás – a legjobb mmr_pool_size
+#              jelöltből mmr_lambda súllyal (1.0 = tiszta relevancia) választunk TOP-K-t
+#              (sharded topológiában a koordinátor, az összefésült jelöltkészleten)
+# parallel_*:  többmagos brute force pontozás – a mátrix shared memoryban, parallel_shards
+#              shardra bontva (0 = workerenként egy), parallel_workers folyamatú tartós
+#              process poolban; parallel_min_rows alatt a kérés szálában számolunk
+# sync_*:      workerek közötti szinkron – legfeljebb sync_interval másodpercenként
+#              megnézzük a változásnaplót (KnowledgeIndexChange), és csak a deltát
+#              alkalmazzuk (overlay sorokként, az alap mátrix másolása nélkül);
+#              sync_max_delta-nál több változásnál vagy overlay sornál teljes
+#              újratöltés. A generáció-kurzor csak SQLite-on teljes (lásd index_sync)
+# item_top_m: kétszintű keresés – először a tudáselemek centroidjait pontozzuk, és
+#              csak a legjobb item_top_m tudáselem chunkjait (0 = kikapcsolva)
+# search_nodes: sharded topológia – ha meg van adva, a RAGService koordinátorként a
+#              felsorolt keresőnódusoknak küldi a query vektort (node_timeout mp
+#              nódusonként, node_token a belső végpont védelmére – nélküle a végpont 403)
+# node_*:      a nódus saját tulajdonrésze: kategórianevek és/vagy "kezdő-vég"
+#              chunk-id tartomány; a nódus csak ezeket tölti a memóriaindexébe
+# related_items_k: kapcsolódó tudáselemek – ennyi szomszédot tárol tudáselemenként
+#              az előre kiszámolt kNN gráf (manage.py build_related_items)
+# -------------------------------------------------------------------------
+RAG_SETTINGS = {
+    "index_mode": os.getenv("RAG_INDEX_MODE", "memory"),
+    "ann_backend": os.getenv("RAG_ANN_BACKEND", "exact"),
+    "ivf_nlist": int(os.getenv("RAG_IVF_NLIST", "64")),
+    "ivf_nprobe": int(os.getenv("RAG_IVF_NPROBE", "8")),
+    "ivf_path": os.getenv("RAG_IVF_PATH"),
+    "quantization": os.getenv("RAG_QUANTIZATION", "none"),
+    "oversample": int(os.getenv("RAG_OVERSAMPLE", "10")),
+    "category_min_confidence": float(os.getenv("RAG_CATEGORY_MIN_CONFIDENCE", "0.5")),
+    "mmr_enabled": os.getenv("RAG_MMR_ENABLED", "False") == "True",
+    "mmr_lambda": float(os.getenv("RAG_MMR_LAMBDA", "0.7")),
+    "mmr_pool_size": int(os.getenv("RAG_MMR_POOL_SIZE", "30")),
+    "parallel_workers": int(os.getenv("RAG_PARALLEL_WORKERS", "0")),
+    "parallel_shards": int(os.getenv("RAG_PARALLEL_SHARDS", "0")),
+    "parallel_min_rows": int(os.getenv("RAG_PARALLEL_MIN_ROWS", "50000")),
+    "sync_interval": float(os.getenv("RAG_SYNC_INTERVAL", "2.0")),
+    "sync_max_delta": int(os.getenv("RAG_SYNC_MAX_DELTA", "5000")),
+    "item_top_m": int(os.getenv("RAG_ITEM_TOP_M", "0")),
+    "search_nodes": [n.strip() for n in os.getenv("RAG_SEARCH_NODES", "").split(",") if n.strip()],
+    "node_timeout": float(os.getenv("RAG_NODE_TIMEOUT", "2.0")),
+    "node_token": os.getenv("RAG_NODE_TOKEN", ""),
+    "node_categories": [c.strip() for c in os.getenv("RAG_NODE_CATEGORIES", "").split(",") if c.strip()],
+    "node_chunk_range": os.getenv("RAG_NODE_CHUNK_RANGE", ""),
+    "related_items_k": int(os.getenv("RAG_RELATED_ITEMS_K", "10")),
+}
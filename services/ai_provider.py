@@ -1,6 +1,9 @@
 #file: services/ai_provider.py
 # A modul a megfelelő AI klienst adja vissza llm paraméter alapján.
 
+from django.conf import settings
+
+from services.clients.local_embedding_client import LocalEmbeddingClient
 from services.clients.pluto_client import PlutoAIClient
 from services.clients.openai_client import OpenAIClient
 from services.clients.perplexity_client import PerplexityClient
@@ -13,6 +16,7 @@ def get_ai_client(llm: str):
     - pluto
     - openai
     - perplexity
+    - local (csak embedding, lásd fit_local_embeddings)
     """
     llm = (llm or "").lower()
 
@@ -25,4 +29,31 @@ def get_ai_client(llm: str):
     if llm == "perplexity":
         return PerplexityClient()
 
+    if llm == "local":
+        return LocalEmbeddingClient()
+
     raise ValueError(f"❌ Ismeretlen LLM provider: {llm}")
+
+
+def get_embedding_client():
+    """
+    Az embeddingekhez használt kliens az EMBEDDING_PROVIDER beállítás szerint
+    (alapértelmezés: openai; "local" = offline, helyi modell).
+    """
+    return get_ai_client(getattr(settings, "EMBEDDING_PROVIDER", "openai"))
+
+
+def get_embedding_model_name() -> str:
+    """
+    Az aktív embedding modell neve – a keresés csak az ezzel készült vektorokat
+    használja. OpenAI esetén kliens (API kulcs) nélkül, helyi modellnél a
+    modellfájlból; ha a helyi modell hiányzik, üres string (nincs érvényes vektor).
+    """
+    provider = (getattr(settings, "EMBEDDING_PROVIDER", "openai") or "").lower()
+    if provider == "openai":
+        return OpenAIClient.EMBEDDING_MODEL
+
+    try:
+        return getattr(get_embedding_client(), "embedding_model", "")
+    except ValueError:
+        return ""
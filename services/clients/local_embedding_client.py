@@ -0,0 +1,22 @@
+#file: services/clients/local_embedding_client.py
+# Helyi embedding kliens – az OpenAI klienssel azonos get_embedding / get_embeddings
+# interfész, hálózati hívás nélkül (services/embedding/local_embedding.py modellje).
+
+from services.clients.base_client import BaseClient
+from services.embedding.local_embedding import get_local_embedding_model
+
+
+class LocalEmbeddingClient(BaseClient):
+    """Offline embedding a fit_local_embeddings paranccsal tanított modellel (chat nélkül)."""
+
+    def __init__(self, model_path=None):
+        self.model = get_local_embedding_model(model_path)
+        self.embedding_model = self.model.model_name
+
+    def get_embedding(self, text: str) -> list:
+        """Embedding generálása a helyi modellel."""
+        return self.model.embed(text)
+
+    def get_embeddings(self, texts: list) -> list:
+        """Több szöveg embeddingje (a bemenettel azonos sorrendben)."""
+        return [self.model.embed(text) for text in texts]
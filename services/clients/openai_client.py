@@ -9,13 +9,16 @@ from services.clients.base_client import BaseClient
 class OpenAIClient(BaseClient):
     """Chat és embedding hívások az OpenAI API-n keresztül."""
 
+    # Az embedding modell neve (kliens nélkül is olvasható, lásd get_embedding_model_name)
+    EMBEDDING_MODEL = "text-embedding-3-large"
+
     def __init__(self):
         api_key = settings.OPENAI_SETTINGS.get("api_key")
         if not api_key:
             raise ValueError("❌ OPENAI_API_KEY nincs beállítva!")
 
         self.chat_model = settings.OPENAI_SETTINGS.get("model", "gpt-4o-mini")
-        self.embedding_model = "text-embedding-3-large"
+        self.embedding_model = self.EMBEDDING_MODEL
 
         self.client = OpenAI(api_key=api_key)
 
@@ -51,3 +54,22 @@ class OpenAIClient(BaseClient):
         except Exception as e:
             print(f"Hiba embedding közben: {e}")
             return []
+
+    def get_embeddings(self, texts: list) -> list:
+        """
+        Több szöveg embeddingje egyetlen API hívással (lista input).
+        A visszaadott lista sorrendje megegyezik a bemenetével.
+        """
+
+        try:
+            result = self.client.embeddings.create(
+                model=self.embedding_model,
+                input=texts,
+            )
+
+            ordered = sorted(result.data, key=lambda item: item.index)
+            return [item.embedding for item in ordered]
+
+        except Exception as e:
+            print(f"Hiba batch embedding közben: {e}")
+            return []
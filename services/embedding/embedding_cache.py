@@ -0,0 +1,112 @@
+#file: services/embedding/embedding_cache.py
+# Perzisztens embedding cache – kulcs: (embedding modell, sha256(szöveg)).
+# Az újrachunkolás minden mentéskor új chunkokat hoz létre; a változatlan
+# szövegű chunkok (és a tudáselemek közötti azonos szövegrészek) innen kapják
+# vissza a vektorukat provider hívás nélkül. A méretet EMBEDDING_CACHE_MAX_ENTRIES
+# korlátozza: túllépéskor a legrégebben használt bejegyzések törlődnek.
+
+import hashlib
+from typing import Dict, Iterable, List
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from knowledge.models import EmbeddingCacheEntry
+from services.embedding.vector_codec import decode_vector, encode_vector
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_CACHE_MAX_ENTRIES = 50_000
+
+# Túllépéskor ennyivel a korlát alá takarítunk, hogy ne minden írás után kelljen
+EVICTION_SLACK = 0.1
+
+# Ennyi hash megy egy IN (...) lekérdezésbe
+LOOKUP_BATCH_SIZE = 500
+
+
+def get_cache_max_entries() -> int:
+    """A cache mérete (0 = kikapcsolva)."""
+    return int(getattr(settings, "EMBEDDING_CACHE_MAX_ENTRIES", DEFAULT_CACHE_MAX_ENTRIES))
+
+
+def content_hash(text: str) -> str:
+    """A beágyazandó szöveg sha256 hash-e (hex)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------------
+# Olvasás / írás
+# -------------------------------------------------------------------------
+def get_cached_vectors(model_name: str, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+    """
+    A cache-ben meglévő vektorok hash szerint; a találatok utolsó
+    használati idejét egyetlen UPDATE-tel frissítjük (LRU takarításhoz).
+    """
+    hashes = list(set(hashes))
+    found: Dict[str, np.ndarray] = {}
+    hit_ids: List[int] = []
+
+    for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+        rows = EmbeddingCacheEntry.objects.filter(
+            model_name=model_name,
+            content_hash__in=hashes[start:start + LOOKUP_BATCH_SIZE],
+        ).values_list("id", "content_hash", "vector")
+
+        for entry_id, key, data in rows:
+            found[key] = decode_vector(data, "float32")
+            hit_ids.append(entry_id)
+
+    if hit_ids:
+        EmbeddingCacheEntry.objects.filter(id__in=hit_ids).update(last_used_at=timezone.now())
+
+    return found
+
+
+def store_vectors(model_name: str, vectors: Dict[str, List[float]]):
+    """Új vektorok mentése egyetlen bulk inserttel, majd méretkorlát szerinti takarítás."""
+    entries = [
+        EmbeddingCacheEntry(
+            model_name=model_name,
+            content_hash=key,
+            vector=encode_vector(vector, "float32"),
+            dimensions=len(vector),
+        )
+        for key, vector in vectors.items()
+    ]
+    if not entries:
+        return
+
+    # Párhuzamos mentésnél ugyanaz a kulcs már bekerülhetett
+    EmbeddingCacheEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    evict_embedding_cache()
+
+
+def evict_embedding_cache(max_entries: int = None) -> int:
+    """
+    A legrégebben használt bejegyzések törlése, ha a cache túllépte a korlátot.
+
+    Visszatér:
+        int: törölt bejegyzések száma
+    """
+    max_entries = get_cache_max_entries() if max_entries is None else max_entries
+
+    count = EmbeddingCacheEntry.objects.count()
+    if count <= max_entries:
+        return 0
+
+    target = int(max_entries * (1 - EVICTION_SLACK))
+    stale_ids = list(
+        EmbeddingCacheEntry.objects.order_by("last_used_at", "id")
+        .values_list("id", flat=True)[:count - target]
+    )
+
+    deleted = 0
+    for start in range(0, len(stale_ids), LOOKUP_BATCH_SIZE):
+        deleted += EmbeddingCacheEntry.objects.filter(
+            id__in=stale_ids[start:start + LOOKUP_BATCH_SIZE]
+        ).delete()[0]
+    return deleted
@@ -6,6 +6,13 @@
 from typing import List, Optional
 from django.conf import settings
 
+from services.embedding.embedding_cache import (
+    content_hash,
+    get_cache_max_entries,
+    get_cached_vectors,
+    store_vectors,
+)
+
 
 class EmbeddingService:
     """
@@ -30,6 +37,7 @@ class EmbeddingService:
         """
         self.client = client
         self.max_text_length = getattr(settings, "EMBEDDING_MAX_TEXT", 5000)
+        self.batch_size = max(1, getattr(settings, "EMBEDDING_BATCH_SIZE", 100))
 
     def _prepare_text(self, text: str) -> str:
         """
@@ -65,6 +73,84 @@ class EmbeddingService:
             return None
 
 
+    def create_embeddings(self, texts: List[str], use_cache: bool = False) -> List[Optional[List[float]]]:
+        """
+        Több szöveg embeddingje batch provider hívásokkal (EMBEDDING_BATCH_SIZE
+        szövegenként egy hívás), ha a kliens támogatja (get_embeddings),
+        különben szövegenként.
+
+        Paraméterek:
+            texts (List[str])
+            use_cache (bool): a perzisztens embedding cache használata – csak a
+                cache-ben nem szereplő szövegek mennek a providerhez, és egy
+                szöveg egy hívásban csak egyszer (EMBEDDING_CACHE_MAX_ENTRIES = 0
+                esetén kikapcsolva)
+
+        Visszatér:
+            a bemenettel azonos hosszú lista; üres szöveg vagy hiba esetén
+            az adott pozíción None (egy hibás batch a többit nem érinti)
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        positions = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not positions:
+            return results
+
+        prepared = [self._prepare_text(texts[i]) for i in positions]
+
+        if not use_cache or get_cache_max_entries() <= 0:
+            for pos, vector in zip(positions, self._embed_prepared(prepared)):
+                results[pos] = vector
+            return results
+
+        # Cache: (modell, sha256) → vektor
+        model_name = getattr(self.client, "embedding_model", "")
+        hashes = [content_hash(text) for text in prepared]
+        cached = get_cached_vectors(model_name, hashes)
+
+        missing = {}
+        for key, text in zip(hashes, prepared):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        fresh = {}
+        if missing:
+            vectors = self._embed_prepared(list(missing.values()))
+            fresh = {key: vector for key, vector in zip(missing, vectors) if vector is not None}
+            store_vectors(model_name, fresh)
+
+        for pos, key in zip(positions, hashes):
+            vector = cached.get(key)
+            results[pos] = vector.tolist() if vector is not None else fresh.get(key)
+
+        return results
+
+    def _embed_prepared(self, prepared: List[str]) -> List[Optional[List[float]]]:
+        """Előkészített szövegek embeddingje a providertől (cache nélkül)."""
+        results: List[Optional[List[float]]] = [None] * len(prepared)
+
+        if not hasattr(self.client, "get_embeddings"):
+            return [self.create_embedding(text) for text in prepared]
+
+        for start in range(0, len(prepared), self.batch_size):
+            batch = prepared[start:start + self.batch_size]
+
+            try:
+                vectors = self.client.get_embeddings(batch)
+            except Exception as e:
+                print(f"Hiba batch embedding generálás közben: {e}")
+                continue
+
+            if len(vectors) != len(batch):
+                print("Hiba batch embedding generálás közben: eltérő számú vektor érkezett.")
+                continue
+
+            for offset, vector in enumerate(vectors):
+                results[start + offset] = vector or None
+
+        return results
+
+
 # -------------------------------------------------------------------------
 # Helper – egyszerű hívás külön példányosítás nélkül
 # -------------------------------------------------------------------------
@@ -0,0 +1,338 @@
+#file: services/embedding/local_embedding.py
+# Helyi (offline) embedding modell – API hívás nélkül, a saját korpuszon tanítva.
+# Szöveg → hash-elt karakter n-gramok (szóhatáron belül) → TF-IDF → vetítés d dimenzióra.
+# A vetítés két része:
+#   - a korpusz TF-IDF mátrixának randomizált SVD-jéből tanult irányok (LSA),
+#   - véletlen (Johnson–Lindenstrauss) oszlopok, amelyek a korpuszban nem látott
+#     n-gramokat is megtartják (a lexikális átfedés így is számít).
+# Tanítás: python manage.py fit_local_embeddings; használat: EMBEDDING_PROVIDER=local.
+
+import hashlib
+import math
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_DIMENSIONS = 256
+DEFAULT_BUCKETS = 2 ** 14
+DEFAULT_SVD_COMPONENTS = 128
+DEFAULT_NGRAM_RANGE = (3, 5)
+DEFAULT_MIN_DF = 2
+
+# Randomizált SVD: túlmintavételezés és hatványiterációk száma
+SVD_OVERSAMPLE = 10
+SVD_POWER_ITERATIONS = 2
+
+_WORD = re.compile(r"\w+")
+
+
+def get_local_embedding_settings() -> dict:
+    return getattr(settings, "LOCAL_EMBEDDING_SETTINGS", {})
+
+
+def get_local_model_path() -> Path:
+    """Az aktív (a keresést kiszolgáló) modellfájl helye."""
+    return Path(get_local_embedding_settings().get("model_path", "local_embedding_model.npz"))
+
+
+# -------------------------------------------------------------------------
+# Jellemzők – hash-elt karakter n-gramok
+# -------------------------------------------------------------------------
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE) -> List[str]:
+    """
+    Karakter n-gramok szavanként, szóköz-határolással (" víz " → " ví", "víz", "íz ").
+    A rövid szavak egészben is bekerülnek.
+    """
+    low, high = ngram_range
+    text = unicodedata.normalize("NFC", text or "").casefold()
+
+    grams = []
+    for word in _WORD.findall(text):
+        padded = f" {word} "
+        if len(padded) <= low:
+            grams.append(padded)
+            continue
+        for n in range(low, min(high, len(padded)) + 1):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+    return grams
+
+
+def hashed_counts(
+    text: str, n_buckets: int, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A szöveg n-gram előfordulásai bucketenként (stabil crc32 hash, nem a
+    folyamatonként sózott hash()).
+
+    Visszatér:
+        (bucket indexek növekvő sorrendben, darabszámok)
+    """
+    grams = char_ngrams(text, ngram_range)
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    buckets = np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) % n_buckets for gram in grams),
+        dtype=np.int64,
+        count=len(grams),
+    )
+    indices, counts = np.unique(buckets, return_counts=True)
+    return indices, counts.astype(np.float32)
+
+
+def tfidf_weights(counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    """Szublineáris TF × IDF, L2-normalizálva."""
+    weights = (1.0 + np.log(counts)) * idf
+    norm = float(np.linalg.norm(weights))
+    return weights / norm if norm else weights
+
+
+# -------------------------------------------------------------------------
+# Modell
+# -------------------------------------------------------------------------
+class LocalEmbeddingModel:
+    """
+    LocalEmbeddingModel
+    -------------------
+    A tanított paraméterek: idf (bucketenként) és a vetítési mátrix
+    (buckets × d). A model_name a paraméterek hash-ét tartalmazza, így
+    újratanítás után az embedding cache és a tárolt embeddingek modellneve is változik.
+    """
+
+    def __init__(self, idf: np.ndarray, projection: np.ndarray, ngram_range: Tuple[int, int], meta: dict = None):
+        self.idf = idf.astype(np.float32)
+        self.projection = projection.astype(np.float32)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.meta = meta or {}
+
+        digest = hashlib.sha256()
+        digest.update(self.idf.tobytes())
+        digest.update(self.projection.tobytes())
+        digest.update(repr(self.ngram_range).encode())
+        self.model_name = f"local-ngram-tfidf-{self.dimensions}-{digest.hexdigest()[:12]}"
+
+    @property
+    def n_buckets(self) -> int:
+        return self.idf.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.projection.shape[1]
+
+    def embed(self, text: str) -> List[float]:
+        """Egy szöveg embeddingje (L2-normalizált); üres / jellemző nélküli szövegnél []."""
+        indices, counts = hashed_counts(text, self.n_buckets, self.ngram_range)
+        if not indices.size:
+            return []
+
+        vector = tfidf_weights(counts, self.idf[indices]) @ self.projection[indices]
+        norm = float(np.linalg.norm(vector))
+        if not norm:
+            return []
+
+        return (vector / norm).tolist()
+
+    # ------------------------------------------------------------------
+    def save(self, path: Path):
+        """Mentés .npz fájlba (ideiglenes fájl + csere, a futó workerek nem látnak félkész fájlt)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+
+        np.savez(
+            tmp_path,
+            idf=self.idf,
+            projection=self.projection,
+            ngram_range=np.array(self.ngram_range, dtype=np.int64),
+            svd_components=np.array(self.meta.get("svd_components", 0), dtype=np.int64),
+            documents=np.array(self.meta.get("documents", 0), dtype=np.int64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalEmbeddingModel":
+        with np.load(path) as data:
+            return cls(
+                idf=data["idf"],
+                projection=data["projection"],
+                ngram_range=tuple(data["ngram_range"].tolist()),
+                meta={
+                    "svd_components": int(data["svd_components"]),
+                    "documents": int(data["documents"]),
+                },
+            )
+
+
+# -------------------------------------------------------------------------
+# Betöltés – folyamatonként egyszer (a fájl módosításáig)
+# -------------------------------------------------------------------------
+_models: Dict[str, Tuple[int, LocalEmbeddingModel]] = {}
+_models_lock = threading.Lock()
+
+
+def get_local_embedding_model(path: Path = None) -> LocalEmbeddingModel:
+    """
+    A tanított modell a settings szerinti (vagy megadott) fájlból.
+    A RAGService kérésenként jön létre, ezért a betöltött modellt
+    folyamat-szinten tartjuk; újratanítás után a fájl alapján frissül.
+    """
+    path = Path(path or get_local_model_path())
+
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise ValueError(
+            f"❌ A helyi embedding modell nem található: {path} "
+            f"(tanítás: python manage.py fit_local_embeddings)"
+        )
+
+    key = str(path)
+    with _models_lock:
+        cached = _models.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        model = LocalEmbeddingModel.load(path)
+        _models[key] = (mtime, model)
+        print(f"✅ Helyi embedding modell betöltve: {model.model_name}")
+        return model
+
+
+# -------------------------------------------------------------------------
+# Modellváltás – verziózott fájl, explicit aktiválás
+# -------------------------------------------------------------------------
+def versioned_model_path(model: LocalEmbeddingModel, active_path: Path = None) -> Path:
+    """
+    Az újratanított modell fájlja az aktív mellett, a modellnév hash-ével
+    (local_embedding_model.npz → local_embedding_model-<hash>.npz). Így a
+    workerek az aktiválásig a régi modellel ágyazzák be a kérdéseket.
+    """
+    active_path = Path(active_path or get_local_model_path())
+    version = model.model_name.rsplit("-", 1)[-1]
+    return active_path.with_name(f"{active_path.stem}-{version}{active_path.suffix}")
+
+
+def install_local_embedding_model(source: Path, active_path: Path = None) -> Path:
+    """
+    A verziózott modellfájl aktiválása: másolás az aktív helyre (ideiglenes fájl +
+    csere). A workerek a fájl módosításakor töltik be az új modellt.
+
+    Visszatér:
+        az aktív modellfájl helye
+    """
+    source = Path(source)
+    active_path = Path(active_path or get_local_model_path())
+
+    if active_path.exists() and os.path.samefile(source, active_path):
+        return active_path
+
+    active_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = active_path.with_name(active_path.name + ".tmp.npz")
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, active_path)
+    return active_path
+
+
+# -------------------------------------------------------------------------
+# Tanítás
+# -------------------------------------------------------------------------
+def _rows_dot(rows: Sequence[Tuple[np.ndarray, np.ndarray]], matrix: np.ndarray) -> np.ndarray:
+    """X @ M a ritka sorokra (X: dokumentumok × bucketek)."""
+    out = np.empty((len(rows), matrix.shape[1]), dtype=np.float32)
+    for i, (indices, weights) in enumerate(rows):
+        out[i] = weights @ matrix[indices]
+    return out
+
+
+def _rows_tdot(rows: Sequence[Tuple[np.ndarray, np.ndarray]], matrix: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Xᵀ @ M a ritka sorokra (a sorokon belül a bucket indexek egyediek)."""
+    out = np.zeros((n_buckets, matrix.shape[1]), dtype=np.float32)
+    for i, (indices, weights) in enumerate(rows):
+        out[indices] += np.outer(weights, matrix[i])
+    return out
+
+
+def fit_local_embedding_model(
+    texts: Sequence[str],
+    dimensions: int = DEFAULT_DIMENSIONS,
+    n_buckets: int = DEFAULT_BUCKETS,
+    svd_components: int = DEFAULT_SVD_COMPONENTS,
+    ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE,
+    min_df: int = DEFAULT_MIN_DF,
+    seed: int = 42,
+) -> Optional[LocalEmbeddingModel]:
+    """
+    Modell tanítása a korpuszon.
+
+    Paraméterek:
+        dimensions: a kimeneti embedding mérete
+        n_buckets: a hash-elt n-gram tér mérete
+        svd_components: ennyi dimenzió jön a tanult (SVD) irányokból (legfeljebb
+            dimensions és dokumentumszám - 1), a többi véletlen vetítés
+        min_df: az SVD csak a legalább ennyi dokumentumban előforduló bucketekből tanul
+
+    Visszatér:
+        LocalEmbeddingModel vagy None, ha nincs használható szöveg
+    """
+    rng = np.random.default_rng(seed)
+
+    docs = [hashed_counts(text, n_buckets, ngram_range) for text in texts]
+    docs = [(indices, counts) for indices, counts in docs if indices.size]
+    if not docs:
+        return None
+
+    # IDF – a korpuszban nem szereplő bucketek a legnagyobb súlyt kapják
+    n_docs = len(docs)
+    df = np.bincount(np.concatenate([indices for indices, _ in docs]), minlength=n_buckets)
+    idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+
+    # Tanult irányok: a (min_df szerint szűrt) TF-IDF mátrix randomizált SVD-je
+    rank = max(0, min(svd_components, dimensions, n_docs - 1))
+    components = np.empty((n_buckets, 0), dtype=np.float32)
+
+    if rank:
+        frequent = df >= min_df
+        rows = []
+        for indices, counts in docs:
+            keep = frequent[indices]
+            rows.append((indices[keep], tfidf_weights(counts[keep], idf[indices[keep]])))
+
+        width = min(rank + SVD_OVERSAMPLE, n_docs)
+        sample = _rows_dot(rows, rng.standard_normal((n_buckets, width)).astype(np.float32))
+        for _ in range(SVD_POWER_ITERATIONS):
+            basis, _ = np.linalg.qr(_rows_tdot(rows, np.linalg.qr(sample)[0], n_buckets))
+            sample = _rows_dot(rows, basis)
+
+        basis, _ = np.linalg.qr(sample)
+        small = _rows_tdot(rows, basis, n_buckets).T         # (width × buckets)
+        _, singular, vt = np.linalg.svd(small, full_matrices=False)
+
+        rank = min(rank, int(np.count_nonzero(singular > 1e-6)))
+        components = vt[:rank].T.astype(np.float32)
+
+    # Véletlen vetítés a maradék dimenziókra (JL: a normákat közelítőleg megtartja)
+    random_dims = dimensions - rank
+    random_part = (
+        rng.standard_normal((n_buckets, random_dims)) / math.sqrt(random_dims)
+        if random_dims else np.empty((n_buckets, 0))
+    ).astype(np.float32)
+
+    return LocalEmbeddingModel(
+        idf=idf,
+        projection=np.hstack([components, random_part]),
+        ngram_range=ngram_range,
+        meta={"svd_components": rank, "documents": n_docs},
+    )
@@ -0,0 +1,327 @@
+#file: services/embedding/query_cache.py
+# Kétszintű query embedding cache – kulcs: (embedding modell, normalizált kérdés).
+# 1. szint: folyamatonkénti LRU (memória, lock-kal védve a szálak között),
+# 2. szint: a workerek között megosztott QueryEmbeddingCacheEntry tábla.
+# Mindkét szinten TTL és méretkorlát érvényes; az ismételt kérdés így
+# embedding API hívás nélkül kapja meg a query vektort.
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from knowledge.models import QueryEmbeddingCacheEntry
+from services.embedding.vector_codec import decode_vector, encode_vector
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_LRU_SIZE = 1000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 20_000
+
+# Túllépéskor ennyivel a korlát alá takarítunk, hogy ne minden írás után kelljen
+EVICTION_SLACK = 0.1
+
+# Takarítás legkésőbb ennyi másodpercenként (a lejárt bejegyzések miatt), egyébként
+# csak akkor, ha a folyamat a legutóbbi óta a korlát EVICTION_SLACK részének megfelelő
+# új bejegyzést írt – a COUNT(*) és a lejárat-törlés így nem fut minden írás után
+EVICTION_INTERVAL_SECONDS = 300.0
+
+# Ennyi id megy egy DELETE ... IN (...) lekérdezésbe
+DELETE_BATCH_SIZE = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Kérdés normalizálása a cache kulcshoz: Unicode NFC, kisbetűsítés,
+    összevont szóközök. A vektor az elsőként feltett változatból készül
+    (a kis- és nagybetűs változatok embeddingje gyakorlatilag azonos).
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def query_hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------------
+# Query embedding cache
+# -------------------------------------------------------------------------
+class QueryEmbeddingCache:
+    """
+    QueryEmbeddingCache
+    -------------------
+    Használat:
+        cache = get_query_cache()
+        vectors = cache.get_many(model_name, queries)      # None = nincs a cache-ben
+        cache.set_many(model_name, {query: vector, ...})
+
+    A vektorok float32 ndarray-ként (csak olvasható) jönnek vissza – az LRU így
+    találatonként nem épít Python float listát.
+
+    Paraméterek (settings):
+        EMBEDDING_QUERY_CACHE_LRU_SIZE: memóriában tartott kérdések (0 = ki)
+        EMBEDDING_QUERY_CACHE_MAX_ENTRIES: a tábla mérete (0 = ki)
+        EMBEDDING_QUERY_CACHE_TTL_SECONDS: egy bejegyzés élettartama (0 = korlátlan)
+    """
+
+    def __init__(self, lru_size: int = None, max_entries: int = None, ttl_seconds: float = None):
+        self.lru_size = max(0, int(
+            getattr(settings, "EMBEDDING_QUERY_CACHE_LRU_SIZE", DEFAULT_LRU_SIZE)
+            if lru_size is None else lru_size
+        ))
+        self.max_entries = max(0, int(
+            getattr(settings, "EMBEDDING_QUERY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+            if max_entries is None else max_entries
+        ))
+        self.ttl_seconds = max(0.0, float(
+            getattr(settings, "EMBEDDING_QUERY_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+            if ttl_seconds is None else ttl_seconds
+        ))
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()   # (modell, hash) → (lejárat, float32 vektor)
+
+        # Takarítás ütemezése (lásd _maybe_evict)
+        self._writes_since_evict = 0
+        self._last_evict = time.monotonic()
+
+        # Statisztika – a self._lock alatt frissül
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.lru_size or self.max_entries)
+
+    # ------------------------------------------------------------------
+    # 1. szint – LRU
+    # ------------------------------------------------------------------
+    def _lru_get(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+
+            expires_at, vector = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._lru[key]
+                return None
+
+            self._lru.move_to_end(key)
+            return vector
+
+    def _lru_put(self, key, vector: np.ndarray, age_seconds: float = 0.0):
+        if not self.lru_size:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds - age_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            self._lru[key] = (expires_at, vector)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def clear_local(self):
+        """A folyamat memóriájában tartott szint ürítése."""
+        with self._lock:
+            self._lru.clear()
+
+    # ------------------------------------------------------------------
+    # Olvasás
+    # ------------------------------------------------------------------
+    def get_many(self, model_name: str, queries: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        A kérdések cache-elt vektorai (a bemenettel azonos sorrendben, csak
+        olvasható float32 ndarray); ami egyik szinten sincs meg (vagy lejárt), ott None.
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(queries)
+        if not self.enabled:
+            return results
+
+        hits = db_hits = 0
+        missing: Dict[str, List[int]] = {}
+        for pos, query in enumerate(queries):
+            key_hash = query_hash(normalize_query(query))
+            vector = self._lru_get((model_name, key_hash))
+            if vector is not None:
+                results[pos] = vector
+                hits += 1
+            else:
+                missing.setdefault(key_hash, []).append(pos)
+
+        if missing and self.max_entries:
+            now = timezone.now()
+            rows = QueryEmbeddingCacheEntry.objects.filter(
+                model_name=model_name, query_hash__in=list(missing)
+            )
+            if self.ttl_seconds:
+                rows = rows.filter(created_at__gte=now - timedelta(seconds=self.ttl_seconds))
+
+            hit_ids = []
+            for entry_id, key_hash, data, created_at in rows.values_list(
+                "id", "query_hash", "vector", "created_at"
+            ):
+                vector = _frozen_vector(decode_vector(data, "float32"))
+                self._lru_put((model_name, key_hash), vector, (now - created_at).total_seconds())
+                for pos in missing.pop(key_hash):
+                    results[pos] = vector
+                    db_hits += 1
+                hit_ids.append(entry_id)
+
+            # Találatok: népszerűség + utolsó használat (LRU takarításhoz) egy UPDATE-tel
+            if hit_ids:
+                QueryEmbeddingCacheEntry.objects.filter(id__in=hit_ids).update(
+                    hit_count=F("hit_count") + 1, last_used_at=now
+                )
+
+        with self._lock:
+            self.hits += hits
+            self.db_hits += db_hits
+            self.misses += sum(len(positions) for positions in missing.values())
+
+        return results
+
+    def get(self, model_name: str, query: str) -> Optional[np.ndarray]:
+        return self.get_many(model_name, [query])[0]
+
+    # ------------------------------------------------------------------
+    # Írás
+    # ------------------------------------------------------------------
+    def set_many(self, model_name: str, vectors: Dict[str, List[float]]):
+        """Frissen generált query vektorok mentése mindkét szintre."""
+        if not self.enabled:
+            return
+
+        entries = {}
+        for query, vector in vectors.items():
+            if vector is None:
+                continue
+            normalized = normalize_query(query)
+            key_hash = query_hash(normalized)
+            vector = _frozen_vector(vector)
+            self._lru_put((model_name, key_hash), vector)
+            entries[key_hash] = (normalized, vector)
+
+        if not entries or not self.max_entries:
+            return
+
+        # Lejárt sor ugyanazzal a kulccsal: az új vektor váltja
+        if self.ttl_seconds:
+            QueryEmbeddingCacheEntry.objects.filter(
+                model_name=model_name,
+                query_hash__in=list(entries),
+                created_at__lt=timezone.now() - timedelta(seconds=self.ttl_seconds),
+            ).delete()
+
+        # Párhuzamos kéréseknél ugyanaz a kérdés már bekerülhetett
+        QueryEmbeddingCacheEntry.objects.bulk_create(
+            [
+                QueryEmbeddingCacheEntry(
+                    model_name=model_name,
+                    query_hash=key_hash,
+                    query_text=normalized[:2000],
+                    vector=encode_vector(vector, "float32"),
+                    dimensions=len(vector),
+                )
+                for key_hash, (normalized, vector) in entries.items()
+            ],
+            ignore_conflicts=True,
+        )
+        self._maybe_evict(len(entries))
+
+    def set(self, model_name: str, query: str, vector: List[float]):
+        self.set_many(model_name, {query: vector})
+
+    # ------------------------------------------------------------------
+    # Takarítás – lejárt bejegyzések + méretkorlát
+    # ------------------------------------------------------------------
+    def _maybe_evict(self, written: int):
+        """
+        Takarítás csak akkor, ha a legutóbbi óta elég új bejegyzés készült
+        (a korlát EVICTION_SLACK része), vagy letelt az EVICTION_INTERVAL_SECONDS.
+        A tábla így legfeljebb kb. EVICTION_SLACK-nyival lépi túl a korlátot.
+        """
+        threshold = max(1, int(self.max_entries * EVICTION_SLACK))
+
+        with self._lock:
+            self._writes_since_evict += written
+            due = (
+                self._writes_since_evict >= threshold
+                or time.monotonic() - self._last_evict >= EVICTION_INTERVAL_SECONDS
+            )
+            if not due:
+                return
+            self._writes_since_evict = 0
+            self._last_evict = time.monotonic()
+
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        A lejárt, majd (korláton felül) a legrégebben használt bejegyzések törlése.
+
+        Visszatér:
+            int: törölt bejegyzések száma
+        """
+        deleted = 0
+        if self.ttl_seconds:
+            deleted += QueryEmbeddingCacheEntry.objects.filter(
+                created_at__lt=timezone.now() - timedelta(seconds=self.ttl_seconds)
+            ).delete()[0]
+
+        count = QueryEmbeddingCacheEntry.objects.count()
+        if count <= self.max_entries:
+            return deleted
+
+        target = int(self.max_entries * (1 - EVICTION_SLACK))
+        stale_ids = list(
+            QueryEmbeddingCacheEntry.objects.order_by("last_used_at", "id")
+            .values_list("id", flat=True)[:count - target]
+        )
+        for start in range(0, len(stale_ids), DELETE_BATCH_SIZE):
+            deleted += QueryEmbeddingCacheEntry.objects.filter(
+                id__in=stale_ids[start:start + DELETE_BATCH_SIZE]
+            ).delete()[0]
+        return deleted
+
+
+def _frozen_vector(vector) -> np.ndarray:
+    """float32, csak olvasható vektor – az LRU-ban tárolt példányt a hívó nem módosíthatja."""
+    array = np.array(vector, dtype=np.float32)
+    array.flags.writeable = False
+    return array
+
+
+# -------------------------------------------------------------------------
+# Folyamat-szintű példány
+# -------------------------------------------------------------------------
+_query_cache: Optional[QueryEmbeddingCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """A folyamat közös query cache-e (az LRU szint így a kérések között megmarad)."""
+    global _query_cache
+
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryEmbeddingCache()
+
+    return _query_cache
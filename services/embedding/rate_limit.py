@@ -0,0 +1,81 @@
+#file: services/embedding/rate_limit.py
+# Percenkénti kérés- és tokenkeret az embedding provider hívásaihoz.
+# Csúszó 60 másodperces ablak; több szálból is biztonságosan használható
+# (a backfill párhuzamos hívásai közösen osztoznak rajta).
+
+import threading
+import time
+from collections import deque
+
+
+WINDOW_SECONDS = 60.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Durva tokenbecslés tokenizáló nélkül (~4 karakter / token)."""
+    return len(text or "") // 4 + 1
+
+
+class RateBudget:
+    """
+    RateBudget
+    ----------
+    Legfeljebb requests_per_minute hívás és tokens_per_minute token
+    az utolsó 60 másodpercben. 0 = az adott korlát kikapcsolva.
+
+    Használat:
+        budget = RateBudget(requests_per_minute=3000, tokens_per_minute=1_000_000)
+        budget.acquire(estimate_tokens(text))   # szükség esetén vár
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = max(0, requests_per_minute or 0)
+        self.tokens_per_minute = max(0, tokens_per_minute or 0)
+
+        self._lock = threading.Lock()
+        self._events = deque()          # (időpont, tokenek)
+        self._tokens_in_window = 0
+
+    def _prune(self, now: float):
+        while self._events and now - self._events[0][0] >= WINDOW_SECONDS:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def _fits(self, tokens: int) -> bool:
+        if self.requests_per_minute and len(self._events) >= self.requests_per_minute:
+            return False
+
+        # Egy kereten túli kérés is átmegy üres ablaknál (különben sosem futna le)
+        if self.tokens_per_minute and self._events \
+                and self._tokens_in_window + tokens > self.tokens_per_minute:
+            return False
+
+        return True
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Egy hívás (tokens becsült tokennel) lefoglalása a keretből.
+        Ha nem fér bele, addig vár, amíg a legrégebbi hívás ki nem esik az ablakból.
+
+        Visszatér:
+            a várakozással töltött idő (másodperc)
+        """
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+
+                if self._fits(tokens):
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return waited
+
+                delay = self._events[0][0] + WINDOW_SECONDS - now
+
+            delay = min(max(delay, 0.01), 1.0)
+            time.sleep(delay)
+            waited += delay
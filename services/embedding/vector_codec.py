@@ -0,0 +1,65 @@
+#file: services/embedding/vector_codec.py
+# Embedding vektorok bináris kódolása – nyers little-endian float32 / float16 bájtsor.
+# A JSON szöveges tárolás helyett: kisebb adatbázis, olvasáskor egyetlen frombuffer hívás.
+
+from typing import Iterable
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+# Támogatott tárolási típusok
+# -------------------------------------------------------------------------
+VECTOR_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+DEFAULT_VECTOR_DTYPE = "float32"
+
+
+def _get_dtype(dtype: str) -> np.dtype:
+    try:
+        return VECTOR_DTYPES[dtype or DEFAULT_VECTOR_DTYPE]
+    except KeyError:
+        raise ValueError(f"❌ Ismeretlen vektor tárolási típus: {dtype}")
+
+
+# -------------------------------------------------------------------------
+# Kódolás / dekódolás
+# -------------------------------------------------------------------------
+def encode_vector(vector: Iterable[float], dtype: str = DEFAULT_VECTOR_DTYPE) -> bytes:
+    """
+    Float lista (vagy numpy tömb) → nyers little-endian bájtsor.
+
+    Paraméterek:
+        vector: embedding vektor
+        dtype (str): "float32" (alapértelmezés) vagy "float16"
+    """
+    return np.asarray(vector, dtype=_get_dtype(dtype)).tobytes()
+
+
+def decode_vector(data, dtype: str = DEFAULT_VECTOR_DTYPE) -> np.ndarray:
+    """
+    Bájtsor → float32 numpy vektor.
+    A float16 tárolású vektorokat float32-re alakítjuk a számításokhoz.
+    """
+    if not data:
+        return np.empty(0, dtype=np.float32)
+
+    vector = np.frombuffer(data, dtype=_get_dtype(dtype))
+    return vector.astype(np.float32, copy=False)
+
+
+# -------------------------------------------------------------------------
+# Matryoshka-rövidítés
+# -------------------------------------------------------------------------
+def truncate_vector(vector: Iterable[float], dimensions: int) -> np.ndarray:
+    """
+    A vektor első `dimensions` eleme, egységnyi hosszra újranormalizálva.
+    A text-embedding-3 modellcsalád így tanult: az előtag önmagában is
+    használható (kisebb felbontású) embedding.
+    """
+    prefix = np.asarray(vector, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(prefix, axis=-1, keepdims=True)
+    return prefix / np.where(norms == 0, 1.0, norms)
@@ -0,0 +1,339 @@
+#file: services/ingestion/backfill.py
+# Hiányzó chunk-embeddingek tömeges pótlása (modellcsere, adatbázis-visszaállítás után).
+# A be nem ágyazott chunkokat id szerint lapozva olvassuk, a provider hívások
+# korlátos szálkészletben, közös kérés/token kerettel futnak, az adatbázis-írás
+# a fő szálon marad. A checkpoint fájl miatt egy megszakított futás folytatható.
+# Nem aktív modellel a backfill előkészít: az új vektorok a régiek mellé kerülnek,
+# a keresés közben a régi modellel fut, a váltás az activate_embedding_model().
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, QuerySet
+
+from knowledge.models import KnowledgeChunk, KnowledgeEmbedding
+from services.ai_provider import get_embedding_model_name
+from services.embedding.embedding_service import EmbeddingService
+from services.embedding.rate_limit import RateBudget, estimate_tokens
+from services.ingestion.pipeline import store_chunk_embeddings
+from services.rag.retrieval_provider import get_retrieval_backend
+
+
+DEFAULT_WORKERS = 4
+PAGE_SIZE = 1000
+
+
+# -------------------------------------------------------------------------
+# Checkpoint – az utolsó, hiánytalanul feldolgozott chunk id
+# -------------------------------------------------------------------------
+def get_checkpoint_path() -> Path:
+    return Path(getattr(settings, "EMBEDDING_BACKFILL_CHECKPOINT", "embedding_backfill.json"))
+
+
+def load_checkpoint(path: Path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"❌ Backfill checkpoint nem olvasható ({path}): {e}")
+        return {}
+
+
+def save_checkpoint(path: Path, state: dict):
+    """Atomikus írás: ideiglenes fájl + csere, így megszakításkor sem sérül."""
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def clear_checkpoint(path: Path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# -------------------------------------------------------------------------
+# Be nem ágyazott chunkok – keyset lapozás id szerint
+# -------------------------------------------------------------------------
+def unembedded_chunks(model_name: str) -> QuerySet:
+    """
+    A model_name modellel még be nem ágyazott chunkok. Nem az is_embedded
+    jelzőt nézzük: az az aktív modellre vonatkozik, előkészítésnél (és közvetlenül
+    az EMBEDDING_PROVIDER átállítása után) a célmodell embeddingje számít.
+    """
+    return KnowledgeChunk.objects.filter(
+        ~Exists(KnowledgeEmbedding.objects.filter(chunk=OuterRef("pk"), model_name=model_name))
+    )
+
+
+def iter_unembedded_chunks(
+    model_name: str, after_id: int = 0, page_size: int = PAGE_SIZE
+) -> Iterator[KnowledgeChunk]:
+    """
+    A be nem ágyazott chunkok id szerint növekvő sorrendben, lapokban
+    (a teljes táblát sosem tartjuk memóriában, az offset nélküli lapozás
+    pedig a közben beágyazott chunkoktól sem csúszik el).
+    """
+    last_id = after_id
+
+    while True:
+        page = list(
+            unembedded_chunks(model_name).filter(id__gt=last_id)
+            .only("id", "item_id", "index", "content")
+            .order_by("id")[:page_size]
+        )
+        if not page:
+            return
+
+        yield from page
+        last_id = page[-1].id
+
+
+# -------------------------------------------------------------------------
+# Modellváltás lezárása – a régi modell embeddingjeinek törlése
+# -------------------------------------------------------------------------
+def activate_embedding_model(model_name: str, batch_size: int = PAGE_SIZE) -> int:
+    """
+    Modellváltás lezárása, miután model_name lett az aktív modell (a keresés
+    már az ő vektoraival fut):
+    - az is_embedded jelzők újraszámolása a model_name embeddingek alapján,
+    - a más modellel készült embeddingek törlése batchenként egy DELETE-tel
+      (_raw_delete: a törlési gyűjtő nélkül – ezek a vektorok már nincsenek
+      a keresőindexben, így keresőbackend-törlés sem kell).
+
+    Visszatér:
+        a törölt embeddingek száma
+    """
+    KnowledgeChunk.objects.update(
+        is_embedded=Exists(KnowledgeEmbedding.objects.filter(chunk=OuterRef("pk"), model_name=model_name))
+    )
+
+    stale = KnowledgeEmbedding.objects.exclude(model_name=model_name).order_by("id")
+    total = 0
+
+    while True:
+        embedding_ids = list(stale.values_list("id", flat=True)[:batch_size])
+        if not embedding_ids:
+            return total
+
+        batch = KnowledgeEmbedding.objects.filter(id__in=embedding_ids)
+        batch._raw_delete(batch.db)
+        total += len(embedding_ids)
+
+
+# -------------------------------------------------------------------------
+# Backfill futtatás
+# -------------------------------------------------------------------------
+class EmbeddingBackfill:
+    """
+    EmbeddingBackfill
+    -----------------
+    A be nem ágyazott chunkok embeddingje batch hívásokkal, legfeljebb
+    workers párhuzamos provider hívással. A batchek tetszőleges sorrendben
+    készülhetnek el; a checkpoint mindig csak a hiánytalanul feldolgozott
+    id-tartomány végéig lép előre.
+
+    Ha a kliens modellje nem az aktív modell (staging), az új vektorok a régiek
+    mellé kerülnek: sem az is_embedded jelző, sem a keresőbackend nem változik,
+    a keresés a régi modellel fut tovább az aktiválásig.
+
+    Használat:
+        backfill = EmbeddingBackfill(client, workers=4, budget=RateBudget(3000, 1_000_000))
+        stats = backfill.run(on_progress=print)
+    """
+
+    def __init__(
+        self,
+        client,
+        workers: int = DEFAULT_WORKERS,
+        batch_size: int = None,
+        budget: RateBudget = None,
+        checkpoint_path: Path = None,
+    ):
+        self.client = client
+        self.model_name = getattr(client, "embedding_model", "")
+        self.staging = self.model_name != get_embedding_model_name()
+        self.workers = max(1, workers)
+        self.budget = budget or RateBudget()
+        self.checkpoint_path = checkpoint_path or get_checkpoint_path()
+
+        self.embedding_service = EmbeddingService(client)
+        if batch_size:
+            self.embedding_service.batch_size = max(1, batch_size)
+        self.batch_size = self.embedding_service.batch_size
+
+    # ------------------------------------------------------------------
+    def _embed_batch(self, texts: List[str]):
+        """Szálkészletben fut: csak provider hívás, adatbázis-hozzáférés nélkül."""
+        self.budget.acquire(sum(estimate_tokens(text) for text in texts))
+        return self.embedding_service.create_embeddings(texts)
+
+    def _batches(self, after_id: int, limit: Optional[int]) -> Iterator[List[KnowledgeChunk]]:
+        batch = []
+        taken = 0
+
+        for chunk in iter_unembedded_chunks(self.model_name, after_id):
+            if limit and taken >= limit:
+                break
+
+            batch.append(chunk)
+            taken += 1
+
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    # ------------------------------------------------------------------
+    def _initial_state(self, restart: bool) -> dict:
+        state = {} if restart else load_checkpoint(self.checkpoint_path)
+
+        if state and state.get("model_name") != self.model_name:
+            print(
+                f"⚠️ A checkpoint más modellhez tartozik ({state.get('model_name')}), "
+                f"a backfill az elejéről indul."
+            )
+            state = {}
+
+        return {
+            "model_name": self.model_name,
+            "last_chunk_id": state.get("last_chunk_id", 0),
+            "embedded": state.get("embedded", 0),
+            "failed": state.get("failed", 0),
+        }
+
+    def _save_state(self, state: dict):
+        state["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        save_checkpoint(self.checkpoint_path, state)
+
+    # ------------------------------------------------------------------
+    def run(
+        self,
+        limit: int = None,
+        restart: bool = False,
+        on_progress: Callable[[Dict], None] = None,
+    ) -> Dict:
+        """
+        Backfill futtatása (KeyboardInterrupt esetén a már elkészült batchek
+        mentése után áll le).
+
+        Paraméterek:
+            limit: legfeljebb ennyi chunk ebben a futásban
+            restart: a checkpoint figyelmen kívül hagyása
+            on_progress: minden mentett batch után hívódik a futás statisztikájával
+
+        Visszatér:
+            {"total", "processed", "embedded", "failed", "elapsed",
+             "resumed_from", "completed", "interrupted"}
+        """
+        state = self._initial_state(restart)
+        after_id = state["last_chunk_id"]
+
+        total = unembedded_chunks(self.model_name).filter(id__gt=after_id).count()
+        if limit:
+            total = min(total, limit)
+
+        stats = {
+            "total": total,
+            "processed": 0,
+            "embedded": 0,
+            "failed": 0,
+            "elapsed": 0.0,
+            "resumed_from": after_id,
+            "completed": False,
+            "interrupted": False,
+        }
+        if not total:
+            stats["completed"] = True
+            clear_checkpoint(self.checkpoint_path)
+            return stats
+
+        backend = get_retrieval_backend()
+        started = time.perf_counter()
+
+        in_flight = {}          # future → batch
+        submitted = deque()     # futures beküldési (id) sorrendben
+        finished = set()
+
+        def handle(future):
+            batch = in_flight.pop(future)
+            try:
+                vectors = future.result()
+            except Exception as e:
+                print(f"Hiba batch embedding generálás közben: {e}")
+                vectors = [None] * len(batch)
+
+            embedded = store_chunk_embeddings(batch, vectors, self.model_name, mark_embedded=not self.staging)
+            if embedded and not self.staging:
+                backend.index([chunk.id for chunk in embedded])
+
+            stats["processed"] += len(batch)
+            stats["embedded"] += len(embedded)
+            stats["failed"] += len(batch) - len(embedded)
+            state["embedded"] += len(embedded)
+            state["failed"] += len(batch) - len(embedded)
+            finished.add(future)
+
+            # A checkpoint csak a folytonosan kész batcheken lép túl
+            while submitted and submitted[0] in finished:
+                done = submitted.popleft()
+                finished.discard(done)
+                state["last_chunk_id"] = done.last_chunk_id
+            self._save_state(state)
+
+            stats["elapsed"] = time.perf_counter() - started
+            if on_progress:
+                on_progress(dict(stats))
+
+        def drain(return_when):
+            done, _ = wait(list(in_flight), return_when=return_when)
+            for future in done:
+                handle(future)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as executor:
+            try:
+                for batch in self._batches(after_id, limit):
+                    # Korlátos előretöltés: legfeljebb 2 × workers batch vár a memóriában
+                    while len(in_flight) >= self.workers * 2:
+                        drain(FIRST_COMPLETED)
+
+                    future = executor.submit(self._embed_batch, [chunk.content for chunk in batch])
+                    future.last_chunk_id = batch[-1].id
+                    in_flight[future] = batch
+                    submitted.append(future)
+
+                while in_flight:
+                    drain(FIRST_COMPLETED)
+
+            except KeyboardInterrupt:
+                stats["interrupted"] = True
+                for future in list(in_flight):
+                    if future.cancel():
+                        in_flight.pop(future)
+                while in_flight:
+                    drain(FIRST_COMPLETED)
+
+        stats["elapsed"] = time.perf_counter() - started
+
+        # Nincs több be nem ágyazott chunk a checkpoint után → a következő futás
+        # az elejéről indul (a sikertelen chunkokat is újrapróbálja)
+        if not stats["interrupted"] and not unembedded_chunks(self.model_name).filter(
+            id__gt=state["last_chunk_id"]
+        ).exists():
+            stats["completed"] = True
+            clear_checkpoint(self.checkpoint_path)
+
+        return stats
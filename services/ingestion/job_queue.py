@@ -0,0 +1,250 @@
+#file: services/ingestion/job_queue.py
+# Adatbázis alapú feladatsor a tudáselem-feldolgozáshoz (külső broker nélkül).
+# A feladatokat bérlettel (lease) vesszük fel: ha egy worker a feldolgozás
+# közben leáll, a bérlet lejárta után egy másik worker átveheti. Hiba esetén
+# exponenciális backoff-fal próbálkozunk újra, max_attempts után "failed".
+
+import random
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from knowledge.models import KnowledgeJob
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_BASE = 10.0
+DEFAULT_BACKOFF_MAX = 3600.0
+
+
+def _worker_settings() -> dict:
+    return getattr(settings, "KNOWLEDGE_WORKER_SETTINGS", {})
+
+
+def is_async_ingestion() -> bool:
+    """True: a mentési signalok csak sorba teszik a feldolgozást."""
+    return bool(_worker_settings().get("async_ingestion", False))
+
+
+def _max_attempts() -> int:
+    return int(_worker_settings().get("max_attempts", DEFAULT_MAX_ATTEMPTS))
+
+
+# -------------------------------------------------------------------------
+# Sorba állítás
+# -------------------------------------------------------------------------
+def enqueue_item(item_id: int, kind: str = KnowledgeJob.KIND_PROCESS):
+    """
+    Tudáselem-feladat sorba állítása (kind: KnowledgeJob.KIND_*).
+    Ha már vár ugyanilyen feladat ugyanerre a tudáselemre, nem jön létre újabb
+    (a worker mindig az aktuális állapotot dolgozza fel). Az egyediséget a
+    feltételes UniqueConstraint biztosítja: párhuzamos mentéseknél az ütköző
+    beszúrás egyszerűen kimarad (ignore_conflicts), nincs check-then-insert verseny.
+    """
+    KnowledgeJob.objects.bulk_create(
+        [KnowledgeJob(item_id=item_id, kind=kind, available_at=timezone.now())],
+        ignore_conflicts=True,
+    )
+
+
+def enqueue_related_refresh(item_id: int):
+    """
+    A kapcsolódó tudáselemek frissítése a tranzakció lezárulta után a sorba kerül:
+    a teljes tudáselem-mátrix betöltése és a szomszédlisták újraszámolása így
+    nem a mentés útvonalán fut. Egy tudáselemre egyszerre egy feladat vár, így
+    gyors egymás utáni mentéseknél is egyszer számolunk.
+    """
+    transaction.on_commit(lambda: enqueue_item(item_id, kind=KnowledgeJob.KIND_RELATED))
+
+
+# -------------------------------------------------------------------------
+# Felvétel bérlettel
+# -------------------------------------------------------------------------
+def _claimable(now, max_attempts: int) -> Q:
+    """
+    Felvehető: esedékes várakozó, vagy lejárt bérletű (leállt worker) futó
+    feladat, ha még van hátra próbálkozása.
+    """
+    return (
+        Q(status=KnowledgeJob.STATUS_PENDING, available_at__lte=now)
+        | Q(status=KnowledgeJob.STATUS_RUNNING, lease_expires_at__lt=now, attempts__lt=max_attempts)
+    )
+
+
+def _fail_expired_jobs(now, max_attempts: int) -> int:
+    """
+    A lejárt bérletű, a próbálkozásait már elhasznált futó feladatok végleges
+    "failed" állapotba kerülnek (pl. minden felvételkor összeomló worker),
+    különben futó állapotban ragadnának.
+    """
+    return KnowledgeJob.objects.filter(
+        status=KnowledgeJob.STATUS_RUNNING, lease_expires_at__lt=now, attempts__gte=max_attempts
+    ).update(
+        status=KnowledgeJob.STATUS_FAILED,
+        lease_expires_at=None,
+        last_error="A bérlet lejárt az utolsó próbálkozás közben (a worker leállt).",
+        updated_at=now,
+    )
+
+
+def claim_jobs(worker_id: str, limit: int = 1, lease_seconds: float = None) -> List[KnowledgeJob]:
+    """
+    Legfeljebb limit feladat felvétele.
+    Jelöltenként egy feltételes UPDATE: csak az a worker kapja meg, amelyiknél
+    a sor még felvehető állapotban volt (SELECT FOR UPDATE nélkül, SQLite-on is).
+    """
+    lease_seconds = lease_seconds or _worker_settings().get("lease_seconds", DEFAULT_LEASE_SECONDS)
+    max_attempts = _max_attempts()
+    now = timezone.now()
+
+    _fail_expired_jobs(now, max_attempts)
+
+    candidate_ids = list(
+        KnowledgeJob.objects.filter(_claimable(now, max_attempts))
+        .order_by("available_at", "id")
+        .values_list("id", flat=True)[:limit * 4]
+    )
+
+    claimed_ids = []
+    for job_id in candidate_ids:
+        updated = KnowledgeJob.objects.filter(_claimable(now, max_attempts), id=job_id).update(
+            status=KnowledgeJob.STATUS_RUNNING,
+            locked_by=worker_id,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+        if updated:
+            claimed_ids.append(job_id)
+            if len(claimed_ids) >= limit:
+                break
+
+    return list(KnowledgeJob.objects.filter(id__in=claimed_ids).order_by("available_at", "id"))
+
+
+def renew_lease(job: KnowledgeJob, lease_seconds: float = None) -> bool:
+    """
+    A bérlet meghosszabbítása közvetlenül a feladat futtatása előtt.
+    Egy batchben felvett feladatok közül a későbbiek bérlete különben lejárhat,
+    mire sorra kerülnek, és egy másik worker is átvenné (kétszeres embedding).
+    Csak akkor sikerül, ha a feladatot azóta senki sem vette át.
+
+    Visszatér:
+        True, ha a feladat még ennél a workernél fut (futtatható)
+    """
+    lease_seconds = lease_seconds or _worker_settings().get("lease_seconds", DEFAULT_LEASE_SECONDS)
+    now = timezone.now()
+    job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+
+    return bool(
+        KnowledgeJob.objects.filter(
+            id=job.id,
+            status=KnowledgeJob.STATUS_RUNNING,
+            locked_by=job.locked_by,
+            attempts=job.attempts,
+        ).update(lease_expires_at=job.lease_expires_at, updated_at=now)
+    )
+
+
+# -------------------------------------------------------------------------
+# Lezárás
+# -------------------------------------------------------------------------
+def complete_job(job: KnowledgeJob):
+    """Sikeres feldolgozás – a feladat törlődik (a sor csak a teendőket tartja)."""
+    KnowledgeJob.objects.filter(id=job.id, locked_by=job.locked_by).delete()
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponenciális backoff (±20% véletlen szórással, hogy a hibák ne szinkronizálódjanak)."""
+    worker_settings = _worker_settings()
+    base = worker_settings.get("backoff_base", DEFAULT_BACKOFF_BASE)
+    ceiling = worker_settings.get("backoff_max", DEFAULT_BACKOFF_MAX)
+
+    delay = min(ceiling, base * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def fail_job(job: KnowledgeJob, error: str):
+    """
+    Sikertelen feldolgozás: újrapróbálás backoff után, vagy max_attempts
+    elérésekor végleges "failed" állapot (kézi újraindításig).
+    Ha a futás közben már új várakozó feladat került sorba ugyanerre, az
+    újrapróbálás helyett ez a feladat törlődik (a várakozó úgyis feldolgozza).
+    """
+    now = timezone.now()
+
+    if job.attempts >= _max_attempts():
+        fields = {"status": KnowledgeJob.STATUS_FAILED}
+    else:
+        fields = {
+            "status": KnowledgeJob.STATUS_PENDING,
+            "available_at": now + timedelta(seconds=retry_delay(job.attempts)),
+        }
+
+    own_job = KnowledgeJob.objects.filter(id=job.id, locked_by=job.locked_by)
+    try:
+        with transaction.atomic():
+            own_job.update(lease_expires_at=None, last_error=error[:2000], updated_at=now, **fields)
+    except IntegrityError:
+        own_job.delete()
+
+
+def retry_failed_jobs() -> int:
+    """
+    A véglegesen sikertelen feladatok újra sorba állítása: tudáselemenként és
+    típusonként egy új várakozó feladat (ha még nincs), a sikertelenek törlődnek.
+
+    Visszatér:
+        az újra sorba állított feladatok száma
+    """
+    failed = KnowledgeJob.objects.filter(status=KnowledgeJob.STATUS_FAILED)
+    keys = set(failed.values_list("item_id", "kind"))
+    keys -= set(
+        KnowledgeJob.objects.filter(status=KnowledgeJob.STATUS_PENDING).values_list("item_id", "kind")
+    )
+
+    now = timezone.now()
+    with transaction.atomic():
+        failed.delete()
+        KnowledgeJob.objects.bulk_create(
+            [KnowledgeJob(item_id=item_id, kind=kind, available_at=now) for item_id, kind in keys],
+            ignore_conflicts=True,
+        )
+
+    return len(keys)
+
+
+# -------------------------------------------------------------------------
+# Állapot – sormélység és késés
+# -------------------------------------------------------------------------
+def queue_stats() -> Dict[str, float]:
+    """
+    A sor állapota:
+        pending: várakozó feladatok (ebből ready: most felvehető)
+        running, failed: futó és véglegesen sikertelen feladatok
+        lag_seconds: a legrégebben esedékes, még fel nem vett feladat várakozási ideje
+    """
+    now = timezone.now()
+
+    counts = {
+        row["status"]: row["count"]
+        for row in KnowledgeJob.objects.values("status").annotate(count=Count("id"))
+    }
+    ready = KnowledgeJob.objects.filter(_claimable(now, _max_attempts()))
+    oldest = ready.aggregate(oldest=Min("available_at"))["oldest"]
+
+    return {
+        "pending": counts.get(KnowledgeJob.STATUS_PENDING, 0),
+        "ready": ready.count(),
+        "running": counts.get(KnowledgeJob.STATUS_RUNNING, 0),
+        "failed": counts.get(KnowledgeJob.STATUS_FAILED, 0),
+        "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+    }
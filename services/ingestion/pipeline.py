@@ -0,0 +1,272 @@
+#file: services/ingestion/pipeline.py
+# Tudáselem-feldolgozás lépései: anonimizálás, chunkolás (diff), embedding.
+# A signalok szinkron módban közvetlenül hívják, háttérfeldolgozásnál
+# (KNOWLEDGE_WORKER_SETTINGS["async_ingestion"]) a run_knowledge_worker.
+
+import hashlib
+from collections import defaultdict
+from typing import List, Tuple
+
+from django.db import transaction
+
+from knowledge.models import KnowledgeItem, KnowledgeChunk, KnowledgeEmbedding, KnowledgeJob
+from services.ai_provider import get_embedding_client
+from services.anonymization.anonymizer_service import TextAnonymizerService
+from services.chunking.chunk_service import chunk_text
+from services.embedding.embedding_service import EmbeddingService
+from services.ingestion.job_queue import enqueue_related_refresh
+from services.rag.related_items import refresh_related_items
+from services.rag.retrieval_provider import get_retrieval_backend
+
+
+# -------------------------------------------------------------------------
+# Tartalom-ujjlenyomat – változatlan tartalomnál a pipeline kimarad
+# -------------------------------------------------------------------------
+# A keresőbackendben is tárolt tudáselem-metaadatok
+INDEXED_ITEM_FIELDS = ("is_active", "category_id", "title")
+
+
+def content_fingerprint(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------------------
+# 1) Anonimizálás
+# -------------------------------------------------------------------------
+def anonymize_content(text: str) -> str:
+    return TextAnonymizerService().anonymize_text(text)
+
+
+# -------------------------------------------------------------------------
+# 2) Chunkolás – csak a változott szövegű chunkok cserélődnek
+# -------------------------------------------------------------------------
+def rechunk_item(item: KnowledgeItem) -> Tuple[int, int]:
+    """
+    A tudáselem anonimizált tartalmának újrachunkolása és összevetése
+    a meglévő chunkokkal.
+
+    Visszatér:
+        (új chunkok száma, törölt chunkok száma)
+    """
+    if not item.anonymized_content:
+        return 0, 0
+
+    added, removed = sync_item_chunks(item, chunk_text(item.anonymized_content, max_chars=400))
+
+    # Csak törlés történt → nem lesz új embedding, a kapcsolódó elemek frissítése itt kerül sorba
+    if removed and not added:
+        enqueue_related_refresh(item.id)
+
+    return added, removed
+
+
+def sync_item_chunks(item: KnowledgeItem, texts: List[str]) -> Tuple[int, int]:
+    """
+    A tudáselem chunkjainak összevetése az új chunk-szövegekkel, egy tranzakcióban:
+    - az azonos szövegű chunkok megmaradnak (szükség esetén új sorszámmal),
+    - az eltűnt szövegű chunkok egyetlen DELETE-tel törlődnek; a keresőindexből
+      a tranzakció lezárulta után, egy hívással kerülnek ki,
+    - az új szövegek egyetlen bulk inserttel kerülnek be, embedding nélkül.
+
+    Visszatér:
+        (új chunkok száma, törölt chunkok száma)
+    """
+    # Az item_id is kell: a related manager soronként ellenőrzi, halasztva ez N+1 lekérdezés lenne
+    existing = list(item.chunks.only("id", "item_id", "index", "content").order_by("index"))
+
+    by_content = defaultdict(list)
+    for chunk in existing:
+        by_content[chunk.content].append(chunk)
+
+    kept = []
+    new_chunks = []
+    for idx, text in enumerate(texts):
+        matches = by_content.get(text)
+        if matches:
+            chunk = matches.pop(0)
+            kept.append((chunk, idx))
+        else:
+            new_chunks.append(KnowledgeChunk(item=item, index=idx, content=text, is_embedded=False))
+
+    stale_ids = [chunk.id for matches in by_content.values() for chunk in matches]
+    moved = [(chunk, idx) for chunk, idx in kept if chunk.index != idx]
+
+    if not (stale_ids or moved or new_chunks):
+        return 0, 0
+
+    with transaction.atomic():
+        if stale_ids:
+            KnowledgeChunk.objects.filter(id__in=stale_ids).delete()
+            remove_chunks_from_index(stale_ids)
+
+        if moved:
+            # Két lépés: előbb a foglalt sorszámokon túlra, hogy az
+            # (item, index) egyediség az átsorszámozás közben se sérüljön
+            offset = max(chunk.index for chunk in existing) + len(texts) + 1
+            for chunk, idx in moved:
+                chunk.index = idx + offset
+            KnowledgeChunk.objects.bulk_update([chunk for chunk, _ in moved], ["index"])
+
+            for chunk, idx in moved:
+                chunk.index = idx
+            KnowledgeChunk.objects.bulk_update([chunk for chunk, _ in moved], ["index"])
+
+        if new_chunks:
+            KnowledgeChunk.objects.bulk_create(new_chunks)
+
+    return len(new_chunks), len(stale_ids)
+
+
+def remove_chunks_from_index(chunk_ids: List[int]):
+    """
+    Törölt chunkok eltávolítása a keresőbackendből (változásnapló, ES) egyetlen
+    hívással, a tranzakció sikeres lezárulta után – visszagörgetéskor a még
+    létező chunkok a keresőben maradnak.
+    """
+    chunk_ids = list(chunk_ids)
+    if chunk_ids:
+        transaction.on_commit(lambda: get_retrieval_backend().delete(chunk_ids))
+
+
+# -------------------------------------------------------------------------
+# 3) Embedding – a még be nem ágyazott chunkokra
+# -------------------------------------------------------------------------
+def embed_item_chunks(item: KnowledgeItem) -> Tuple[int, int]:
+    """
+    A tudáselem még be nem ágyazott chunkjainak embeddingje batch hívásokkal,
+    egyetlen bulk inserttel és egyetlen bulk update-tel.
+    A provider inicializálási hibája kivételként jut tovább.
+
+    Visszatér:
+        (beágyazott chunkok száma, sikertelen chunkok száma)
+    """
+
+    # Minden olyan chunk, ami nincs embedelve (változatlan tartalomnál csak a
+    # korábban sikertelen chunkok) – ha nincs ilyen, a provider sem kell
+    chunks_to_process = list(item.chunks.filter(is_embedded=False))
+    if not chunks_to_process:
+        return 0, 0
+
+    # Embedding provider (EMBEDDING_PROVIDER: openai vagy helyi modell)
+    client = get_embedding_client()
+    embedding_service = EmbeddingService(client)
+
+    # Az összes chunk embeddingje batch API hívásokkal (EMBEDDING_BATCH_SIZE);
+    # a változatlan / ismétlődő szövegek vektora az embedding cache-ből jön
+    vectors = embedding_service.create_embeddings(
+        [chunk.content for chunk in chunks_to_process], use_cache=True
+    )
+
+    embedded_chunks = store_chunk_embeddings(chunks_to_process, vectors, client.embedding_model)
+
+    for chunk in chunks_to_process:
+        if not chunk.is_embedded:
+            print(f"❌ Nem sikerült embeddinget generálni: chunk #{chunk.index}")
+
+    embedded_chunk_ids = [chunk.id for chunk in embedded_chunks]
+
+    if embedded_chunk_ids:
+        # Új vektorok kerültek be → a keresőbackend felveszi őket (memóriaindexnél
+        # a workerek a deltát a következő kereséskor alkalmazzák)
+        get_retrieval_backend().index(embedded_chunk_ids)
+
+        # Kapcsolódó tudáselemek: csak ennek a tudáselemnek és az érintett
+        # szomszédoknak a listája frissül – a háttérworkerben, nem a mentéskor
+        enqueue_related_refresh(item.id)
+
+    return len(embedded_chunks), len(chunks_to_process) - len(embedded_chunks)
+
+
+def store_chunk_embeddings(
+    chunks: List[KnowledgeChunk], vectors, model_name: str, mark_embedded: bool = True
+) -> List[KnowledgeChunk]:
+    """
+    A kész vektorok mentése egyetlen bulk inserttel + egyetlen bulk update-tel
+    a chunk státuszokra. A sikertelen (None) vektorú chunkok kimaradnak;
+    a chunk esetleges régi, ugyanezzel a modellel készült embeddingje lecserélődik,
+    a más modellel készült embeddingjei megmaradnak.
+
+    Paraméterek:
+        mark_embedded: a chunkok is_embedded jelzőjének beállítása – modellváltás
+                       előkészítésekor (nem aktív modell) kimarad, lásd backfill
+
+    Visszatér:
+        a beágyazott chunkok listája
+    """
+    embeddings = []
+    embedded_chunks = []
+
+    for chunk, vector in zip(chunks, vectors):
+        if vector is None:
+            continue
+
+        # Embedding rekord (bináris float32/float16 vektor)
+        embedding = KnowledgeEmbedding(chunk=chunk, model_name=model_name)
+        embedding.set_vector(vector)
+        embeddings.append(embedding)
+        embedded_chunks.append(chunk)
+
+    if not embedded_chunks:
+        return []
+
+    with transaction.atomic():
+        KnowledgeEmbedding.objects.filter(chunk__in=embedded_chunks, model_name=model_name).delete()
+        KnowledgeEmbedding.objects.bulk_create(embeddings)
+
+        if mark_embedded:
+            for chunk in embedded_chunks:
+                chunk.is_embedded = True
+            KnowledgeChunk.objects.bulk_update(embedded_chunks, ["is_embedded"])
+
+    return embedded_chunks
+
+
+# -------------------------------------------------------------------------
+# Metaadat-frissítés (változatlan vektorok)
+# -------------------------------------------------------------------------
+def refresh_item_metadata(item: KnowledgeItem):
+    """Aktív állapot / kategória / cím → a meglévő vektorok metaadatai frissülnek."""
+    chunk_ids = list(item.chunks.filter(is_embedded=True).values_list("id", flat=True))
+    if chunk_ids:
+        get_retrieval_backend().update(chunk_ids)
+
+
+# -------------------------------------------------------------------------
+# Háttérworker feladatai
+# -------------------------------------------------------------------------
+def run_job(job: KnowledgeJob) -> bool:
+    """A feladat típusa szerinti feldolgozás (lásd process_item, refresh_related_items)."""
+    if job.kind == KnowledgeJob.KIND_RELATED:
+        refresh_related_items(job.item_id)
+        return True
+
+    return process_item(job.item_id)
+
+
+def process_item(item_id: int) -> bool:
+    """
+    Egy tudáselem teljes feldolgozása a kérés útvonalán kívül.
+    Az anonimizált tartalom queryset update-tel kerül mentésre, így a
+    mentési signalok nem futnak újra.
+
+    Visszatér:
+        False, ha a tudáselem időközben törlődött
+
+    Kivétel:
+        RuntimeError, ha maradt be nem ágyazott chunk (a feladat újrapróbálandó)
+    """
+    item = KnowledgeItem.objects.filter(pk=item_id).first()
+    if item is None:
+        return False
+
+    if item.content:
+        item.anonymized_content = anonymize_content(item.content)
+        KnowledgeItem.objects.filter(pk=item.pk).update(anonymized_content=item.anonymized_content)
+
+    rechunk_item(item)
+
+    _embedded, failed = embed_item_chunks(item)
+    if failed:
+        raise RuntimeError(f"{failed} chunk embeddingje sikertelen.")
+
+    return True
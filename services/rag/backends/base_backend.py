@@ -0,0 +1,164 @@
+#file: services/rag/backends/base_backend.py
+# Alap keresőbackend – egységes interfész a RAG visszakereséshez.
+# A RAGService csak ezen keresztül keres, így a visszakeresés kiszervezhető
+# egy külön keresőmotorba (pl. Elasticsearch), ha a tudásbázis kinövi a
+# Django folyamatot.
+
+from typing import List, Optional, Tuple
+
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast, Length, Replace
+
+from knowledge.models import KnowledgeChunk
+from services.rag.sqlite_search import Casefold
+from services.rag.vector_index import notify_index_changes
+
+
+class BaseRetrievalBackend:
+    """
+    Keresőbackend interfész: index, update, delete, search_vector, search_text.
+
+    A találatok mindig List[(chunk_id, score)] formájúak, csökkenő score
+    szerint; a chunkok betöltése (hidratálás) a RAGService feladata.
+    """
+
+    name = "base"
+
+    # ---------------------------------------------------------------------
+    # Indexelés
+    # ---------------------------------------------------------------------
+    def index(self, chunk_ids: List[int]):
+        """
+        Új / újrabeágyazott chunkok felvétele a keresőbe.
+        Az adatbázisra épülő backendeknél ez csak a változásnapló
+        (a memóriaindexek ebből frissülnek).
+        """
+        notify_index_changes(added=list(chunk_ids))
+
+    def delete(self, chunk_ids: List[int]):
+        """Törölt chunkok eltávolítása a keresőből."""
+        notify_index_changes(removed=list(chunk_ids))
+
+    def update(self, chunk_ids: List[int]):
+        """
+        Változatlan vektorú chunkok metaadatainak frissítése
+        (a tudáselem aktív állapota, kategóriája vagy címe változott).
+        """
+        notify_index_changes(updated=list(chunk_ids))
+
+    def rebuild(self) -> int:
+        """
+        A teljes tudásbázis újraindexelése (manage.py rebuild_search_backend).
+        Az adatbázisra épülő backendeknek nincs külön indexe: 0-t adnak vissza.
+        """
+        return 0
+
+    # ---------------------------------------------------------------------
+    # Keresés
+    # ---------------------------------------------------------------------
+    def search_vector(
+        self,
+        query_vector,
+        top_k: int,
+        category_name: str = None,
+        filters: dict = None,
+        min_score: float = None,
+        mmr: dict = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Embedding alapú TOP-K keresés.
+
+        Paraméterek:
+            query_vector: a kérdés embeddingje
+            top_k (int)
+            category_name (str): csak a kategória chunkjai (ismeretlen kategória → [])
+            filters (dict): metaadat-szűrők a VectorIndex.filter_mask() szerint
+            min_score (float): ennél kisebb hasonlóságú találatok kiesnek
+            mmr (dict): MMR paraméterek (mmr_lambda, mmr_pool_size), ha a backend támogatja
+
+        Visszatér:
+            List[(chunk_id, similarity)]
+        """
+        raise NotImplementedError("A search_vector metódust implementálni kell a gyermek osztályban.")
+
+    def search_vector_many(
+        self,
+        query_vectors,
+        top_k: int,
+        filters: dict = None,
+        min_score: float = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Több query keresése; alapértelmezésben egyenként."""
+        return [
+            self.search_vector(vector, top_k, filters=filters, min_score=min_score)
+            if vector is not None and len(vector) else []
+            for vector in query_vectors
+        ]
+
+    def search_text(
+        self,
+        query: str,
+        top_k: int,
+        category_name: str = None,
+        filters: dict = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Klasszikus szöveges keresés chunkok között (kis- és nagybetű független).
+        A pontszám a találatok száma a chunkban, +2, ha a tudáselem címében is szerepel;
+        a pontozás, rendezés és LIMIT az adatbázisban fut. Az összevetés casefoldolt
+        szövegen történik (Casefold), így az ékezetes nagybetűk SQLite-on is egyeznek.
+        """
+        needle = (query or "").strip().casefold()
+        if not needle or top_k <= 0:
+            return []
+
+        qs = _filter_chunks(
+            KnowledgeChunk.objects.annotate(
+                folded_content=Casefold("content"),
+                folded_title=Casefold("item__title"),
+            ).filter(folded_content__contains=needle),
+            category_name=category_name,
+            **(filters or {}),
+        )
+
+        occurrences = Cast(
+            (Length("folded_content") - Length(Replace(F("folded_content"), Value(needle), Value(""))))
+            / len(needle),
+            IntegerField(),
+        )
+        title_bonus = Case(
+            When(folded_title__contains=needle, then=Value(2)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+        rows = (
+            qs.annotate(score=Cast(occurrences + title_bonus, FloatField()))
+            .order_by("-score", "id")
+            .values_list("id", "score")[:top_k]
+        )
+        return [(chunk_id, float(score)) for chunk_id, score in rows]
+
+
+# -------------------------------------------------------------------------
+# Metaadat-szűrők KnowledgeChunk querysetre (VectorIndex.filter_mask() szerint)
+# -------------------------------------------------------------------------
+def _filter_chunks(
+    qs,
+    category_name: str = None,
+    is_active: Optional[bool] = True,
+    category_ids=None,
+    item_ids=None,
+    exclude_item_ids=None,
+):
+    if is_active is not None:
+        qs = qs.filter(item__is_active=is_active)
+    if category_name:
+        qs = qs.filter(item__category__name=category_name)
+    if category_ids is not None:
+        qs = qs.filter(item__category_id__in=list(category_ids))
+    if item_ids is not None:
+        qs = qs.filter(item_id__in=list(item_ids))
+    if exclude_item_ids:
+        qs = qs.exclude(item_id__in=list(exclude_item_ids))
+    return qs
@@ -0,0 +1,366 @@
+#file: services/rag/backends/elasticsearch_backend.py
+# Elasticsearch backend – dense_vector mező + kNN keresés, BM25 szöveges keresés.
+# A chunkok (embedding + metaadat) egy ES indexbe kerülnek; a Django folyamat
+# csak a nyertes chunk-id-kat hidratálja. Az elasticsearch csomag opcionális:
+# csak ennél a backendnél töltjük be. A kliens konstruktorban is átadható
+# (pl. helyi stub teszteléshez).
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from knowledge.models import KnowledgeChunk, KnowledgeEmbedding
+from services.ai_provider import get_embedding_model_name
+from services.embedding.vector_codec import decode_vector
+from services.rag.backends.base_backend import BaseRetrievalBackend
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_ES_URL = "http://localhost:9200"
+DEFAULT_ES_INDEX = "knowledge_chunks"
+DEFAULT_ES_TIMEOUT = 10.0
+DEFAULT_NUM_CANDIDATES = 100
+
+# Egy bulk kérésben ennyi chunk megy fel
+BULK_BATCH_SIZE = 500
+
+# Az indexelt mezők (KnowledgeEmbedding values_list sorrendben)
+DOCUMENT_FIELDS = (
+    "chunk_id",
+    "vector",
+    "dtype",
+    "chunk__item_id",
+    "chunk__item__category_id",
+    "chunk__item__category__name",
+    "chunk__item__is_active",
+    "chunk__item__title",
+    "chunk__content",
+)
+
+
+def _es_settings() -> dict:
+    return getattr(settings, "ELASTICSEARCH_SETTINGS", {})
+
+
+def create_client():
+    """Elasticsearch kliens az ELASTICSEARCH_SETTINGS alapján."""
+    try:
+        from elasticsearch import Elasticsearch
+    except ImportError as e:
+        raise ImportError(
+            "❌ Az elasticsearch backendhez telepíteni kell: pip install elasticsearch"
+        ) from e
+
+    es_settings = _es_settings()
+    return Elasticsearch(
+        es_settings.get("url") or DEFAULT_ES_URL,
+        api_key=es_settings.get("api_key") or None,
+        request_timeout=es_settings.get("timeout", DEFAULT_ES_TIMEOUT),
+    )
+
+
+class ElasticsearchRetrievalBackend(BaseRetrievalBackend):
+    """RAG_SETTINGS["index_mode"] = "elasticsearch"."""
+
+    name = "elasticsearch"
+
+    def __init__(self, client=None, index_name: str = None):
+        es_settings = _es_settings()
+
+        self.client = client if client is not None else create_client()
+        self.index_name = index_name or es_settings.get("index") or DEFAULT_ES_INDEX
+        self.num_candidates = es_settings.get("num_candidates", DEFAULT_NUM_CANDIDATES)
+
+        # Ellenőrzött / létrehozott index (folyamatonként egyszer)
+        self._index_ready = False
+
+    # ---------------------------------------------------------------------
+    # Index séma
+    # ---------------------------------------------------------------------
+    def _ensure_index(self, dimensions: int):
+        if self._index_ready:
+            return
+
+        if not self.client.indices.exists(index=self.index_name):
+            self.client.indices.create(
+                index=self.index_name,
+                mappings={
+                    "properties": {
+                        "chunk_id": {"type": "long"},
+                        "item_id": {"type": "long"},
+                        "category_id": {"type": "long"},
+                        "category_name": {"type": "keyword"},
+                        "is_active": {"type": "boolean"},
+                        "item_title": {"type": "text"},
+                        "content": {"type": "text"},
+                        "vector": {
+                            "type": "dense_vector",
+                            "dims": dimensions,
+                            "index": True,
+                            "similarity": "cosine",
+                        },
+                    }
+                },
+            )
+
+        self._index_ready = True
+
+    # ---------------------------------------------------------------------
+    # Indexelés
+    # ---------------------------------------------------------------------
+    def _bulk(self, operations: list):
+        if not operations:
+            return
+
+        response = self.client.bulk(operations=operations)
+        if not response.get("errors"):
+            return
+
+        for entry in response.get("items", []):
+            result = next(iter(entry.values()))
+            # A már nem létező dokumentum törlése nem hiba
+            if result.get("error") and result.get("status") != 404:
+                print(f"[Elasticsearch] Hiba a(z) {result.get('_id')} dokumentumnál: {result['error']}")
+
+    def _index_batch(self, chunk_ids: List[int]) -> int:
+        rows = KnowledgeEmbedding.objects.filter(
+            chunk_id__in=chunk_ids, model_name=get_embedding_model_name()
+        ).values_list(*DOCUMENT_FIELDS)
+
+        operations = []
+        indexed = set()
+
+        for (chunk_id, data, dtype, item_id, category_id, category_name,
+             is_active, item_title, content) in rows:
+            vector = decode_vector(data, dtype)
+            self._ensure_index(vector.shape[0])
+
+            operations.append({"index": {"_index": self.index_name, "_id": str(chunk_id)}})
+            operations.append({
+                "chunk_id": chunk_id,
+                "item_id": item_id,
+                "category_id": category_id,
+                "category_name": category_name,
+                "is_active": is_active,
+                "item_title": item_title,
+                "content": content,
+                "vector": vector.tolist(),
+            })
+            indexed.add(chunk_id)
+
+        # Ami közben eltűnt az adatbázisból, az az ES indexből is kikerül
+        for chunk_id in set(chunk_ids) - indexed:
+            operations.append({"delete": {"_index": self.index_name, "_id": str(chunk_id)}})
+
+        self._bulk(operations)
+        return len(indexed)
+
+    def index(self, chunk_ids: List[int]):
+        super().index(chunk_ids)
+
+        chunk_ids = list(chunk_ids)
+        try:
+            for start in range(0, len(chunk_ids), BULK_BATCH_SIZE):
+                self._index_batch(chunk_ids[start:start + BULK_BATCH_SIZE])
+        except Exception as e:
+            print(f"[Elasticsearch] Hiba az indexeléskor: {e}")
+
+    def update(self, chunk_ids: List[int]):
+        """Csak a metaadat-mezők részleges frissítése (a vektor nem megy fel újra)."""
+        super().update(chunk_ids)
+
+        rows = KnowledgeChunk.objects.filter(id__in=list(chunk_ids)).values_list(
+            "id", "item__category_id", "item__category__name", "item__is_active", "item__title"
+        )
+
+        operations = []
+        for chunk_id, category_id, category_name, is_active, item_title in rows:
+            operations.append({"update": {"_index": self.index_name, "_id": str(chunk_id)}})
+            operations.append({"doc": {
+                "category_id": category_id,
+                "category_name": category_name,
+                "is_active": is_active,
+                "item_title": item_title,
+            }})
+
+        try:
+            for start in range(0, len(operations), 2 * BULK_BATCH_SIZE):
+                self._bulk(operations[start:start + 2 * BULK_BATCH_SIZE])
+        except Exception as e:
+            print(f"[Elasticsearch] Hiba a metaadatok frissítésekor: {e}")
+
+    def delete(self, chunk_ids: List[int]):
+        super().delete(chunk_ids)
+
+        try:
+            self._bulk([
+                {"delete": {"_index": self.index_name, "_id": str(chunk_id)}}
+                for chunk_id in chunk_ids
+            ])
+        except Exception as e:
+            print(f"[Elasticsearch] Hiba a törléskor: {e}")
+
+    def rebuild(self) -> int:
+        """
+        Az ES index eldobása és teljes újraépítése az adatbázisból, az aktív
+        embedding modell vektoraival (modellváltás után a dimenziószám is új).
+        """
+        self.client.indices.delete(index=self.index_name, ignore_unavailable=True)
+        self._index_ready = False
+
+        chunk_ids = list(
+            KnowledgeEmbedding.objects.filter(model_name=get_embedding_model_name())
+            .order_by("chunk_id").values_list("chunk_id", flat=True)
+        )
+        total = 0
+        for start in range(0, len(chunk_ids), BULK_BATCH_SIZE):
+            total += self._index_batch(chunk_ids[start:start + BULK_BATCH_SIZE])
+
+        self.client.indices.refresh(index=self.index_name)
+        return total
+
+    # ---------------------------------------------------------------------
+    # Keresés
+    # ---------------------------------------------------------------------
+    def _filter_clauses(
+        self,
+        category_name: str = None,
+        is_active: Optional[bool] = True,
+        category_ids=None,
+        item_ids=None,
+        exclude_item_ids=None,
+    ) -> list:
+        """Ugyanazok a metaadat-szűrők, mint a VectorIndex.filter_mask()-ban, ES filterként."""
+        clauses = []
+
+        if is_active is not None:
+            clauses.append({"term": {"is_active": bool(is_active)}})
+        if category_name:
+            clauses.append({"term": {"category_name": category_name}})
+        if category_ids is not None:
+            clauses.append({"terms": {"category_id": list(category_ids)}})
+        if item_ids is not None:
+            clauses.append({"terms": {"item_id": list(item_ids)}})
+        if exclude_item_ids:
+            clauses.append({"bool": {"must_not": {"terms": {"item_id": list(exclude_item_ids)}}}})
+
+        return clauses
+
+    def _knn_body(self, query_vector, top_k, category_name, filters, min_score) -> Optional[dict]:
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        if query.size == 0 or not np.any(query):
+            return None
+
+        knn = {
+            "field": "vector",
+            "query_vector": query.tolist(),
+            "k": top_k,
+            "num_candidates": max(top_k, self.num_candidates),
+            "filter": self._filter_clauses(category_name=category_name, **(filters or {})),
+        }
+        # Cosine esetén a similarity a nyers koszinusz (nem a _score)
+        if min_score is not None:
+            knn["similarity"] = float(min_score)
+
+        return {"knn": knn, "size": top_k, "_source": False}
+
+    @staticmethod
+    def _knn_hits(response) -> List[Tuple[int, float]]:
+        # Cosine hasonlóságnál az ES _score = (1 + cos) / 2 – visszaalakítjuk
+        return [
+            (int(hit["_id"]), 2.0 * float(hit["_score"]) - 1.0)
+            for hit in response["hits"]["hits"]
+        ]
+
+    def search_vector(
+        self,
+        query_vector,
+        top_k: int,
+        category_name: str = None,
+        filters: dict = None,
+        min_score: float = None,
+        mmr: dict = None,
+    ) -> List[Tuple[int, float]]:
+        body = self._knn_body(query_vector, top_k, category_name, filters, min_score)
+        if body is None or top_k <= 0:
+            return []
+
+        try:
+            response = self.client.search(index=self.index_name, **body)
+        except Exception as e:
+            print(f"[Elasticsearch] Hiba a vektoros keresésnél: {e}")
+            return []
+
+        return self._knn_hits(response)
+
+    def search_vector_many(
+        self,
+        query_vectors,
+        top_k: int,
+        filters: dict = None,
+        min_score: float = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Az összes query egyetlen _msearch kérésben."""
+        bodies = [self._knn_body(vector, top_k, None, filters, min_score) for vector in query_vectors]
+
+        searches = []
+        for body in bodies:
+            if body is not None:
+                searches.extend([{"index": self.index_name}, body])
+
+        if not searches or top_k <= 0:
+            return [[] for _ in bodies]
+
+        try:
+            responses = iter(self.client.msearch(searches=searches)["responses"])
+        except Exception as e:
+            print(f"[Elasticsearch] Hiba a batch vektoros keresésnél: {e}")
+            return [[] for _ in bodies]
+
+        results = []
+        for body in bodies:
+            if body is None:
+                results.append([])
+                continue
+
+            response = next(responses)
+            if "error" in response:
+                print(f"[Elasticsearch] Hiba a batch egyik query-jénél: {response['error']}")
+                results.append([])
+            else:
+                results.append(self._knn_hits(response))
+
+        return results
+
+    def search_text(
+        self,
+        query: str,
+        top_k: int,
+        category_name: str = None,
+        filters: dict = None,
+    ) -> List[Tuple[int, float]]:
+        """BM25 szöveges keresés a chunk tartalmán és a tudáselem címén."""
+        query = (query or "").strip()
+        if not query or top_k <= 0:
+            return []
+
+        try:
+            response = self.client.search(
+                index=self.index_name,
+                query={
+                    "bool": {
+                        "must": {"multi_match": {"query": query, "fields": ["content", "item_title^2"]}},
+                        "filter": self._filter_clauses(category_name=category_name, **(filters or {})),
+                    }
+                },
+                size=top_k,
+                _source=False,
+            )
+        except Exception as e:
+            print(f"[Elasticsearch] Hiba a szöveges keresésnél: {e}")
+            return []
+
+        return [(int(hit["_id"]), float(hit["_score"])) for hit in response["hits"]["hits"]]
@@ -0,0 +1,57 @@
+#file: services/rag/backends/numpy_backend.py
+# Memóriabeli NumPy backend – a folyamat-szintű VectorIndex-en keres
+# (kategória shardok, metaadat-maszk, ANN / kvantálás, MMR).
+
+from typing import List, Tuple
+
+from services.rag.backends.base_backend import BaseRetrievalBackend
+from services.rag.vector_index import get_vector_index
+
+
+class NumpyRetrievalBackend(BaseRetrievalBackend):
+    """RAG_SETTINGS["index_mode"] = "memory" (alapértelmezés)."""
+
+    name = "memory"
+
+    # ---------------------------------------------------------------------
+    def search_vector(
+        self,
+        query_vector,
+        top_k: int,
+        category_name: str = None,
+        filters: dict = None,
+        min_score: float = None,
+        mmr: dict = None,
+    ) -> List[Tuple[int, float]]:
+        index = get_vector_index()
+        mask = index.filter_mask(**(filters or {}))
+
+        # Csak a kategória shardjának sorait pásztázzuk
+        shard = None
+        if category_name:
+            shard = index.shard_rows(category_name)
+            if shard is None:
+                return []
+
+        hits = index.search(query_vector, top_k=top_k, mask=mask, rows=shard, **(mmr or {}))
+
+        if min_score is not None:
+            hits = [(chunk_id, score) for chunk_id, score in hits if score >= min_score]
+        return hits
+
+    # ---------------------------------------------------------------------
+    def search_vector_many(
+        self,
+        query_vectors,
+        top_k: int,
+        filters: dict = None,
+        min_score: float = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Egyetlen mátrix-mátrix szorzás az összes query-re."""
+        index = get_vector_index()
+        mask = index.filter_mask(**(filters or {}))
+        all_hits = index.search_many(query_vectors, top_k=top_k, mask=mask)
+
+        if min_score is not None:
+            all_hits = [[hit for hit in hits if hit[1] >= min_score] for hits in all_hits]
+        return all_hits
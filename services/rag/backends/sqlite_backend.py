@@ -0,0 +1,33 @@
+#file: services/rag/backends/sqlite_backend.py
+# SQLite backend – rezidens index nélkül, a vector_cosine SQL függvénnyel
+# az adatbázisban pontoz (lásd: services/rag/sqlite_search.py).
+
+from typing import List, Tuple
+
+from services.rag.backends.base_backend import BaseRetrievalBackend
+from services.rag.sqlite_search import sql_search
+
+
+class SQLiteRetrievalBackend(BaseRetrievalBackend):
+    """RAG_SETTINGS["index_mode"] = "sqlite"."""
+
+    name = "sqlite"
+
+    # ---------------------------------------------------------------------
+    def search_vector(
+        self,
+        query_vector,
+        top_k: int,
+        category_name: str = None,
+        filters: dict = None,
+        min_score: float = None,
+        mmr: dict = None,
+    ) -> List[Tuple[int, float]]:
+        # MMR itt nincs: csak a TOP-K sor jön vissza, a jelöltkészlet vektorai nem
+        return sql_search(
+            query_vector,
+            top_k,
+            min_score=min_score,
+            category_name=category_name,
+            **(filters or {}),
+        )
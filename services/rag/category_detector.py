@@ -3,6 +3,7 @@
 
 import json
 import re
+from typing import Tuple
 from services.ai_provider import get_ai_client
 from knowledge.models import KnowledgeCategory
 
@@ -31,7 +32,7 @@ class CategoryDetector:
         """
         LLM prompt felépítése.
         A válasz kizárólag JSON lehet:
-        {"category": "..."}
+        {"category": "...", "confidence": 0.0-1.0}
         """
         categories_text = "\n".join(f"- {c}" for c in categories)
 
@@ -47,24 +48,37 @@ Elérhető kategóriák:
 Fontos szabályok:
 - Csak az adott listából választhatsz.
 - A válasz kizárólag JSON legyen, ilyen formában:
-  {{"category": "Kiválasztott kategória neve"}}
-- Ha nem egyértelmű, akkor is válassz a listából.
+  {{"category": "Kiválasztott kategória neve", "confidence": 0.0-1.0}}
+- A "confidence" azt jelzi, mennyire vagy biztos a választásban (1.0 = teljesen biztos).
+- Ha nem egyértelmű, akkor is válassz a listából, de alacsony confidence értékkel.
 
 Most add meg a JSON választ.
 """
 
     # ------------------------------------------------------------------
     def detect_category(self, query: str) -> str:
+        """
+        Teljes kategóriadetektálási folyamat – csak a kategória nevével tér vissza.
+        """
+        category, _confidence = self.detect_category_with_confidence(query)
+        return category
+
+    # ------------------------------------------------------------------
+    def detect_category_with_confidence(self, query: str) -> Tuple[str, float]:
         """
         Teljes kategóriadetektálási folyamat:
         - lekérdezi a kategóriákat
         - promptot épít
         - LLM-mel kategóriát választ
         - biztonságos JSON-ként visszaadja az eredményt
+
+        Visszatér:
+            (kategória, confidence) – hiba vagy érvénytelen válasz esetén
+            ("Ismeretlen (...)", 0.0), így a hívó globális keresésre válthat
         """
         categories = self.get_category_list()
         if not categories:
-            return "Ismeretlen (nincs kategória)"
+            return "Ismeretlen (nincs kategória)", 0.0
 
         prompt = self.build_prompt(query, categories)
 
@@ -77,20 +91,26 @@ Most add meg a JSON választ.
             json_match = re.search(r"{.*?}", raw, flags=re.DOTALL)
             if not json_match:
                 print(f"[CategoryDetector] Hiba: JSON nem található a válaszban -> {raw}")
-                return "Ismeretlen (hiba)"
+                return "Ismeretlen (hiba)", 0.0
 
             json_text = json_match.group(0)
 
             data = json.loads(json_text)
             category = data.get("category")
 
+            # Hiányzó / hibás confidence → közepes bizonyosság
+            try:
+                confidence = min(max(float(data.get("confidence", 0.5)), 0.0), 1.0)
+            except (TypeError, ValueError):
+                confidence = 0.5
+
             # Validáció
             if category in categories:
-                return category
+                return category, confidence
 
             print(f"[CategoryDetector] Hiba: '{category}' nem szerepel a kategórialistában.")
-            return "Ismeretlen (érvénytelen kategória)"
+            return "Ismeretlen (érvénytelen kategória)", 0.0
 
         except Exception as e:
             print(f"[CategoryDetector] Hiba: {e}")
-            return "Ismeretlen (hiba)"
+            return "Ismeretlen (hiba)", 0.0
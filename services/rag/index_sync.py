@@ -0,0 +1,74 @@
+#file: services/rag/index_sync.py
+# Workerek közötti index-szinkron: generációszámláló + változásnapló az adatbázisban.
+# A tudásbázis signaljai naplózzák a hozzáadott / törölt / módosult chunkokat,
+# a workerek a következő keresésnél csak ezt a deltát alkalmazzák.
+#
+# A generáció-kurzor (MAX(id)) csak SQLite-on teljes: ott az írások sorosan
+# véglegesednek, így a napló id-k a commit sorrendjében válnak láthatóvá.
+# Párhuzamos írókat engedő adatbázison (pl. Postgres) egy kisebb id-jú, de
+# később véglegesedő bejegyzés a már továbblépett kurzor mögé kerülhet, és
+# az a worker kihagyja a következő teljes újratöltésig (snapshot, sync_max_delta).
+
+from typing import Iterable, List
+
+from django.db.models import Max
+
+from knowledge.models import KnowledgeIndexChange
+
+
+# -------------------------------------------------------------------------
+# A napló mérete – ennél régebbi bejegyzéseket írás közben törlünk.
+# Jóval nagyobb, mint a workerenként alkalmazható legnagyobb delta
+# (RAG_SETTINGS["sync_max_delta"]); nagyobb lemaradásnál teljes újratöltés jön.
+# -------------------------------------------------------------------------
+CHANGE_LOG_KEEP = 100_000
+
+
+def latest_generation() -> int:
+    """
+    A tudásbázis aktuális verziója: a napló legnagyobb id-ja (0, ha üres).
+    Csak SQLite-on monoton a commit sorrendjében – lásd a modul fejlécét.
+    """
+    return KnowledgeIndexChange.objects.aggregate(latest=Max("id"))["latest"] or 0
+
+
+def record_changes(
+    added: Iterable[int] = (),
+    removed: Iterable[int] = (),
+    updated: Iterable[int] = (),
+) -> int:
+    """
+    Változások naplózása egyetlen bulk inserttel.
+
+    Visszatér:
+        int: az új generáció (változás nélkül a jelenlegi)
+    """
+    entries = (
+        [KnowledgeIndexChange(chunk_id=cid, action=KnowledgeIndexChange.ACTION_ADD) for cid in added]
+        + [KnowledgeIndexChange(chunk_id=cid, action=KnowledgeIndexChange.ACTION_REMOVE) for cid in removed]
+        + [KnowledgeIndexChange(chunk_id=cid, action=KnowledgeIndexChange.ACTION_UPDATE) for cid in updated]
+    )
+    if not entries:
+        return latest_generation()
+
+    KnowledgeIndexChange.objects.bulk_create(entries)
+
+    generation = latest_generation()
+    if generation > CHANGE_LOG_KEEP:
+        KnowledgeIndexChange.objects.filter(id__lte=generation - CHANGE_LOG_KEEP).delete()
+
+    return generation
+
+
+def changed_chunk_ids(since: int, until: int) -> List[int]:
+    """
+    A (since, until] generációk között érintett chunkok azonosítói.
+    A művelet típusa a delta alkalmazásához nem kell: minden érintett chunkot
+    az adatbázis aktuális állapotából töltünk újra (ami már nincs meg, kiesik).
+    """
+    return list(
+        KnowledgeIndexChange.objects
+        .filter(id__gt=since, id__lte=until)
+        .values_list("chunk_id", flat=True)
+        .distinct()
+    )
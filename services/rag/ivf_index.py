@@ -0,0 +1,281 @@
+#file: services/rag/ivf_index.py
+# IVF (inverted file) közelítő legközelebbi-szomszéd index – tisztán NumPy.
+# A vektortér nlist klaszterre oszlik (gömbi k-means), keresésnél csak a query-hez
+# legközelebbi nprobe klaszter chunkjait pontozzuk pontosan.
+
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_NLIST = 64
+DEFAULT_NPROBE = 8
+DEFAULT_TRAIN_ITERATIONS = 15
+
+# Tanításhoz legfeljebb ennyi mintát használunk klaszterenként
+TRAIN_SAMPLES_PER_LIST = 256
+
+
+class IVFIndex:
+    """
+    IVFIndex
+    --------
+    Inverted file index gömbi k-means centroidokkal.
+
+    - centroids: (nlist, d) float32 egységvektorok
+    - lists:     klaszterenként a hozzárendelt chunk-id-k (int64 tömbök)
+    - model_name: az embedding modell, amelynek a vektoraiból tanult
+      (más modell vektoraihoz a centroidok nem használhatók)
+
+    A listák chunk-id-ket tárolnak (így lemezre menthetők és inkrementálisan
+    bővíthetők); az attach() a VectorIndex aktuális sorpozícióira képezi le őket.
+
+    Hangolás:
+        nlist  – több klaszter → kisebb listák, gyorsabb, de pontatlanabb keresés
+        nprobe – több vizsgált klaszter → jobb recall, lassabb keresés
+    """
+
+    def __init__(
+        self, centroids: np.ndarray, lists: List[np.ndarray], nprobe: int = DEFAULT_NPROBE, model_name: str = ""
+    ):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.lists = [np.asarray(ids, dtype=np.int64) for ids in lists]
+        self.nprobe = nprobe
+        self.model_name = model_name
+
+        # attach() tölti ki: klaszterenként a VectorIndex sorpozíciói
+        self._row_lists: Optional[List[np.ndarray]] = None
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    # ---------------------------------------------------------------------
+    # Tanítás
+    # ---------------------------------------------------------------------
+    @classmethod
+    def train(
+        cls,
+        chunk_ids: np.ndarray,
+        matrix: np.ndarray,
+        nlist: int = DEFAULT_NLIST,
+        nprobe: int = DEFAULT_NPROBE,
+        iterations: int = DEFAULT_TRAIN_ITERATIONS,
+        seed: int = 0,
+        model_name: str = "",
+    ) -> "IVFIndex":
+        """
+        Gömbi k-means tanítás a (normalizált) embedding mátrixon,
+        majd az összes vektor besorolása a klaszterekbe.
+        """
+        n = matrix.shape[0]
+        nlist = max(1, min(nlist, n))
+        rng = np.random.default_rng(seed)
+
+        # Tanító minta – nagy korpusznál nem kell minden vektor a centroidokhoz
+        sample_size = min(n, nlist * TRAIN_SAMPLES_PER_LIST)
+        sample = np.asarray(matrix[rng.choice(n, sample_size, replace=False)], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+
+            # Klaszterenkénti összegek: rendezés + reduceat (Python ciklus nélkül)
+            order = np.argsort(assignment, kind="stable")
+            sorted_assignment = assignment[order]
+            starts = np.flatnonzero(np.r_[True, sorted_assignment[1:] != sorted_assignment[:-1]])
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+
+            new_centroids = centroids.copy()
+            new_centroids[sorted_assignment[starts]] = sums
+
+            # Üres klaszterek újraindítása véletlen mintapontból
+            empty = np.setdiff1d(np.arange(nlist), sorted_assignment[starts])
+            if empty.size:
+                new_centroids[empty] = sample[rng.choice(sample_size, empty.size)]
+
+            norms = np.linalg.norm(new_centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (new_centroids / norms).astype(np.float32)
+
+        index = cls(centroids, [np.empty(0, dtype=np.int64)] * nlist, nprobe=nprobe, model_name=model_name)
+        index.add(chunk_ids, matrix)
+        return index
+
+    # ---------------------------------------------------------------------
+    # Inkrementális módosítás
+    # ---------------------------------------------------------------------
+    def copy(self) -> "IVFIndex":
+        """Független másolat (a centroidok közösek, a listák újak) – delta-szinkronhoz."""
+        return IVFIndex(self.centroids, list(self.lists), nprobe=self.nprobe, model_name=self.model_name)
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """A vektorok legközelebbi centroidjának sorszáma."""
+        return np.argmax(np.asarray(vectors, dtype=np.float32) @ self.centroids.T, axis=1)
+
+    def add(self, chunk_ids: np.ndarray, vectors: np.ndarray):
+        """Új vektorok besorolása – újratanítás nélkül."""
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        if chunk_ids.size == 0:
+            return
+
+        assignment = self.assign(vectors)
+        for list_no in np.unique(assignment):
+            self.lists[list_no] = np.concatenate(
+                [self.lists[list_no], chunk_ids[assignment == list_no]]
+            )
+
+        self._row_lists = None
+
+    def remove(self, chunk_ids: np.ndarray):
+        """Chunk-id-k eltávolítása az összes listából."""
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        if chunk_ids.size == 0:
+            return
+
+        self.lists = [ids[~np.isin(ids, chunk_ids)] for ids in self.lists]
+        self._row_lists = None
+
+    # ---------------------------------------------------------------------
+    def attach(self, chunk_ids: np.ndarray, matrix: np.ndarray, rows: np.ndarray = None):
+        """
+        Összehangolás egy VectorIndex tartalmával:
+        - az indexben lévő, de még be nem sorolt vektorokat hozzáadjuk,
+        - a már nem létező chunk-id-ket eldobjuk,
+        - a listákat sorpozíciókra képezzük le a kereséshez.
+
+        Paraméterek:
+            rows: csak ezek a sorpozíciók számítanak (None = mind) – a
+                  delta-szinkron törölt (tombstone) sorai így kimaradnak
+        """
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        positions = np.arange(chunk_ids.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+        ids = chunk_ids[positions]
+        known = np.concatenate(self.lists) if self.lists else np.empty(0, dtype=np.int64)
+
+        vanished = np.setdiff1d(known, ids)
+        if vanished.size:
+            self.remove(vanished)
+
+        missing = ~np.isin(ids, known)
+        if missing.any():
+            self.add(ids[missing], matrix[positions[missing]])
+
+        order = np.argsort(ids, kind="stable")
+        sorted_ids = ids[order]
+        self._row_lists = [positions[order[np.searchsorted(sorted_ids, list_ids)]] for list_ids in self.lists]
+
+    # ---------------------------------------------------------------------
+    def probe(self, query: np.ndarray, nprobe: int = None) -> np.ndarray:
+        """
+        A query-hez legközelebbi nprobe klaszter sorpozíciói (attach után).
+        """
+        if self._row_lists is None:
+            raise RuntimeError("Az IVF index nincs VectorIndexhez csatolva (attach).")
+
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        centroid_scores = self.centroids @ query
+
+        if nprobe < self.nlist:
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probed = np.arange(self.nlist)
+
+        return np.concatenate([self._row_lists[i] for i in probed])
+
+    # ---------------------------------------------------------------------
+    # Mentés / betöltés
+    # ---------------------------------------------------------------------
+    def save(self, path):
+        """Centroidok és listák mentése egyetlen .npz fájlba (atomikus csere)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        sizes = np.asarray([ids.size for ids in self.lists], dtype=np.int64)
+        ids = np.concatenate(self.lists) if self.lists else np.empty(0, dtype=np.int64)
+
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp_path, centroids=self.centroids, sizes=sizes, ids=ids, nprobe=self.nprobe,
+            model_name=np.array(self.model_name),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path, nprobe: int = None) -> Optional["IVFIndex"]:
+        """Mentett index betöltése; None, ha nincs ilyen fájl."""
+        try:
+            with np.load(path) as data:
+                offsets = np.cumsum(data["sizes"])[:-1]
+                lists = np.split(data["ids"], offsets)
+                # Régi (modellnév nélküli) fájl: üres név → a hívó újratanít
+                model_name = str(data["model_name"]) if "model_name" in data.files else ""
+                return cls(data["centroids"], lists, nprobe=nprobe or int(data["nprobe"]), model_name=model_name)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[IVFIndex] Hiba a mentett index betöltésekor: {e}")
+            return None
+
+
+# -------------------------------------------------------------------------
+# Recall@k összevetés a pontos (brute force) kereséssel
+# -------------------------------------------------------------------------
+def evaluate_recall(index, queries: np.ndarray, top_k: int = 10, nprobe_values=(1, 2, 4, 8, 16)) -> List[dict]:
+    """
+    A közelítő keresés minőségének mérése a pontos kereséshez képest.
+
+    Paraméterek:
+        index (VectorIndex): csatolt IVF indexszel rendelkező vektorindex
+        queries (np.ndarray): (q, d) query vektorok
+        top_k (int): k a recall@k-hoz
+        nprobe_values: kipróbálandó nprobe értékek
+
+    Visszatér:
+        List[dict]: nprobe-onként recall@k, átlagos keresési idő (ms),
+                    átlagosan pontozott sorok aránya, és a brute force ideje
+    """
+    ann = index.ann
+    index.ann = None
+    try:
+        started = time.perf_counter()
+        exact = [{cid for cid, _ in index.search(q, top_k)} for q in queries]
+        exact_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+    finally:
+        index.ann = ann
+
+    results = []
+    original_nprobe = ann.nprobe
+
+    try:
+        for nprobe in nprobe_values:
+            ann.nprobe = nprobe
+            hits = 0
+            scanned = 0
+
+            started = time.perf_counter()
+            for q, truth in zip(queries, exact):
+                found = {cid for cid, _ in index.search(q, top_k)}
+                hits += len(found & truth)
+            elapsed_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+
+            for q in queries:
+                scanned += ann.probe(q / (np.linalg.norm(q) or 1.0)).size
+
+            results.append({
+                "nprobe": nprobe,
+                "recall": hits / max(sum(len(t) for t in exact), 1),
+                "ann_ms": elapsed_ms,
+                "exact_ms": exact_ms,
+                "scanned_ratio": scanned / max(len(queries) * len(index), 1),
+            })
+    finally:
+        ann.nprobe = original_nprobe
+
+    return results
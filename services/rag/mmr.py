@@ -0,0 +1,62 @@
+#file: services/rag/mmr.py
+# Maximal Marginal Relevance (MMR) – a találatok diverzifikálása.
+# Az egymás melletti, szinte azonos chunkok helyett változatosabb TOP-K kerül
+# a promptba: kevesebb redundáns input token, ugyanannyi információ.
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett MMR paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_MMR_LAMBDA = 0.7
+DEFAULT_MMR_POOL_SIZE = 30
+
+
+def mmr_select(
+    candidates: np.ndarray,
+    relevance: np.ndarray,
+    top_k: int,
+    lambda_: float = DEFAULT_MMR_LAMBDA,
+) -> np.ndarray:
+    """
+    MMR kiválasztás a jelöltkészleten.
+
+    score(i) = λ · rel(i) − (1 − λ) · max_{j ∈ kiválasztott} sim(i, j)
+
+    A jelöltek közötti hasonlósági mátrixot egyszer, egyetlen mátrixszorzással
+    számoljuk; lépésenként csak a "legnagyobb hasonlóság a kiválasztottakhoz"
+    vektort frissítjük (np.maximum), páronkénti Python ciklus nélkül.
+
+    Paraméterek:
+        candidates (np.ndarray): (p, d) normalizált jelölt vektorok
+        relevance (np.ndarray): (p,) a jelöltek hasonlósága a query-hez
+        top_k (int): kiválasztandó elemek száma
+        lambda_ (float): 1.0 = tiszta relevancia, 0.0 = tiszta diverzitás
+
+    Visszatér:
+        np.ndarray: a kiválasztott jelöltek indexei, kiválasztási sorrendben
+    """
+    pool = candidates.shape[0]
+    k = min(top_k, pool)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    similarity = np.asarray(candidates, dtype=np.float32) @ np.asarray(candidates, dtype=np.float32).T
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    selected = np.empty(k, dtype=np.int64)
+    available = np.ones(pool, dtype=bool)
+    max_similarity = np.full(pool, -np.inf, dtype=np.float32)
+
+    for step in range(k):
+        penalty = max_similarity if step > 0 else 0.0
+        scores = lambda_ * relevance - (1.0 - lambda_) * penalty
+        scores[~available] = -np.inf
+
+        best = int(np.argmax(scores))
+        selected[step] = best
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
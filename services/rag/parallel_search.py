@@ -0,0 +1,239 @@
+#file: services/rag/parallel_search.py
+# Többmagos, párhuzamos brute force pontozás.
+# Az embedding mátrix egy shared memory blokkba kerül, a sorokat összefüggő
+# shardokra bontjuk, a shardokat egy tartós (a folyamat élettartamáig élő)
+# process pool pontozza, végül a shardonkénti TOP-K listákat összefésüljük.
+#
+# A modul szándékosan nem importál Django-t: a "spawn" módon indított
+# workerek csak ezt a fájlt és a NumPy-t töltik be.
+
+import atexit
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+# Ennél kevesebb pontozandó sornál a folyamatközi kommunikáció drágább,
+# mint maga a szorzás – ilyenkor a kérés szálában számolunk.
+DEFAULT_PARALLEL_MIN_ROWS = 50_000
+
+
+# -------------------------------------------------------------------------
+# Worker oldal – csatolt shared memory mátrixok (név → (shm, ndarray))
+# -------------------------------------------------------------------------
+_worker_matrices = {}
+
+
+def _open_shared_memory(name: str) -> SharedMemory:
+    """
+    Meglévő blokk megnyitása a workerben. A "spawn" workerek a fő folyamat
+    resource trackerét használják, így a blokkot a fő folyamat szabadítja fel.
+    """
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: nincs track paraméter
+        return SharedMemory(name=name)
+
+
+def _attached_matrix(name: str, shape: Tuple[int, int]) -> np.ndarray:
+    """A workerben csatolt mátrix; új blokk esetén a régieket elengedjük."""
+    entry = _worker_matrices.get(name)
+    if entry is not None:
+        return entry[1]
+
+    for old_name in list(_worker_matrices):
+        old_shm, _old_matrix = _worker_matrices.pop(old_name)
+        del _old_matrix
+        try:
+            old_shm.close()
+        except BufferError:
+            pass
+
+    shm = _open_shared_memory(name)
+    matrix = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    _worker_matrices[name] = (shm, matrix)
+    return matrix
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """A k legnagyobb pontszám indexei csökkenő sorrendben."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _score_shard(
+    name: str,
+    shape: Tuple[int, int],
+    start: int,
+    end: int,
+    rows: Optional[np.ndarray],
+    query: np.ndarray,
+    top_k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Egy shard pontozása a workerben.
+    rows=None esetén a [start, end) sortartomány egésze, különben csak a
+    megadott (a tartományba eső) sorpozíciók.
+    """
+    matrix = _attached_matrix(name, shape)
+
+    if rows is None:
+        scores = matrix[start:end] @ query
+        top = _top_k(scores, top_k)
+        return top + start, scores[top]
+
+    scores = matrix[rows] @ query
+    top = _top_k(scores, top_k)
+    return rows[top], scores[top]
+
+
+# -------------------------------------------------------------------------
+# Fő folyamat – tartós process pool
+# -------------------------------------------------------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    A folyamat közös process poolja. Indexújratöltéskor nem indul újra:
+    a workerek a következő feladatnál az új shared memory blokkra csatolnak.
+    """
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+@atexit.register
+def shutdown_process_pool():
+    """A pool leállítása a folyamat végén."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _release_shared_memory(shm: SharedMemory):
+    """A blokk felszabadítása (a még élő nézetek miatt a close() elmaradhat)."""
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class ParallelScorer:
+    """
+    ParallelScorer
+    --------------
+    A VectorIndex mátrixa shared memoryban, összefüggő shardokra bontva.
+
+    - matrix: a shared memory blokk ndarray nézete – a VectorIndex ezt
+      használja tovább, így a mátrix nem duplikálódik a fő folyamatban
+    - bounds: a shardok sorhatárai (shard_count + 1 elem)
+
+    A blokkot az objektum megszűnésekor (indexcsere) szabadítjuk fel.
+    """
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        workers: int,
+        shard_count: int = None,
+        min_rows: int = DEFAULT_PARALLEL_MIN_ROWS,
+    ):
+        self.workers = max(1, int(workers))
+        self.min_rows = min_rows
+
+        rows, dim = matrix.shape
+        self.shape = (rows, dim)
+
+        self._shm = SharedMemory(create=True, size=max(1, rows * dim * 4))
+        self.matrix = np.ndarray(self.shape, dtype=np.float32, buffer=self._shm.buf)
+        self.matrix[:] = matrix
+        self._finalizer = weakref.finalize(self, _release_shared_memory, self._shm)
+
+        shard_count = max(1, min(shard_count or self.workers, rows or 1))
+        self.bounds = np.linspace(0, rows, shard_count + 1).astype(np.int64)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self):
+        """Azonnali felszabadítás (egyébként a szemétgyűjtő végzi)."""
+        self._finalizer()
+
+    # ---------------------------------------------------------------------
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        rows: np.ndarray = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Shardonkénti TOP-K a poolban, majd összefésülés.
+
+        Paraméterek:
+            query: normalizált query vektor
+            top_k (int)
+            rows: opcionális (rendezetlen) sorpozíciók – csak ezeket pontozzuk
+
+        Visszatér:
+            (sorpozíciók, pontszámok) csökkenő pontszám szerint
+        """
+        pool = get_process_pool(self.workers)
+        query = np.ascontiguousarray(query, dtype=np.float32)
+
+        if rows is not None:
+            rows = np.sort(rows)
+            splits = np.searchsorted(rows, self.bounds)
+
+        futures = []
+        for shard in range(len(self.bounds) - 1):
+            start, end = int(self.bounds[shard]), int(self.bounds[shard + 1])
+            shard_rows = None
+            if rows is not None:
+                shard_rows = rows[splits[shard]:splits[shard + 1]]
+                if shard_rows.size == 0:
+                    continue
+
+            futures.append(pool.submit(
+                _score_shard, self.name, self.shape, start, end, shard_rows, query, top_k
+            ))
+
+        parts = [future.result() for future in futures]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        positions = np.concatenate([p for p, _s in parts])
+        scores = np.concatenate([s for _p, s in parts])
+
+        top = _top_k(scores, top_k)
+        return positions[top], scores[top]
@@ -17,7 +17,7 @@ def build_prompt(query: str, rag_results):
 
     Paraméterek:
         query (str): felhasználó kérdése
-        rag_results (List[(KnowledgeChunk, similarity)]):
+        rag_results (List[(ChunkResult, similarity)]):
             a RAGService által talált chunk + similarity párok
 
     Visszatér:
@@ -0,0 +1,243 @@
+#file: services/rag/quantization.py
+# Kvantált vektor-réteg a kereséshez: int8 skalár kvantálás és 1 bites előjelkódok.
+# A kvantált kódokon gyors előszűrés készül (shortlist), és csak a jelölteket
+# pontozzuk újra a teljes pontosságú vektorokkal.
+
+import copy
+from typing import Optional
+
+import numpy as np
+
+from services.embedding.vector_codec import truncate_vector
+from services.rag.stacked_rows import StackedRows
+
+
+# -------------------------------------------------------------------------
+# Ennyi soronként dolgozunk, hogy az ideiglenes float32 tömbök kicsik maradjanak
+# -------------------------------------------------------------------------
+BLOCK_ROWS = 8192
+
+# 8 bites popcount táblázat a Hamming-távolsághoz (régebbi NumPy verziókhoz)
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(bits: np.ndarray) -> np.ndarray:
+    """Soronkénti 1-es bitek száma (NumPy 2.x: natív bitwise_count)."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int32)
+    return POPCOUNT_TABLE[bits.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class BaseQuantizer:
+    """
+    BaseQuantizer
+    -------------
+    Közös interfész a kvantált rétegekhez.
+    A gyermekosztály az encode() és _approximate_block() metódust implementálja.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.codes: Optional[np.ndarray] = None
+
+    def encode(self, matrix: np.ndarray):
+        """A (normalizált) mátrix kódolása blokkonként (_encode_rows)."""
+        n = matrix.shape[0]
+        self.codes = None
+
+        blocks = [
+            self._encode_rows(np.asarray(matrix[start:start + BLOCK_ROWS], dtype=np.float32))
+            for start in range(0, n, BLOCK_ROWS)
+        ]
+        self.codes = np.concatenate(blocks) if blocks else self._encode_rows(
+            np.empty((0, matrix.shape[1]), dtype=np.float32)
+        )
+
+    def _encode_rows(self, block: np.ndarray) -> np.ndarray:
+        """Egy sorblokk kódjai. A gyermekosztály implementálja."""
+        raise NotImplementedError("Az _encode_rows metódust implementálni kell a gyermek osztályban.")
+
+    def _approximate_block(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Közelítő pontszámok egy kódblokkra (nagyobb = hasonlóbb)."""
+        raise NotImplementedError("Az _approximate_block metódust implementálni kell a gyermek osztályban.")
+
+    def _prepare_query(self, query: np.ndarray):
+        return query
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes if self.codes is not None else 0
+
+    def append_rows(self, added: np.ndarray) -> "BaseQuantizer":
+        """
+        Új kvantáló az új (delta) sorok kódjaival a meglévők után – a meglévő
+        kódokat (és az int8 skálát) nem számoljuk újra és nem másoljuk:
+        a kódok a vektorindex soraihoz igazodva egy StackedRows nézetben bővülnek.
+        """
+        quantizer = copy.copy(self)
+        quantizer.codes = StackedRows.extend(
+            self.codes, self._encode_rows(np.asarray(added, dtype=np.float32))
+        )
+        return quantizer
+
+    # ---------------------------------------------------------------------
+    def approximate_scores(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Közelítő pontszámok a megadott sorokra (None = összes sor),
+        blokkonként számolva.
+        """
+        prepared = self._prepare_query(query)
+        total = self.codes.shape[0] if rows is None else rows.shape[0]
+        scores = np.empty(total, dtype=np.float32)
+
+        for start in range(0, total, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, total)
+            block = self.codes[start:end] if rows is None else self.codes[rows[start:end]]
+            scores[start:end] = self._approximate_block(block, prepared)
+
+        return scores
+
+    def shortlist(self, query: np.ndarray, rows: np.ndarray, size: int) -> np.ndarray:
+        """
+        A legjobb `size` jelölt sorpozíciója a kvantált pontszámok alapján.
+
+        Paraméterek:
+            query: normalizált query vektor
+            rows: pontozandó sorok (None = összes)
+            size (int): jelöltlista mérete (top_k * oversample)
+        """
+        scores = self.approximate_scores(query, rows)
+        if size < scores.shape[0]:
+            best = np.argpartition(-scores, size - 1)[:size]
+        else:
+            best = np.arange(scores.shape[0])
+
+        return rows[best] if rows is not None else best
+
+
+# -------------------------------------------------------------------------
+# int8 skalár kvantálás – 4x kisebb, mint a float32
+# -------------------------------------------------------------------------
+class Int8Quantizer(BaseQuantizer):
+    """
+    Dimenziónkénti szimmetrikus int8 kvantálás:
+    code = round(x / scale), ahol scale = max|x| / 127 az adott dimenzióban.
+    A skaláris szorzat közelítése: codes @ (query * scale).
+    """
+
+    name = "int8"
+
+    def __init__(self):
+        super().__init__()
+        self.scale: Optional[np.ndarray] = None
+
+    def encode(self, matrix: np.ndarray):
+        n, dim = matrix.shape
+
+        max_abs = np.zeros(dim, dtype=np.float32)
+        for start in range(0, n, BLOCK_ROWS):
+            block = np.abs(np.asarray(matrix[start:start + BLOCK_ROWS], dtype=np.float32))
+            np.maximum(max_abs, block.max(axis=0), out=max_abs)
+
+        max_abs[max_abs == 0] = 1.0
+        self.scale = max_abs / 127.0
+
+        super().encode(matrix)
+
+    def _encode_rows(self, block: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(block / self.scale), -127, 127).astype(np.int8)
+
+    def _prepare_query(self, query: np.ndarray):
+        return (query * self.scale).astype(np.float32)
+
+    def _approximate_block(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) @ query
+
+
+# -------------------------------------------------------------------------
+# 1 bites előjelkódok – 32x kisebb, Hamming-távolság alapú előszűrés
+# -------------------------------------------------------------------------
+class BinaryQuantizer(BaseQuantizer):
+    """
+    Dimenziónként 1 bit (x > 0), 64 bites szavakba csomagolva.
+    Pontszám: -Hamming(query kód, chunk kód); kisebb távolság = hasonlóbb.
+    """
+
+    name = "binary"
+
+    @staticmethod
+    def _pack(bits: np.ndarray) -> np.ndarray:
+        """Bool mátrix → (n, ceil(d / 64)) uint64 kódok."""
+        packed = np.packbits(bits, axis=-1)
+        pad = (-packed.shape[-1]) % 8
+        if pad:
+            packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, pad)])
+        return np.ascontiguousarray(packed).view(np.uint64)
+
+    def _encode_rows(self, block: np.ndarray) -> np.ndarray:
+        return self._pack(block > 0)
+
+    def _prepare_query(self, query: np.ndarray):
+        return self._pack(query > 0)
+
+    def _approximate_block(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        distances = popcount_rows(np.bitwise_xor(codes, query))
+        return -distances.astype(np.float32)
+
+
+# -------------------------------------------------------------------------
+# Matryoshka-előtag – az első m dimenzió, újranormalizálva
+# -------------------------------------------------------------------------
+class MatryoshkaQuantizer(BaseQuantizer):
+    """
+    Kétlépcsős keresés durva lépése: a text-embedding-3 vektorok első m
+    dimenziója (újranormalizálva) önmagában is értelmes embedding.
+    3072 → 256 dimenziónál a durva pásztázás ~12x kevesebb adatot érint.
+    A kódok jellemzően a tárolt short_vector oszlopból érkeznek.
+    """
+
+    name = "matryoshka"
+
+    def __init__(self, dimensions: int = 256):
+        super().__init__()
+        self.dimensions = dimensions
+
+    def _encode_rows(self, block: np.ndarray) -> np.ndarray:
+        dims = self.codes.shape[1] if self.codes is not None else self.dimensions
+        return truncate_vector(block, min(dims, block.shape[1]))
+
+    def _prepare_query(self, query: np.ndarray):
+        return truncate_vector(query, self.codes.shape[1])
+
+    def _approximate_block(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes @ query
+
+
+# -------------------------------------------------------------------------
+# Factory
+# -------------------------------------------------------------------------
+def get_quantizer(name: str, short_dimensions: int = 256) -> Optional[BaseQuantizer]:
+    """
+    Kvantáló példány név alapján.
+    Engedélyezett értékek:
+    - none (nincs kvantált réteg)
+    - int8
+    - binary
+    - matryoshka (short_dimensions méretű előtag)
+    """
+    name = (name or "none").lower()
+
+    if name == "none":
+        return None
+
+    if name == "int8":
+        return Int8Quantizer()
+
+    if name == "binary":
+        return BinaryQuantizer()
+
+    if name == "matryoshka":
+        return MatryoshkaQuantizer(short_dimensions)
+
+    raise ValueError(f"❌ Ismeretlen kvantálási mód: {name}")
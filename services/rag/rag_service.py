@@ -4,11 +4,18 @@
 
 from typing import List, Tuple
 import numpy as np
-from django.db.models import QuerySet
+from django.conf import settings
 
+from knowledge.models import KnowledgeEmbedding
 from services.embedding.embedding_service import EmbeddingService
-from services.ai_provider import get_ai_client
-from knowledge.models import KnowledgeEmbedding, KnowledgeChunk, KnowledgeCategory
+from services.embedding.query_cache import get_query_cache
+from services.embedding.vector_codec import decode_vector
+from services.ai_provider import get_embedding_client, get_embedding_model_name
+from services.rag.mmr import DEFAULT_MMR_LAMBDA, DEFAULT_MMR_POOL_SIZE, mmr_select
+from services.rag.scatter_gather import get_search_nodes, scatter_search
+from services.rag.retrieval_provider import get_retrieval_backend
+from services.rag.search_result import ChunkResult, hydrate_hits, load_chunk_results
+from services.rag.vector_index import normalize_rows
 
 
 # -------------------------------------------------------------------------
@@ -47,36 +54,65 @@ class RAGService:
 
     def __init__(self, embedding_client=None):
         if embedding_client is None:
-            embedding_client = get_ai_client("openai")
+            embedding_client = get_embedding_client()
 
         self.embedding_service = EmbeddingService(embedding_client)
 
+        # Az utolsó keresés tényleges hatóköre: kategórianév vagy "global"
+        self.last_search_scope = None
+
+        # Sharded topológiában az utolsó keresésből kiesett (hibás / lassú) nódusok
+        self.last_failed_nodes = []
+
     # ---------------------------------------------------------------------
     def _get_query_embedding(self, query: str):
-        """Felhasználói kérdés embeddingje."""
-        try:
-            return self.embedding_service.create_embedding(query)
-        except Exception as e:
-            print(f"[RAG] Hiba a query embedding generálásakor: {e}")
-            return None
+        """Felhasználói kérdés embeddingje (ismételt kérdésnél a query cache-ből)."""
+        return self._get_query_embeddings([query])[0]
 
     # ---------------------------------------------------------------------
-    def _get_embeddings_by_category(self, category_name: str) -> QuerySet:
+    def _get_query_embeddings(self, queries: List[str]):
         """
-        Csak az adott kategóriához tartozó embeddingeket adja vissza.
+        Több kérdés embeddingje: ami a query cache-ben (LRU / megosztott tábla)
+        megvan, az API hívás nélkül jön; a többi egyetlen provider hívással.
         """
+        model_name = getattr(self.embedding_service.client, "embedding_model", "")
+        query_cache = get_query_cache()
+
+        try:
+            vectors = query_cache.get_many(model_name, queries)
+        except Exception as e:
+            print(f"[RAG] Hiba a query cache olvasásakor: {e}")
+            vectors = [None] * len(queries)
+
+        missing = [pos for pos, vector in enumerate(vectors) if vector is None]
+        if not missing:
+            return vectors
+
         try:
-            category = KnowledgeCategory.objects.get(name=category_name)
-        except KnowledgeCategory.DoesNotExist:
-            return KnowledgeEmbedding.objects.none()
+            fresh = self.embedding_service.create_embeddings([queries[pos] for pos in missing])
+        except Exception as e:
+            print(f"[RAG] Hiba a query embedding generálásakor: {e}")
+            return vectors
+
+        for pos, vector in zip(missing, fresh):
+            vectors[pos] = vector
+
+        try:
+            query_cache.set_many(
+                model_name, {queries[pos]: vector for pos, vector in zip(missing, fresh)}
+            )
+        except Exception as e:
+            print(f"[RAG] Hiba a query cache írásakor: {e}")
 
-        return KnowledgeEmbedding.objects.select_related("chunk", "chunk__item") \
-            .filter(chunk__item__category=category)
+        return vectors
 
     # ---------------------------------------------------------------------
-    def _get_all_embeddings(self) -> QuerySet:
-        """Fallback: összes chunk embedding."""
-        return KnowledgeEmbedding.objects.select_related("chunk", "chunk__item").all()
+    def _hydrate(self, hits: List[Tuple[int, float]]) -> List[Tuple[ChunkResult, float]]:
+        """
+        Csak a nyertes chunk-id-k betöltése egyetlen lekérdezéssel,
+        könnyűsúlyú ChunkResult rekordokba (teljes ORM objektumok nélkül).
+        """
+        return hydrate_hits(hits)
 
     # ---------------------------------------------------------------------
     def search(
@@ -85,7 +121,10 @@ class RAGService:
         top_k: int = None,
         threshold: float = None,
         category_name: str = None,
-    ) -> List[Tuple[KnowledgeChunk, float]]:
+        fallback_to_global: bool = False,
+        filters: dict = None,
+        diversify: bool = None,
+    ) -> List[Tuple[ChunkResult, float]]:
         """
         Embedding alapú keresés chunkok között – kategória-szűrés támogatással.
 
@@ -93,49 +132,196 @@ class RAGService:
             query (str): felhasználói kérdés
             top_k (int)
             threshold (float)
-            category_name (str): ha megadott, csak a kategória chunkjai között keres
+            category_name (str): ha megadott, csak a kategória shardjában keres
+            fallback_to_global (bool): ha a kategória ismeretlen, vagy a shard
+                legjobb találata is a threshold alatt marad, a teljes indexben
+                keresünk (ugyanazzal a query embeddinggel)
+            filters (dict): metaadat-szűrők a VectorIndex.filter_mask() szerint,
+                pl. {"item_ids": [...], "exclude_item_ids": [...], "is_active": None};
+                alapértelmezésben csak aktív tudáselemek chunkjai szerepelnek
+            diversify (bool): MMR diverzifikálás (None = RAG_SETTINGS["mmr_enabled"]);
+                a legjobb mmr_pool_size jelöltből mmr_lambda súllyal választunk
 
         Visszatér:
-            List[(chunk_obj, similarity_score)]
+            List[(ChunkResult, similarity_score)]
         """
 
         top_k = top_k or DEFAULT_TOP_K
         threshold = threshold or DEFAULT_SIMILARITY_THRESHOLD
 
+        rag_settings = getattr(settings, "RAG_SETTINGS", {})
+        if diversify is None:
+            diversify = rag_settings.get("mmr_enabled", False)
+
+        mmr = {}
+        if diversify:
+            mmr = {
+                "mmr_lambda": rag_settings.get("mmr_lambda", DEFAULT_MMR_LAMBDA),
+                "mmr_pool_size": rag_settings.get("mmr_pool_size", DEFAULT_MMR_POOL_SIZE),
+            }
+
         # ------------------------------------------------------------
         # 1) Query embedding
         # ------------------------------------------------------------
         query_vector = self._get_query_embedding(query)
-        if not query_vector:
+        if query_vector is None or len(query_vector) == 0:
             return []
 
-        # ------------------------------------------------------------
-        # 2) Embeddingek lekérése kategória alapján
-        # ------------------------------------------------------------
-        if category_name:
-            embeddings = self._get_embeddings_by_category(category_name)
-        else:
-            embeddings = self._get_all_embeddings()
-
-        scored_results = []
+        if get_search_nodes():
+            return self._search_nodes(
+                query_vector, top_k, threshold, category_name, fallback_to_global, filters, mmr
+            )
 
         # ------------------------------------------------------------
-        # 3) Similarity számítás
+        # 2) Keresőbackend (RAG_SETTINGS["index_mode"]): memóriaindex,
+        #    SQLite vagy Elasticsearch – a kategória shardjában, a
+        #    metaadat-szűrőkkel a backenden belül
         # ------------------------------------------------------------
-        for emb in embeddings:
-            try:
-                similarity = cosine_similarity(query_vector, emb.vector)
-            except Exception:
-                similarity = 0.0
+        backend = get_retrieval_backend()
 
-            scored_results.append((emb.chunk, similarity))
+        # A threshold nem szűr (min_score nélkül, minden backendnél és a nódusoknál
+        # is): a threshold alatti találatok is visszajönnek, a hívó jelöli őket
+        # (is_above), így index_mode-tól függetlenül ugyanaz a találati lista
+        hits = []
+        if category_name:
+            hits = backend.search_vector(
+                query_vector, top_k, category_name=category_name, filters=filters, mmr=mmr,
+            )
+            self.last_search_scope = category_name
 
         # ------------------------------------------------------------
-        # 4) Rendezés
+        # 3) Visszaesés a teljes tudásbázisra (ugyanazzal a query embeddinggel)
         # ------------------------------------------------------------
-        scored_results.sort(key=lambda x: x[1], reverse=True)
+        if not category_name or (fallback_to_global and (not hits or hits[0][1] < threshold)):
+            hits = backend.search_vector(query_vector, top_k, filters=filters, mmr=mmr)
+            self.last_search_scope = "global"
 
         # ------------------------------------------------------------
-        # 5) TOP-K
+        # 4) Csak a nyertes chunkok betöltése
         # ------------------------------------------------------------
-        return scored_results[:top_k]
+        return self._hydrate(hits)
+
+    # ---------------------------------------------------------------------
+    def _search_nodes(
+        self,
+        query_vector,
+        top_k: int,
+        threshold: float,
+        category_name: str = None,
+        fallback_to_global: bool = False,
+        filters: dict = None,
+        mmr: dict = None,
+    ) -> List[Tuple[ChunkResult, float]]:
+        """
+        Sharded topológia (RAG_SETTINGS["search_nodes"]): a query vektort
+        az összes keresőnódus megkapja, a TOP-K-t itt fésüljük össze.
+        A kategória-visszaesés logikája ugyanaz, mint a helyi indexnél.
+        MMR esetén a nódusok a teljes jelöltkészletet adják vissza, és a
+        diverzifikálás az összefésült készleten történik (nódusokon átívelően).
+        """
+        hits = []
+        failed = []
+        fetch_k = max(top_k, mmr["mmr_pool_size"]) if mmr else top_k
+
+        if category_name:
+            (hits,), failed = scatter_search([query_vector], fetch_k, category_name, filters)
+            self.last_search_scope = category_name
+
+        if not category_name or (fallback_to_global and (not hits or hits[0][1] < threshold)):
+            (hits,), failed = scatter_search([query_vector], fetch_k, filters=filters)
+            self.last_search_scope = "global"
+
+        self.last_failed_nodes = failed
+
+        if mmr:
+            hits = self._diversify(hits, top_k, mmr["mmr_lambda"])
+
+        return self._hydrate(hits)
+
+    # ---------------------------------------------------------------------
+    def _diversify(self, hits: List[Tuple[int, float]], top_k: int, mmr_lambda: float) -> List[Tuple[int, float]]:
+        """
+        MMR az összefésült nódus-találatokon: a jelöltek (aktív modellű) vektorait
+        egyetlen lekérdezéssel töltjük be, a kiválasztás ugyanaz, mint a memóriaindexben.
+        """
+        rows = KnowledgeEmbedding.objects.filter(
+            model_name=get_embedding_model_name(), chunk_id__in=[chunk_id for chunk_id, _ in hits]
+        ).values_list("chunk_id", "vector", "dtype")
+        vectors = {chunk_id: decode_vector(data, dtype) for chunk_id, data, dtype in rows}
+
+        # A nódus indexe és az adatbázis között törölt chunk kimarad
+        hits = [(chunk_id, score) for chunk_id, score in hits if chunk_id in vectors]
+        if not hits:
+            return []
+
+        candidates = normalize_rows(np.stack([vectors[chunk_id] for chunk_id, _ in hits]).astype(np.float32))
+
+        order = mmr_select(candidates, np.array([score for _, score in hits]), top_k, mmr_lambda)
+        return [hits[pos] for pos in order]
+
+    # ---------------------------------------------------------------------
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        threshold: float = None,
+        filters: dict = None,
+    ) -> List[List[Tuple[ChunkResult, float]]]:
+        """
+        Több kérdés egyidejű keresése (offline kiértékelés, al-kérdésekre bontó
+        upstream szolgáltatások): egyetlen embedding hívás, egyetlen
+        mátrix-mátrix szorzás és egyetlen chunk-betöltő lekérdezés.
+
+        Paraméterek:
+            queries (List[str]): felhasználói kérdések
+            top_k (int)
+            threshold (float): a találatokat nem szűri (lásd search()), a hívó jelöli
+            filters (dict): metaadat-szűrők, lásd search()
+
+        Visszatér:
+            kérdésenként List[(ChunkResult, similarity_score)], a bemenet sorrendjében
+        """
+
+        top_k = top_k or DEFAULT_TOP_K
+
+        if not queries:
+            return []
+
+        query_vectors = self._get_query_embeddings(queries)
+
+        if get_search_nodes():
+            all_hits, self.last_failed_nodes = scatter_search(
+                query_vectors, top_k, filters=filters
+            )
+        else:
+            all_hits = get_retrieval_backend().search_vector_many(query_vectors, top_k, filters=filters)
+
+        # Egyetlen betöltés az összes query nyertes chunkjaira
+        hydrated = load_chunk_results(
+            {chunk_id for hits in all_hits for chunk_id, _score in hits}
+        )
+
+        return [
+            [(hydrated[chunk_id], score) for chunk_id, score in hits if chunk_id in hydrated]
+            for hits in all_hits
+        ]
+
+    # ---------------------------------------------------------------------
+    def search_text(
+        self,
+        query: str,
+        top_k: int = None,
+        category_name: str = None,
+        filters: dict = None,
+    ) -> List[Tuple[ChunkResult, float]]:
+        """
+        Klasszikus szöveges keresés chunkok között a beállított keresőbackenden
+        (adatbázis: előfordulásszám, Elasticsearch: BM25).
+
+        Visszatér:
+            List[(ChunkResult, score)]
+        """
+        hits = get_retrieval_backend().search_text(
+            query, top_k or DEFAULT_TOP_K, category_name=category_name, filters=filters
+        )
+        return self._hydrate(hits)
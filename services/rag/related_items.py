@@ -0,0 +1,261 @@
+#file: services/rag/related_items.py
+# Kapcsolódó tudáselemek – előre kiszámolt kNN gráf tudáselem-embeddingekből.
+# A gráfot egyszer, offline építjük fel (manage.py build_related_items), utána
+# tudáselemenként inkrementálisan frissítjük, amikor a chunkjai újra beágyazódnak.
+# A lekérdezés így egyetlen indexelt olvasás, nem teljes embedding-pásztázás.
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from knowledge.models import (
+    KnowledgeEmbedding,
+    KnowledgeItemEmbedding,
+    RelatedKnowledgeItem,
+)
+from services.ai_provider import get_embedding_model_name
+from services.embedding.vector_codec import decode_vector, encode_vector
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_RELATED_K = 10
+
+# A gráfépítés ennyi tudáselemet pontoz egyszerre (blokk × összes tudáselem)
+GRAPH_BLOCK_ITEMS = 1024
+
+
+def get_related_k() -> int:
+    return int(getattr(settings, "RAG_SETTINGS", {}).get("related_items_k", DEFAULT_RELATED_K))
+
+
+# -------------------------------------------------------------------------
+# Tudáselem-embedding
+# -------------------------------------------------------------------------
+def compute_item_vector(item_id: int) -> Tuple[Optional[np.ndarray], int]:
+    """
+    A tudáselem chunk embeddingjeinek normalizált átlaga (az aktív modell vektoraiból).
+
+    Visszatér:
+        (vektor vagy None, felhasznált chunkok száma)
+    """
+    rows = KnowledgeEmbedding.objects.filter(
+        chunk__item_id=item_id, model_name=get_embedding_model_name()
+    ).values_list("vector", "dtype")
+
+    total = None
+    count = 0
+    for data, dtype in rows.iterator():
+        vector = decode_vector(data, dtype)
+        norm = float(np.linalg.norm(vector)) if vector.size else 0.0
+        if norm == 0 or (total is not None and vector.shape != total.shape):
+            continue
+
+        total = vector / norm if total is None else total + vector / norm
+        count += 1
+
+    if total is None:
+        return None, 0
+
+    norm = float(np.linalg.norm(total))
+    if norm == 0:
+        return None, 0
+
+    return (total / norm).astype(np.float32), count
+
+
+def update_item_embedding(item_id: int) -> Optional[np.ndarray]:
+    """
+    A tudáselem-embedding újraszámolása és mentése.
+    Ha a tudáselemnek nincs (már) chunk embeddingje, a rekordot töröljük.
+    """
+    vector, count = compute_item_vector(item_id)
+
+    if vector is None:
+        KnowledgeItemEmbedding.objects.filter(item_id=item_id).delete()
+        return None
+
+    KnowledgeItemEmbedding.objects.update_or_create(
+        item_id=item_id,
+        defaults={
+            "vector": encode_vector(vector, "float32"),
+            "dimensions": vector.shape[0],
+            "chunk_count": count,
+        },
+    )
+    return vector
+
+
+def load_item_matrix() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Az összes tudáselem-embedding: (item_ids, (I, d) normalizált mátrix).
+    Eltérő dimenziójú vektorok (modellváltás közben) kimaradnak.
+    """
+    item_ids = []
+    vectors = []
+    dim = None
+
+    for item_id, data in KnowledgeItemEmbedding.objects.values_list("item_id", "vector").iterator():
+        vector = decode_vector(data, "float32")
+        if vector.size == 0:
+            continue
+        if dim is None:
+            dim = vector.shape[0]
+        elif vector.shape[0] != dim:
+            continue
+
+        item_ids.append(item_id)
+        vectors.append(vector)
+
+    if not vectors:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+
+    return np.asarray(item_ids, dtype=np.int64), np.vstack(vectors)
+
+
+# -------------------------------------------------------------------------
+# kNN gráf
+# -------------------------------------------------------------------------
+def _neighbor_links(
+    item_ids: np.ndarray,
+    matrix: np.ndarray,
+    positions: Iterable[int],
+    k: int,
+) -> List[RelatedKnowledgeItem]:
+    """A megadott sorpozíciójú tudáselemek k legközelebbi szomszédja, blokkonként."""
+    positions = np.asarray(list(positions), dtype=np.int64)
+    links = []
+
+    k = min(k, len(item_ids) - 1)
+    if k <= 0 or positions.size == 0:
+        return links
+
+    for start in range(0, positions.size, GRAPH_BLOCK_ITEMS):
+        block = positions[start:start + GRAPH_BLOCK_ITEMS]
+        scores = matrix[block] @ matrix.T
+        scores[np.arange(block.size), block] = -np.inf  # önmaga nem szomszéd
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        for row, pos in enumerate(block):
+            for rank, (neighbor, score) in enumerate(zip(top[row], top_scores[row])):
+                links.append(RelatedKnowledgeItem(
+                    item_id=int(item_ids[pos]),
+                    related_id=int(item_ids[neighbor]),
+                    score=float(score),
+                    rank=rank,
+                ))
+
+    return links
+
+
+def build_related_graph(k: int = None, refresh_embeddings: bool = True) -> Dict[str, int]:
+    """
+    A teljes kNN gráf felépítése (offline, manage.py build_related_items).
+
+    Paraméterek:
+        k (int): szomszédok száma tudáselemenként
+        refresh_embeddings (bool): a tudáselem-embeddingek újraszámolása is
+
+    Visszatér:
+        dict: tudáselemek és élek száma
+    """
+    k = k or get_related_k()
+
+    if refresh_embeddings:
+        item_ids_with_vectors = (
+            KnowledgeEmbedding.objects.filter(model_name=get_embedding_model_name())
+            .values_list("chunk__item_id", flat=True).distinct()
+        )
+        for item_id in list(item_ids_with_vectors):
+            update_item_embedding(item_id)
+        KnowledgeItemEmbedding.objects.exclude(item_id__in=item_ids_with_vectors).delete()
+
+    item_ids, matrix = load_item_matrix()
+    links = _neighbor_links(item_ids, matrix, range(len(item_ids)), k)
+
+    with transaction.atomic():
+        RelatedKnowledgeItem.objects.all().delete()
+        RelatedKnowledgeItem.objects.bulk_create(links, batch_size=1000)
+
+    return {"items": len(item_ids), "links": len(links)}
+
+
+def refresh_related_items(item_id: int, k: int = None):
+    """
+    Inkrementális frissítés egy tudáselem újrabeágyazása után:
+    - a tudáselem-embedding újraszámolása,
+    - a tudáselem saját szomszédlistája,
+    - azoknak a tudáselemeknek a listája, amelyekben eddig szerepelt,
+      vagy amelyek listájába az új hasonlóság alapján bekerül.
+    A többi tudáselem listája érintetlen marad.
+    """
+    k = k or get_related_k()
+
+    with transaction.atomic():
+        vector = update_item_embedding(item_id)
+
+        affected = set(
+            RelatedKnowledgeItem.objects.filter(related_id=item_id).values_list("item_id", flat=True)
+        )
+        RelatedKnowledgeItem.objects.filter(item_id=item_id).delete()
+
+        item_ids, matrix = load_item_matrix()
+        position = {int(i): pos for pos, i in enumerate(item_ids)}
+
+        if vector is not None and item_id in position:
+            affected.add(item_id)
+
+            # Kinek a listájába kerül be: ahol az új hasonlóság meghaladja a
+            # jelenlegi leggyengébb szomszédot, vagy még nincs k szomszéd
+            similarity = matrix @ matrix[position[item_id]]
+            stats = {
+                row["item_id"]: row
+                for row in RelatedKnowledgeItem.objects.values("item_id").annotate(
+                    weakest=Min("score"), count=Count("id")
+                )
+            }
+            for other_id, pos in position.items():
+                if other_id == item_id:
+                    continue
+                row = stats.get(other_id)
+                if row is None or row["count"] < k or similarity[pos] > row["weakest"]:
+                    affected.add(other_id)
+
+        affected = [i for i in affected if i in position]
+        RelatedKnowledgeItem.objects.filter(item_id__in=affected).delete()
+        RelatedKnowledgeItem.objects.bulk_create(
+            _neighbor_links(item_ids, matrix, [position[i] for i in affected], k),
+            batch_size=1000,
+        )
+
+
+# -------------------------------------------------------------------------
+# Lekérdezés
+# -------------------------------------------------------------------------
+def get_related_items(item_id: int, limit: int = None) -> List[dict]:
+    """
+    Az előre kiszámolt szomszédok egyetlen indexelt lekérdezéssel
+    (csak aktív tudáselemek).
+    """
+    links = (
+        RelatedKnowledgeItem.objects
+        .filter(item_id=item_id, related__is_active=True)
+        .order_by("rank")
+        .values_list("related_id", "related__title", "related__slug", "score")
+    )
+    if limit:
+        links = links[:limit]
+
+    return [
+        {"item_id": related_id, "title": title, "slug": slug, "score": score}
+        for related_id, title, slug, score in links
+    ]
@@ -0,0 +1,47 @@
+#file: services/rag/retrieval_provider.py
+# A modul a beállított keresőbackendet adja vissza (RAG_SETTINGS["index_mode"]).
+
+import threading
+
+from django.conf import settings
+
+from services.rag.backends.base_backend import BaseRetrievalBackend
+from services.rag.backends.elasticsearch_backend import ElasticsearchRetrievalBackend
+from services.rag.backends.numpy_backend import NumpyRetrievalBackend
+from services.rag.backends.sqlite_backend import SQLiteRetrievalBackend
+
+
+# Folyamatonként egy backend példány (pl. az ES kliens kapcsolatkészlete miatt)
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_retrieval_backend(mode: str = None) -> BaseRetrievalBackend:
+    """
+    Visszaadja a keresőbackendet a megadott / beállított mód alapján.
+    Engedélyezett értékek:
+    - memory        (NumPy memóriaindex, alapértelmezés)
+    - sqlite        (SQL függvénnyel pontoz az adatbázisban)
+    - elasticsearch (dense_vector kNN egy külön ES clusterben)
+    """
+    mode = (mode or getattr(settings, "RAG_SETTINGS", {}).get("index_mode", "memory")).lower()
+
+    with _backends_lock:
+        backend = _backends.get(mode)
+        if backend is None:
+            backend = _backends[mode] = _create_backend(mode)
+        return backend
+
+
+def _create_backend(mode: str) -> BaseRetrievalBackend:
+    if mode == "memory":
+        return NumpyRetrievalBackend()
+
+    if mode == "sqlite":
+        return SQLiteRetrievalBackend()
+
+    if mode == "elasticsearch":
+        # Az elasticsearch csomag csak a kliens létrehozásakor töltődik be
+        return ElasticsearchRetrievalBackend()
+
+    raise ValueError(f"❌ Ismeretlen keresőbackend: {mode}")
@@ -0,0 +1,200 @@
+#file: services/rag/scatter_gather.py
+# Több keresőnódusra osztott (sharded) keresés – scatter-gather koordinátor.
+# Minden nódus a tudásbázis egy részét (kategóriák és/vagy chunk-id tartomány)
+# tartja memóriában, és egy belső HTTP végponton keres benne. A koordinátor a
+# query vektort párhuzamosan elküldi az összes nódusnak, nódusonkénti
+# időkorláttal vár, majd a TOP-K találatokat összefésüli.
+
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.db.models import Q
+
+
+# -------------------------------------------------------------------------
+# Alapértelmezett paraméterek
+# -------------------------------------------------------------------------
+DEFAULT_NODE_TIMEOUT = 2.0
+NODE_SEARCH_PATH = "/api/rag/node/search"
+NODE_TOKEN_HEADER = "X-Search-Node-Token"
+
+# A nódushívásokat futtató szálak száma (folyamatonként közös pool)
+MAX_FANOUT_THREADS = 32
+
+
+def _rag_settings() -> dict:
+    return getattr(settings, "RAG_SETTINGS", {})
+
+
+# -------------------------------------------------------------------------
+# Nódus oldal – melyik embeddingek tartoznak ehhez a nódushoz
+# -------------------------------------------------------------------------
+def parse_chunk_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    "kezdő-vég" formátumú chunk-id tartomány ([kezdő, vég) – félig nyitott).
+    Bármelyik határ elhagyható: "5000-" vagy "-5000".
+    """
+    if not value:
+        return None, None
+
+    start, _sep, end = value.partition("-")
+    return (int(start) if start.strip() else None, int(end) if end.strip() else None)
+
+
+def ownership_filter() -> Optional[Q]:
+    """
+    A nódus tulajdonrésze KnowledgeEmbedding szűrőként
+    (RAG_SETTINGS["node_categories"] és ["node_chunk_range"]).
+    None, ha a nódus a teljes tudásbázist tartja.
+    """
+    rag_settings = _rag_settings()
+    condition = Q()
+
+    categories = rag_settings.get("node_categories") or []
+    if categories:
+        condition &= Q(chunk__item__category__name__in=categories)
+
+    start, end = parse_chunk_range(rag_settings.get("node_chunk_range", ""))
+    if start is not None:
+        condition &= Q(chunk_id__gte=start)
+    if end is not None:
+        condition &= Q(chunk_id__lt=end)
+
+    return condition if condition else None
+
+
+# -------------------------------------------------------------------------
+# Vektorok kódolása a nódusok közötti forgalomhoz (base64 float32 – a JSON
+# számlistánál ~3x kisebb, és a nódus egyetlen frombuffer hívással dekódolja)
+# -------------------------------------------------------------------------
+def encode_query_vector(vector) -> Optional[str]:
+    if vector is None:
+        return None
+    data = np.asarray(vector, dtype="<f4").tobytes()
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_query_vector(value: Optional[str]) -> Optional[np.ndarray]:
+    if not value:
+        return None
+    return np.frombuffer(base64.b64decode(value), dtype="<f4")
+
+
+# -------------------------------------------------------------------------
+# Koordinátor oldal
+# -------------------------------------------------------------------------
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_sessions = threading.local()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_FANOUT_THREADS, thread_name_prefix="rag-scatter"
+            )
+        return _executor
+
+
+def _get_session() -> requests.Session:
+    """Szálanként egy HTTP session (keep-alive kapcsolatok a nódusokhoz)."""
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    return session
+
+
+def get_search_nodes() -> List[str]:
+    """A beállított keresőnódusok alap URL-jei (üres lista = nincs sharding)."""
+    return list(_rag_settings().get("search_nodes") or [])
+
+
+def _query_node(node: str, payload: dict, timeout: float) -> List[List[Tuple[int, float]]]:
+    headers = {}
+    token = _rag_settings().get("node_token")
+    if token:
+        headers[NODE_TOKEN_HEADER] = token
+
+    response = _get_session().post(
+        node.rstrip("/") + NODE_SEARCH_PATH, json=payload, headers=headers, timeout=timeout
+    )
+    response.raise_for_status()
+
+    data = response.json()
+    return [[(int(cid), float(score)) for cid, score in hits] for hits in data["results"]]
+
+
+def scatter_search(
+    query_vectors,
+    top_k: int,
+    category_name: str = None,
+    filters: dict = None,
+    nodes: List[str] = None,
+    timeout: float = None,
+) -> Tuple[List[List[Tuple[int, float]]], List[str]]:
+    """
+    Keresés az összes nóduson párhuzamosan, majd TOP-K összefésülés.
+
+    Paraméterek:
+        query_vectors: query embeddingek listája (None elem = nincs találat)
+        top_k (int)
+        category_name (str): a nódusok csak a kategória shardjukban keresnek
+        filters (dict): metaadat-szűrők (VectorIndex.filter_mask()); a nódusok
+            csak aktív tudáselemekben keresnek
+        nodes (List[str]): nódus URL-ek (alapértelmezés: RAG_SETTINGS["search_nodes"])
+        timeout (float): nódusonkénti időkorlát másodpercben
+
+    Visszatér:
+        (query-nként List[(chunk_id, similarity)], a hibás / lassú nódusok listája)
+        A kieső nódusok találatai nélkül is visszaadjuk a többiek eredményét.
+    """
+    nodes = nodes or get_search_nodes()
+    timeout = timeout or _rag_settings().get("node_timeout", DEFAULT_NODE_TIMEOUT)
+
+    # Az is_active szűrőt a nódus mindig maga állítja (csak aktív tudáselemek),
+    # a végpont ezt a kulcsot nem is fogadja el
+    payload = {
+        "vectors": [encode_query_vector(v) for v in query_vectors],
+        "top_k": top_k,
+        "category_name": category_name,
+        "filters": {key: value for key, value in (filters or {}).items() if key != "is_active"},
+    }
+
+    executor = _get_executor()
+    futures = {executor.submit(_query_node, node, payload, timeout): node for node in nodes}
+    done, not_done = wait(futures, timeout=timeout)
+
+    failed = [futures[f] for f in not_done]
+    merged: List[dict] = [{} for _ in query_vectors]
+
+    for future in done:
+        node = futures[future]
+        try:
+            node_results = future.result()
+        except Exception as e:
+            print(f"[ScatterGather] Hiba a(z) {node} nódusnál: {e}")
+            failed.append(node)
+            continue
+
+        # Átfedő tulajdonrészeknél ugyanaz a chunk több nódusról is jöhet
+        for best, hits in zip(merged, node_results):
+            for chunk_id, score in hits:
+                if score > best.get(chunk_id, -np.inf):
+                    best[chunk_id] = score
+
+    for future in not_done:
+        print(f"[ScatterGather] Időtúllépés: {futures[future]} ({timeout} mp)")
+
+    results = [
+        sorted(best.items(), key=lambda hit: hit[1], reverse=True)[:top_k]
+        for best in merged
+    ]
+    return results, failed
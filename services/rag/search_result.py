@@ -0,0 +1,65 @@
+#file: services/rag/search_result.py
+# Könnyűsúlyú keresési találat – a nyertes chunkok csak a promptépítéshez és a
+# válaszhoz szükséges mezőkkel töltődnek be, ORM objektumok nélkül.
+
+from typing import Dict, Iterable, List, Tuple
+
+from knowledge.models import KnowledgeChunk
+
+
+# -------------------------------------------------------------------------
+# A betöltött mezők (KnowledgeChunk values_list sorrendben)
+# -------------------------------------------------------------------------
+CHUNK_RESULT_FIELDS = ("id", "item_id", "index", "content", "item__title", "item__category_id")
+
+
+class ChunkResult:
+    """
+    ChunkResult
+    -----------
+    Egy találati chunk a build_prompt() és a RAG API válaszok számára.
+    __slots__: nincs példányonkénti __dict__, a memória a TOP-K-val arányos.
+    """
+
+    __slots__ = ("id", "item_id", "index", "content", "item_title", "category_id")
+
+    def __init__(self, id, item_id, index, content, item_title, category_id):
+        self.id = id
+        self.item_id = item_id
+        self.index = index
+        self.content = content
+        self.item_title = item_title
+        self.category_id = category_id
+
+    def __repr__(self):
+        return f"<ChunkResult {self.id}: {self.item_title} – chunk #{self.index}>"
+
+
+# -------------------------------------------------------------------------
+# Betöltés
+# -------------------------------------------------------------------------
+def load_chunk_results(chunk_ids: Iterable[int]) -> Dict[int, ChunkResult]:
+    """
+    A megadott chunkok betöltése egyetlen lekérdezéssel: chunk_id → ChunkResult.
+    A nem létező (időközben törölt) chunkok kimaradnak.
+    """
+    chunk_ids = list(chunk_ids)
+    if not chunk_ids:
+        return {}
+
+    rows = KnowledgeChunk.objects.filter(pk__in=chunk_ids).values_list(*CHUNK_RESULT_FIELDS)
+    return {row[0]: ChunkResult(*row) for row in rows}
+
+
+def hydrate_hits(hits: List[Tuple[int, float]]) -> List[Tuple[ChunkResult, float]]:
+    """
+    (chunk_id, score) párok → (ChunkResult, score) párok,
+    az eredeti (hasonlóság szerinti) sorrend megtartásával.
+    """
+    chunks = load_chunk_results(chunk_id for chunk_id, _score in hits)
+
+    return [
+        (chunks[chunk_id], score)
+        for chunk_id, score in hits
+        if chunk_id in chunks
+    ]
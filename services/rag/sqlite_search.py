@@ -0,0 +1,199 @@
+#file: services/rag/sqlite_search.py
+# Adatbázison belüli vektorkeresés SQLite-on – rezidens memóriaindex nélkül.
+# A kapcsolatra egy saját SQL függvényt (vector_cosine) regisztrálunk, így a
+# pontozás, a threshold szűrés, az ORDER BY és a LIMIT egyetlen SQL utasításban
+# fut, és csak a TOP-K sor jut vissza Pythonba. A pontszámot egy CTE soronként
+# egyszer számolja; a szűrés és a rendezés már ezt az oszlopot használja.
+# Ugyanitt regisztráljuk a casefold(text) függvényt is: a SQLite beépített
+# LOWER / LIKE csak ASCII betűket kisbetűsít, így az ékezetes nagybetűk
+# (Á, É, Ő, Ű) nélküle nem egyeznek a szöveges keresésben.
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.db import connection
+from django.db.backends.sqlite3.base import Database
+from django.db.models import FloatField, Func, Value
+from django.db.models.fields import BinaryField
+
+from knowledge.models import KnowledgeEmbedding
+from services.ai_provider import get_embedding_model_name
+from services.embedding.vector_codec import VECTOR_DTYPES, DEFAULT_VECTOR_DTYPE
+
+
+# -------------------------------------------------------------------------
+# SQL függvény: vector_cosine(vector, dtype, query)
+# -------------------------------------------------------------------------
+SQL_FUNCTION_NAME = "vector_cosine"
+
+
+@lru_cache(maxsize=32)
+def _decode_query(data: bytes) -> np.ndarray:
+    """A (már normalizált) float32 query bájtsor – keresésenként egyszer dekódoljuk."""
+    return np.frombuffer(data, dtype=np.float32)
+
+
+def _vector_cosine(vector, dtype, query) -> Optional[float]:
+    """
+    Egy tárolt vektor és a normalizált query koszinusz hasonlósága.
+    NULL-t ad vissza eltérő dimenzió vagy ismeretlen tárolási típus esetén,
+    így a sor kiesik a threshold szűrésből és a rendezés végére kerül.
+    """
+    if not vector or not query:
+        return None
+
+    storage = VECTOR_DTYPES.get(dtype or DEFAULT_VECTOR_DTYPE)
+    if storage is None:
+        return None
+
+    q = _decode_query(bytes(query))
+    v = np.frombuffer(vector, dtype=storage).astype(np.float32, copy=False)
+    if v.shape[0] != q.shape[0]:
+        return None
+
+    norm = float(np.sqrt(v @ v))
+    if norm == 0:
+        return None
+
+    return float(v @ q) / norm
+
+
+# -------------------------------------------------------------------------
+# SQL függvény: casefold(text) – Unicode kisbetűsítés
+# -------------------------------------------------------------------------
+CASEFOLD_FUNCTION_NAME = "casefold"
+
+
+def _casefold(text) -> Optional[str]:
+    return text.casefold() if isinstance(text, str) else text
+
+
+def register_vector_functions(sender=None, connection=None, **kwargs):
+    """
+    connection_created signal kezelő: SQLite kapcsolatokon regisztrálja
+    a vector_cosine és a casefold függvényt (más adatbázis-motoroknál nem
+    csinál semmit).
+    """
+    if connection is None or connection.vendor != "sqlite":
+        return
+
+    connection.connection.create_function(
+        SQL_FUNCTION_NAME, 3, _vector_cosine, deterministic=True
+    )
+    connection.connection.create_function(
+        CASEFOLD_FUNCTION_NAME, 1, _casefold, deterministic=True
+    )
+
+
+class Casefold(Func):
+    """
+    ORM kifejezés: Unicode-helyes kisbetűsítés.
+    SQLite-on a regisztrált casefold() függvény, más motoroknál LOWER()
+    (pl. Postgresen az már a teljes Unicode készletre működik).
+    """
+
+    function = "LOWER"
+    arity = 1
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function=CASEFOLD_FUNCTION_NAME, **extra_context)
+
+
+class VectorCosine(Func):
+    """ORM kifejezés: vector_cosine(vector, dtype, <query bájtsor>)."""
+
+    function = SQL_FUNCTION_NAME
+    output_field = FloatField()
+
+    def __init__(self, query: np.ndarray, **extra):
+        query_bytes = np.ascontiguousarray(query, dtype=np.float32).tobytes()
+        super().__init__(
+            "vector",
+            "dtype",
+            Value(query_bytes, output_field=BinaryField()),
+            **extra,
+        )
+
+
+# -------------------------------------------------------------------------
+# Keresés
+# -------------------------------------------------------------------------
+# SQLite 3.35+: a MATERIALIZED kulcsszó megakadályozza, hogy a CTE-t a
+# lekérdezés-optimalizáló visszaolvassza a külső lekérdezésbe (a pontozó
+# kifejezés így nem kerül újra a WHERE és az ORDER BY ágba)
+MATERIALIZED = "MATERIALIZED " if Database.sqlite_version_info >= (3, 35, 0) else ""
+
+def sql_search(
+    query_vector,
+    top_k: int,
+    min_score: float = None,
+    category_name: str = None,
+    is_active: Optional[bool] = True,
+    category_ids=None,
+    item_ids=None,
+    exclude_item_ids=None,
+) -> List[Tuple[int, float]]:
+    """
+    TOP-K keresés egyetlen SQL utasítással.
+
+    Paraméterek:
+        query_vector: a kérdés embeddingje (nem kell normalizálni)
+        top_k (int): LIMIT
+        min_score (float): ha megadott, az ennél kisebb hasonlóságú sorok
+                           már az adatbázisban kiesnek
+        category_name (str): csak az adott nevű kategória chunkjai
+        is_active, category_ids, item_ids, exclude_item_ids:
+            ugyanazok a metaadat-szűrők, mint a VectorIndex.filter_mask()-ban
+
+    Visszatér:
+        List[(chunk_id, similarity)] csökkenő hasonlóság szerint
+    """
+    if connection.vendor != "sqlite":
+        raise RuntimeError("Az adatbázison belüli vektorkeresés csak SQLite-tal működik.")
+
+    if top_k <= 0:
+        return []
+
+    query = np.asarray(query_vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(query)) if query.size else 0.0
+    if norm == 0:
+        return []
+
+    # Csak az aktív modell (a query modellje) azonos dimenziójú vektorai –
+    # modellváltás közben a másik modell vektorai is a táblában vannak
+    qs = KnowledgeEmbedding.objects.filter(
+        model_name=get_embedding_model_name(), dimensions=query.shape[0]
+    ).annotate(score=VectorCosine(query / norm))
+
+    if is_active is not None:
+        qs = qs.filter(chunk__item__is_active=is_active)
+    if category_name:
+        qs = qs.filter(chunk__item__category__name=category_name)
+    if category_ids is not None:
+        qs = qs.filter(chunk__item__category_id__in=list(category_ids))
+    if item_ids is not None:
+        qs = qs.filter(chunk__item_id__in=list(item_ids))
+    if exclude_item_ids:
+        qs = qs.exclude(chunk__item_id__in=list(exclude_item_ids))
+
+    # A szűrt sorok pontozása a CTE-ben (soronként egy vector_cosine hívás),
+    # a threshold, az ORDER BY és a LIMIT a kiszámolt oszlopon fut
+    scored_sql, params = qs.values_list("chunk_id", "score").query.sql_with_params()
+
+    where = "score IS NOT NULL"
+    if min_score is not None:
+        where = "score >= %s"
+        params = (*params, float(min_score))
+
+    sql = (
+        f"WITH scored (chunk_id, score) AS {MATERIALIZED}({scored_sql}) "
+        f"SELECT chunk_id, score FROM scored WHERE {where} "
+        f"ORDER BY score DESC, chunk_id LIMIT %s"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*params, int(top_k)))
+        rows = cursor.fetchall()
+
+    return [(chunk_id, float(score)) for chunk_id, score in rows]
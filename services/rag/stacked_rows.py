@@ -0,0 +1,91 @@
+#file: services/rag/stacked_rows.py
+# Alap mátrix + hozzáfűzött (overlay) sorok közös nézete, másolás nélkül.
+# A delta-szinkron az új vektorokat egy kis overlay mátrixba teszi, így a
+# memory-mappelt snapshot / shared memory alap mátrix változatlan marad;
+# a kettő csak teljes újratöltéskor (új snapshot, adatbázis) olvad össze.
+
+from typing import Tuple
+
+import numpy as np
+
+
+class StackedRows:
+    """
+    StackedRows
+    -----------
+    A (base ; delta) sorok együttes, csak olvasható nézete azokra a NumPy
+    műveletekre, amelyeket a keresés használ:
+
+    - shape, ndim, dtype, nbytes, len()
+    - sorindexelés: szelet, egész tömb, logikai maszk (az eredmény ndarray)
+    - nézet @ vektor / mátrix (a két rész külön szorzás, az eredmény összefűzve)
+
+    Ahol teljes tömb kell (np.asarray), ott egyszer összefűzzük – ez csak
+    ritka, teljes újraépítéseknél (pl. IVF tanítás) fordul elő.
+    """
+
+    def __init__(self, base: np.ndarray, delta: np.ndarray):
+        self.base = base
+        self.delta = np.ascontiguousarray(delta, dtype=base.dtype).reshape((-1,) + tuple(base.shape[1:]))
+        self.base_rows = base.shape[0]
+
+    @classmethod
+    def extend(cls, matrix, rows: np.ndarray) -> "StackedRows":
+        """Új nézet a sorok hozzáfűzésével (a meglévő overlay-t bővítjük, az alapot nem)."""
+        if isinstance(matrix, StackedRows):
+            return cls(matrix.base, np.concatenate([matrix.delta, np.asarray(rows, dtype=matrix.dtype)]))
+        return cls(matrix, rows)
+
+    # ---------------------------------------------------------------------
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (self.base_rows + self.delta.shape[0],) + tuple(self.base.shape[1:])
+
+    @property
+    def ndim(self) -> int:
+        return self.base.ndim
+
+    @property
+    def dtype(self):
+        return self.base.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self.base.nbytes + self.delta.nbytes
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    # ---------------------------------------------------------------------
+    def __getitem__(self, rows) -> np.ndarray:
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.shape[0])
+            if step == 1 and stop <= self.base_rows:
+                return self.base[start:stop]
+            if step == 1 and start >= self.base_rows:
+                return self.delta[start - self.base_rows:stop - self.base_rows]
+            rows = np.arange(start, stop, step)
+
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+
+        if rows.ndim == 0:
+            row = int(rows)
+            return self.base[row] if row < self.base_rows else self.delta[row - self.base_rows]
+
+        in_base = rows < self.base_rows
+        if in_base.all():
+            return self.base[rows]
+
+        out = np.empty((rows.shape[0],) + tuple(self.base.shape[1:]), dtype=self.dtype)
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self.delta[rows[~in_base] - self.base_rows]
+        return out
+
+    def __matmul__(self, other) -> np.ndarray:
+        return np.concatenate([self.base @ other, self.delta @ other])
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        stacked = np.concatenate([np.asarray(self.base), self.delta])
+        return stacked if dtype is None else stacked.astype(dtype, copy=False)
@@ -0,0 +1,1024 @@
+#file: services/rag/vector_index.py
+# Folyamat-szintű vektorindex – az összes chunk embedding egyetlen előre
+# normalizált float32 mátrixban, mellette párhuzamos chunk-id tömb.
+# Egy keresés = egy mátrix-vektor szorzás + argpartition alapú TOP-K.
+
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from knowledge.models import KnowledgeCategory, KnowledgeChunk, KnowledgeEmbedding
+from services.ai_provider import get_embedding_model_name
+from services.embedding.vector_codec import decode_vector
+from services.rag.index_sync import CHANGE_LOG_KEEP, changed_chunk_ids, latest_generation, record_changes
+from services.rag.ivf_index import IVFIndex, DEFAULT_NLIST, DEFAULT_NPROBE
+from services.rag.mmr import DEFAULT_MMR_POOL_SIZE, mmr_select
+from services.rag.parallel_search import DEFAULT_PARALLEL_MIN_ROWS, ParallelScorer
+from services.rag.quantization import get_quantizer
+from services.rag.scatter_gather import ownership_filter
+from services.rag.stacked_rows import StackedRows
+from services.rag.vector_snapshot import get_snapshot_dir, load_snapshot
+
+
+# -------------------------------------------------------------------------
+# Segédfüggvények – normalizálás
+# -------------------------------------------------------------------------
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Soronként egységnyi hosszra normalizál (a nulla sorok nullák maradnak)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def normalize_vector(vector) -> Optional[np.ndarray]:
+    """
+    Egyetlen vektor float32 egységvektorrá alakítása.
+    None-t ad vissza, ha a vektor üres vagy nulla hosszú.
+    """
+    try:
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+    except Exception:
+        return None
+
+    norm = float(np.linalg.norm(vec)) if vec.size else 0.0
+    if norm == 0:
+        return None
+
+    return vec / norm
+
+
+# Delta-szinkron: ellenőrzési gyakoriság (mp) és a legnagyobb alkalmazott delta
+DEFAULT_SYNC_INTERVAL = 2.0
+DEFAULT_SYNC_MAX_DELTA = 5000
+
+# Tudáselem-centroidok számolása ennyi soronként
+ITEM_CENTROID_BLOCK_ROWS = 8192
+
+# search_many: egy blokkban legfeljebb ennyi (query × sor) pontszám készül
+SEARCH_MANY_BLOCK_CELLS = 16_000_000
+
+# Sorszűrő (maszk, tombstone): ha a sorok legalább ekkora hányadát engedi át,
+# a teljes mátrixot pontozzuk (egy mátrix-vektor szorzás, másolás nélkül), és a
+# kiszűrt sorok pontszáma -inf; csak ennél szűkebb maszknál gyűjtjük ki a sorokat
+DENSE_MASK_FRACTION = 0.1
+
+
+# -------------------------------------------------------------------------
+# Vektorindex
+# -------------------------------------------------------------------------
+class VectorIndex:
+    """
+    VectorIndex
+    -----------
+    Memóriában tartott, előre normalizált embedding mátrix.
+
+    - matrix:    (N, d) float32, minden sor egységvektor
+    - chunk_ids: (N,) int64, a mátrix sorainak megfelelő chunk azonosítók
+    - short_matrix: opcionális (N, m) float32 Matryoshka-előtag mátrix
+      (a tárolt short_vector oszlopból), a kétlépcsős kereséshez
+    - tombstones: opcionális (N,) bool, a delta-szinkron óta elavult
+      (törölt vagy felülírt) sorok – lásd apply_delta()
+    - model_name: az embedding modell, amelynek a vektorait tartalmazza
+      (a query vektornak ugyanebből a modellből kell jönnie)
+
+    Delta-szinkron után a matrix / short_matrix egy StackedRows nézet:
+    a változatlan alap mátrix + a hozzáfűzött új sorok (overlay).
+
+    Mivel a sorok normalizáltak, a koszinusz hasonlóság egyszerű
+    skaláris szorzat: scores = matrix @ query.
+    """
+
+    def __init__(
+        self,
+        chunk_ids: np.ndarray = None,
+        matrix: np.ndarray = None,
+        short_matrix: np.ndarray = None,
+    ):
+        if chunk_ids is None or matrix is None or len(chunk_ids) == 0:
+            chunk_ids = np.empty(0, dtype=np.int64)
+            matrix = np.empty((0, 0), dtype=np.float32)
+            short_matrix = None
+
+        self.chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.short_matrix = (
+            np.ascontiguousarray(short_matrix, dtype=np.float32)
+            if short_matrix is not None else None
+        )
+
+        # Soronkénti metaadat-oszlopok és kategória shardok – lásd load_metadata()
+        self.category_ids = np.full(len(self.chunk_ids), -1, dtype=np.int64)
+        self.item_ids = np.full(len(self.chunk_ids), -1, dtype=np.int64)
+        self.active_flags = np.ones(len(self.chunk_ids), dtype=bool)
+        self.category_names = {}
+        self.shards = {}
+
+        # Opcionális közelítő (ANN) jelöltgenerátor, pl. IVFIndex – lásd attach_ann()
+        self.ann = None
+
+        # Opcionális kvantált előszűrő réteg – lásd attach_quantizer()
+        self.quantizer = None
+        self.oversample = 1
+
+        # Opcionális többmagos pontozás (shared memory + process pool) – lásd attach_parallel()
+        self.parallel = None
+
+        # A változásnapló generációja, amelyig az index naprakész – lásd apply_delta()
+        self.generation = 0
+
+        # Az embedding modell neve – lásd from_database(), _sync_index()
+        self.model_name = ""
+
+        # Delta-szinkron: az elavult sorok jelölése (None = nincs ilyen sor)
+        self.tombstones: Optional[np.ndarray] = None
+
+        # Opcionális kétszintű keresés tudáselem-centroidokkal – lásd attach_item_centroids()
+        self.item_centroids = None
+        self.centroid_item_ids = np.empty(0, dtype=np.int64)
+        self.item_groups = []
+        self.item_top_m = 0
+
+    # ---------------------------------------------------------------------
+    @classmethod
+    def from_database(cls, chunk_ids=None, model_name: str = None) -> "VectorIndex":
+        """
+        Az index felépítése az adatbázisból.
+        Csak nyers oszlopokat kérünk le – ORM objektumok nélkül;
+        a bináris vektorok dekódolása egy-egy frombuffer hívás.
+
+        Paraméterek:
+            chunk_ids: ha megadott, csak ezeknek a chunkoknak az embeddingjei
+                       (delta-szinkron, lásd apply_delta())
+            model_name: csak ezzel a modellel készült embeddingek (alapértelmezés:
+                        az aktív modell; modellváltás közben a másik modell vektorai
+                        is az adatbázisban vannak, de más térben)
+        """
+        if model_name is None:
+            model_name = get_embedding_model_name()
+
+        rows = KnowledgeEmbedding.objects.filter(model_name=model_name)
+
+        # Sharded topológiában a nódus csak a saját tulajdonrészét tartja
+        ownership = ownership_filter()
+        if ownership is not None:
+            rows = rows.filter(ownership)
+
+        if chunk_ids is not None:
+            rows = rows.filter(chunk_id__in=list(chunk_ids))
+
+        rows = rows.values_list("chunk_id", "vector", "dtype", "short_vector")
+
+        chunk_ids = []
+        vectors = []
+        short_vectors = []
+        dim = None
+
+        for chunk_id, data, dtype, short_data in rows.iterator():
+            vector = decode_vector(data, dtype)
+            if vector.size == 0:
+                continue
+
+            if dim is None:
+                dim = vector.shape[0]
+            elif vector.shape[0] != dim:
+                print(f"[VectorIndex] Eltérő dimenzió, kihagyva: chunk #{chunk_id}")
+                continue
+
+            chunk_ids.append(chunk_id)
+            vectors.append(vector)
+            short_vectors.append(decode_vector(short_data, dtype))
+
+        if not vectors:
+            index = cls()
+            index.model_name = model_name
+            return index
+
+        matrix = normalize_rows(np.vstack(vectors))
+
+        # Rövid mátrix csak akkor, ha minden sorhoz azonos méretű előtag tartozik
+        short_matrix = None
+        short_dims = {v.shape[0] for v in short_vectors}
+        if len(short_dims) == 1 and 0 not in short_dims:
+            short_matrix = np.vstack(short_vectors)
+
+        index = cls(np.asarray(chunk_ids, dtype=np.int64), matrix, short_matrix)
+        index.model_name = model_name
+        return index
+
+    # ---------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    @property
+    def overlay_rows(self) -> int:
+        """A delta-szinkron óta az alap mátrix után fűzött sorok száma."""
+        return len(self) - self.matrix.base_rows if isinstance(self.matrix, StackedRows) else 0
+
+    def live_rows(self) -> Optional[np.ndarray]:
+        """Az élő (nem tombstone) sorok pozíciói; None, ha minden sor élő."""
+        if self.tombstones is None:
+            return None
+        return np.flatnonzero(~self.tombstones)
+
+    def _live_mask(self, mask: np.ndarray = None) -> Optional[np.ndarray]:
+        """A sorszűrő kiegészítése: a tombstone sorok sosem kerülnek a találatok közé."""
+        if self.tombstones is None:
+            return mask
+        return ~self.tombstones if mask is None else mask & ~self.tombstones
+
+    # ---------------------------------------------------------------------
+    def load_metadata(self, restrict: bool = False):
+        """
+        Soronkénti metaadat-oszlopok betöltése egyetlen, csak egész számokat/
+        logikai értékeket visszaadó lekérdezéssel:
+        - category_ids: a chunk tudáselemének kategóriája (-1 = nincs)
+        - item_ids:     a chunk tudáseleme
+        - active_flags: KnowledgeItem.is_active
+        Ezután az index kategóriánkénti shardokra oszlik (sorpozíció-tömbök).
+        A vektorokkal ellentétben ezt mindig az adatbázisból olvassuk,
+        így a snapshot nem avul el egy kategória- vagy aktivitásváltástól.
+
+        Paraméterek:
+            restrict (bool): csak az index saját chunkjaira kérdezünk
+                             (kis, delta-szinkronhoz épített indexeknél)
+        """
+        self.category_names = dict(KnowledgeCategory.objects.values_list("name", "id"))
+
+        rows = KnowledgeChunk.objects.all()
+        if restrict:
+            rows = rows.filter(id__in=self.chunk_ids.tolist())
+
+        rows = list(rows.values_list(
+            "id", "item_id", "item__category_id", "item__is_active"
+        ))
+        if not rows or len(self) == 0:
+            self.shards = {}
+            return
+
+        count = len(rows)
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=count)
+        items = np.fromiter((r[1] for r in rows), dtype=np.int64, count=count)
+        cats = np.fromiter((r[2] if r[2] is not None else -1 for r in rows), dtype=np.int64, count=count)
+        active = np.fromiter((bool(r[3]) for r in rows), dtype=bool, count=count)
+
+        # Igazítás az index soraihoz (chunk_id szerinti keresés rendezett tömbben)
+        order = np.argsort(ids)
+        pos = order[np.clip(np.searchsorted(ids[order], self.chunk_ids), 0, count - 1)]
+        found = ids[pos] == self.chunk_ids
+
+        if self.tombstones is not None:
+            found &= ~self.tombstones
+
+        self.category_ids = np.where(found, cats[pos], -1)
+        self.item_ids = np.where(found, items[pos], -1)
+        self.active_flags = found & active[pos]
+
+        self._build_shards()
+
+    # ---------------------------------------------------------------------
+    def apply_delta(self, changed_chunk_ids) -> "VectorIndex":
+        """
+        Új index a változásnapló deltájával – teljes újratöltés és a mátrix
+        másolása nélkül.
+
+        Csak az érintett chunkok embeddingjét és metaadatát olvassuk újra az
+        adatbázisból (ami már nem létezik, az törölt chunk). Az alap mátrix
+        (memory-mappelt snapshot, shared memory blokk) változatlan marad:
+        - az érintett chunkok régi sorai tombstone jelölést kapnak,
+        - az új vektorok egy kis overlay mátrixba kerülnek a sorok végére
+          (StackedRows), a kvantált kódok és az IVF listák ugyanígy bővülnek,
+        - a párhuzamos pontozó shared memory blokkja nem épül újra.
+        Az overlay teljes újratöltéskor (új snapshot / túl nagy lemaradás,
+        lásd _sync_index) olvad össze az alap mátrixszal.
+        A régi indexet nem módosítjuk, így a folyamatban lévő keresések zavartalanok.
+        """
+        changed = np.unique(np.asarray(list(changed_chunk_ids), dtype=np.int64))
+
+        fresh = VectorIndex.from_database(chunk_ids=changed.tolist(), model_name=self.model_name)
+        if len(fresh) and len(self) and fresh.dim != self.dim:
+            print(f"[VectorIndex] Eltérő dimenziójú új vektorok, kihagyva: {len(fresh)} db")
+            fresh = VectorIndex()
+        fresh.load_metadata(restrict=True)
+
+        # Üres indexre nincs mit rétegezni – a friss index önmagában teljes
+        if len(self) == 0:
+            return fresh
+
+        stale = np.isin(self.chunk_ids, changed)
+        if self.tombstones is not None:
+            stale |= self.tombstones
+
+        fresh_matrix = fresh.matrix.reshape(len(fresh), self.dim)
+        appended = np.zeros(len(fresh), dtype=bool)
+
+        index = VectorIndex()
+        index.model_name = self.model_name
+        index.chunk_ids = np.concatenate([self.chunk_ids, fresh.chunk_ids])
+        index.matrix = StackedRows.extend(self.matrix, fresh_matrix) if len(fresh) else self.matrix
+        index.tombstones = np.concatenate([stale, appended])
+
+        if self.short_matrix is not None:
+            if len(fresh) == 0:
+                index.short_matrix = self.short_matrix
+            elif fresh.short_matrix is not None and fresh.short_matrix.shape[1] == self.short_matrix.shape[1]:
+                index.short_matrix = StackedRows.extend(self.short_matrix, fresh.short_matrix)
+
+        # A tombstone sorok metaadata semleges: nincs kategóriájuk, tudáselemük,
+        # így sem a shardokba, sem a tudáselem-centroidokba nem számítanak bele
+        index.category_names = fresh.category_names or self.category_names
+        index.category_ids = np.concatenate([np.where(stale, -1, self.category_ids), fresh.category_ids])
+        index.item_ids = np.concatenate([np.where(stale, -1, self.item_ids), fresh.item_ids])
+        index.active_flags = np.concatenate([self.active_flags & ~stale, fresh.active_flags])
+        index._build_shards()
+
+        if self.ann is not None:
+            # A módosult chunkok régi besorolása elavult: kivesszük őket a
+            # listákból, az új vektoruk a legközelebbi centroidhoz sorolódik
+            ann = self.ann.copy()
+            ann.remove(changed)
+            ann.add(fresh.chunk_ids, fresh_matrix)
+            index.attach_ann(ann)
+
+        if self.quantizer is not None:
+            index.quantizer = self.quantizer.append_rows(fresh_matrix) if len(fresh) else self.quantizer
+            index.oversample = self.oversample
+
+        # A pontozó az alap mátrix blokkját tartja; az overlay sorait a kérés
+        # szála pontozza (lásd _parallel_search)
+        index.parallel = self.parallel
+
+        if self.item_centroids is not None:
+            # Csak az érintett tudáselemek centroidját számoljuk újra
+            changed_items = np.concatenate([self.item_ids[stale], fresh.item_ids])
+            index.attach_item_centroids(self.item_top_m, reuse=self, changed_items=changed_items)
+
+        return index
+
+    # ---------------------------------------------------------------------
+    def filter_mask(
+        self,
+        is_active: Optional[bool] = True,
+        category_ids=None,
+        item_ids=None,
+        exclude_item_ids=None,
+    ) -> Optional[np.ndarray]:
+        """
+        Tetszőleges szűrőkombináció (ÉS kapcsolat) logikai maszkká alakítása
+        a memóriában tartott metaadat-oszlopokon – adatbázis-lekérdezés nélkül.
+
+        Paraméterek:
+            is_active (bool | None): True = csak aktív tudáselemek (alapértelmezés),
+                                     False = csak inaktívak, None = mindegy
+            category_ids (list[int]): csak ezekből a kategóriákból
+            item_ids (list[int]): csak ezekből a tudáselemekből
+            exclude_item_ids (list[int]): ezek a tudáselemek kimaradnak
+
+        Visszatér:
+            np.ndarray[bool] vagy None, ha a szűrés semmit sem zárna ki
+        """
+        mask = None
+
+        def _and(current, condition):
+            return condition if current is None else current & condition
+
+        if is_active is True and not self.active_flags.all():
+            mask = _and(mask, self.active_flags)
+        elif is_active is False:
+            mask = _and(mask, ~self.active_flags)
+
+        if category_ids is not None:
+            mask = _and(mask, np.isin(self.category_ids, np.asarray(category_ids, dtype=np.int64)))
+
+        if item_ids is not None:
+            mask = _and(mask, np.isin(self.item_ids, np.asarray(item_ids, dtype=np.int64)))
+
+        if exclude_item_ids:
+            mask = _and(mask, ~np.isin(self.item_ids, np.asarray(exclude_item_ids, dtype=np.int64)))
+
+        return mask
+
+    def _build_shards(self):
+        """Kategóriánként a hozzá tartozó sorok pozíciói (rendezéssel, ciklus nélkül)."""
+        order = np.argsort(self.category_ids, kind="stable")
+        bounds = np.flatnonzero(np.diff(self.category_ids[order])) + 1
+
+        self.shards = {
+            int(self.category_ids[group[0]]): group
+            for group in np.split(order, bounds)
+            if group.size
+        }
+
+    def shard_rows(self, category_name: str) -> Optional[np.ndarray]:
+        """
+        Az adott kategória shardjának sorai.
+        None, ha a kategória ismeretlen; üres tömb, ha nincs beágyazott chunkja.
+        """
+        category_id = self.category_names.get(category_name)
+        if category_id is None:
+            return None
+        return self.shards.get(category_id, np.empty(0, dtype=np.int64))
+
+    # ---------------------------------------------------------------------
+    def attach_ann(self, ann):
+        """
+        Közelítő index csatolása: keresésnél csak az általa javasolt
+        sorokat pontozzuk (a pontszámok továbbra is pontos koszinuszok).
+        """
+        ann.attach(self.chunk_ids, self.matrix, rows=self.live_rows())
+        self.ann = ann
+
+    # ---------------------------------------------------------------------
+    def attach_quantizer(self, quantizer, oversample: int = 10):
+        """
+        Kvantált réteg csatolása: a jelölteket a kompakt kódokon választjuk ki
+        (top_k * oversample darab), és csak ezeket pontozzuk újra a teljes
+        vektorokkal. Memory-mappelt snapshotnál így a teljes mátrixnak csak
+        a jelöltekhez tartozó lapjai kerülnek a memóriába.
+        Ha a kvantálónak már vannak kódjai (pl. tárolt Matryoshka-előtagok),
+        nem kódolunk újra.
+        """
+        if quantizer.codes is None:
+            quantizer.encode(self.matrix)
+        self.quantizer = quantizer
+        self.oversample = max(1, int(oversample))
+
+    # ---------------------------------------------------------------------
+    def attach_parallel(self, scorer):
+        """
+        Párhuzamos pontozó csatolása (services.rag.parallel_search.ParallelScorer).
+        A mátrix innentől a shared memory blokkra mutat – nincs második példány.
+        Nagy (scorer.min_rows feletti) pásztázásoknál a shardokat a process
+        pool pontozza; kvantált shortlist esetén a pontozás a kérés szálában marad.
+        """
+        self.matrix = scorer.matrix
+        self.parallel = scorer
+
+    # ---------------------------------------------------------------------
+    def attach_item_centroids(self, top_m: int, reuse: "VectorIndex" = None, changed_items=None):
+        """
+        Kétszintű keresés bekapcsolása: tudáselemenként a chunkvektorok
+        normalizált átlaga (centroid). Keresésnél először a centroidokat
+        pontozzuk, és csak a legjobb top_m tudáselem chunkjait pontozzuk pontosan.
+
+        Paraméterek:
+            top_m (int): ennyi tudáselem chunkjai maradnak versenyben
+            reuse (VectorIndex): korábbi index – a változatlan tudáselemek
+                centroidját onnan vesszük át (delta-szinkron)
+            changed_items: az újraszámolandó tudáselemek azonosítói
+        """
+        order = np.argsort(self.item_ids, kind="stable")
+        sorted_items = self.item_ids[order]
+        bounds = np.flatnonzero(np.diff(sorted_items)) + 1
+
+        groups = [g for g in np.split(order, bounds) if g.size and self.item_ids[g[0]] >= 0]
+        item_ids = np.asarray([self.item_ids[g[0]] for g in groups], dtype=np.int64)
+        sizes = np.asarray([g.size for g in groups], dtype=np.int64)
+
+        centroids = np.zeros((len(groups), self.dim), dtype=np.float32)
+        compute = np.ones(len(groups), dtype=bool)
+
+        if reuse is not None and reuse.item_centroids is not None and len(reuse.centroid_item_ids):
+            prev_ids = reuse.centroid_item_ids
+            pos = np.clip(np.searchsorted(prev_ids, item_ids), 0, len(prev_ids) - 1)
+            found = prev_ids[pos] == item_ids
+            if changed_items is not None:
+                found &= ~np.isin(item_ids, np.asarray(changed_items, dtype=np.int64))
+            centroids[found] = reuse.item_centroids[pos[found]]
+            compute = ~found
+
+        if compute.any() and groups:
+            rows = np.concatenate([g for g, c in zip(groups, compute) if c])
+            targets = np.repeat(np.flatnonzero(compute), sizes[compute])
+
+            # Blokkonkénti összegzés – a memmap mátrixból sem kell teljes másolat
+            for start in range(0, rows.shape[0], ITEM_CENTROID_BLOCK_ROWS):
+                end = start + ITEM_CENTROID_BLOCK_ROWS
+                np.add.at(centroids, targets[start:end], self.matrix[rows[start:end]])
+
+            centroids[compute] = normalize_rows(centroids[compute])
+
+        self.item_centroids = centroids
+        self.centroid_item_ids = item_ids
+        self.item_groups = groups
+        self.item_top_m = max(1, int(top_m))
+
+    def _item_rows(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """
+        A legjobb item_top_m tudáselem chunkjainak sorai.
+        Szűkített jelöltkészletnél (shard, maszk, ANN) csak az abban szereplő
+        tudáselemek versenyeznek, és csak a készlet sorai maradnak.
+        """
+        scores = self.item_centroids @ query
+
+        if rows is not None:
+            if rows.size == 0:
+                return rows
+            allowed = np.isin(self.centroid_item_ids, self.item_ids[rows])
+            scores = np.where(allowed, scores, -np.inf)
+            available = int(allowed.sum())
+        else:
+            available = scores.shape[0]
+
+        m = min(self.item_top_m, available)
+        if m <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        top = np.argpartition(-scores, m - 1)[:m]
+        selected = np.concatenate([self.item_groups[i] for i in top])
+
+        if rows is not None:
+            selected = selected[np.isin(selected, rows)]
+        return selected
+
+    # ---------------------------------------------------------------------
+    def _dense_mask(self, mask: Optional[np.ndarray]) -> bool:
+        """A maszk a sorok nagy részét átengedi → teljes pontozás + -inf a kiszűrt sorokra."""
+        return mask is not None and np.count_nonzero(mask) >= DENSE_MASK_FRACTION * len(self)
+
+    def _candidate_rows(
+        self,
+        query: np.ndarray,
+        mask: np.ndarray = None,
+        rows: np.ndarray = None,
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        A pontozandó sorok: (rows, mask).
+        - shard (rows) megadásakor csak annak sorai – a shard már eleve kicsi,
+          ezért ANN nélkül, pontosan pásztázzuk
+        - ANN esetén a próbált klaszterek sorai, a maszkkal tovább szűrve
+        - tudáselem-centroidok esetén ezekből csak a legjobb M tudáselem sorai
+        - csak maszk esetén: sűrű maszknál rows = None, és a maszk a teljes
+          pontszámvektorra vonatkozik (lásd DENSE_MASK_FRACTION); ritkánál a sorai
+        A tombstone sorok mindig kiesnek. A visszaadott maszk nem None, ha a
+        teljes mátrixot kell pontozni, de nem minden sor jelölt.
+        """
+        mask = self._live_mask(mask)
+
+        if rows is not None:
+            rows = rows[mask[rows]] if mask is not None else rows
+        elif self.ann is not None:
+            rows = self.ann.probe(query)
+            rows = rows[mask[rows]] if mask is not None else rows
+        elif mask is not None:
+            if self.item_centroids is None and self._dense_mask(mask):
+                return None, mask
+            rows = np.flatnonzero(mask)
+
+        if self.item_centroids is not None:
+            rows = self._item_rows(query, rows)
+
+        return rows, None
+
+    # ---------------------------------------------------------------------
+    def _search_rows(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        mask: np.ndarray = None,
+        rows: np.ndarray = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        TOP-K sorpozíciók és pontszámok (normalizált query-re), csökkenő sorrendben.
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+
+        rows, mask = self._candidate_rows(query, mask, rows)
+
+        # A kvantált előszűrő és a párhuzamos pontozó sorlistát kap
+        if mask is not None and (self.quantizer is not None or self.parallel is not None):
+            rows, mask = np.flatnonzero(mask), None
+
+        # Kvantált előszűrés: csak a shortlist kerül pontos újrapontozásra
+        if self.quantizer is not None and (rows is None or rows.size > 0):
+            rows = self.quantizer.shortlist(query, rows, top_k * self.oversample)
+
+        # Többmagos pontozás – csak ha elég sok sort kell pásztázni
+        elif self.parallel is not None:
+            count = len(self) if rows is None else rows.size
+            if count >= self.parallel.min_rows:
+                return self._parallel_search(query, top_k, rows)
+
+        if rows is not None:
+            if rows.size == 0:
+                return empty
+            scores = self.matrix[rows] @ query
+            k = min(top_k, scores.shape[0])
+        else:
+            # Teljes mátrix-vektor szorzás; a maszk a pontszámokon érvényesül
+            scores = self.matrix @ query
+            k = min(top_k, scores.shape[0])
+            if mask is not None:
+                scores[~mask] = -np.inf
+                k = min(k, int(np.count_nonzero(mask)))
+                if k == 0:
+                    return empty
+
+        # Részleges rendezés: csak a TOP-K elemet rendezzük teljesen
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        positions = rows[top] if rows is not None else top
+        return positions, scores[top]
+
+    def _parallel_search(self, query: np.ndarray, top_k: int, rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Az alap mátrix sorai a process poolban, a delta-szinkron overlay sorai
+        (a shared memory blokkon túliak) a kérés szálában; a két TOP-K összefésülve.
+        """
+        base_rows = self.parallel.shape[0]
+        if rows is None:
+            if len(self) == base_rows:
+                return self.parallel.search(query, top_k)
+            base_part, overlay = None, np.arange(base_rows, len(self))
+        else:
+            base_part, overlay = rows[rows < base_rows], rows[rows >= base_rows]
+
+        positions, scores = self.parallel.search(query, top_k, base_part)
+        if overlay.size == 0:
+            return positions, scores
+
+        positions = np.concatenate([positions, overlay])
+        scores = np.concatenate([scores, self.matrix[overlay] @ query])
+
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return positions[top], scores[top]
+
+    # ---------------------------------------------------------------------
+    def search(
+        self,
+        query_vector,
+        top_k: int,
+        mask: np.ndarray = None,
+        rows: np.ndarray = None,
+        mmr_lambda: float = None,
+        mmr_pool_size: int = DEFAULT_MMR_POOL_SIZE,
+    ) -> List[Tuple[int, float]]:
+        """
+        TOP-K keresés egyetlen mátrix-vektor szorzással.
+
+        Paraméterek:
+            query_vector: a kérdés embeddingje (nem kell normalizálni)
+            top_k (int): visszaadott találatok maximális száma
+            mask (np.ndarray[bool]): opcionális sorszűrő (True = keresendő)
+            rows (np.ndarray[int]): opcionális shard – csak ezeket a sorokat pásztázzuk
+            mmr_lambda (float): ha megadott, MMR diverzifikálás a legjobb
+                mmr_pool_size jelöltből (lásd services.rag.mmr)
+            mmr_pool_size (int): MMR jelöltkészlet mérete
+
+        Visszatér:
+            List[(chunk_id, similarity)] – csökkenő hasonlóság szerint,
+            MMR esetén kiválasztási sorrendben
+        """
+        if len(self) == 0 or top_k <= 0:
+            return []
+
+        query = normalize_vector(query_vector)
+        if query is None:
+            return []
+        if query.shape[0] != self.dim:
+            print(f"[VectorIndex] A query dimenziója ({query.shape[0]}) eltér az indexétől ({self.dim}), nincs találat.")
+            return []
+
+        if mmr_lambda is None:
+            positions, scores = self._search_rows(query, top_k, mask, rows)
+        else:
+            positions, scores = self._search_rows(query, max(top_k, mmr_pool_size), mask, rows)
+            order = mmr_select(self.matrix[positions], scores, top_k, mmr_lambda)
+            positions, scores = positions[order], scores[order]
+
+        return [
+            (int(chunk_id), float(score))
+            for chunk_id, score in zip(self.chunk_ids[positions], scores)
+        ]
+
+    # ---------------------------------------------------------------------
+    def search_many(
+        self,
+        query_vectors,
+        top_k: int,
+        mask: np.ndarray = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Több query egyidejű, pontos keresése egyetlen mátrix-mátrix szorzással
+        (query blokkonként, hogy a (q, N) pontszám-mátrix kordában maradjon).
+
+        Paraméterek:
+            query_vectors: (q, d) query embeddingek (None / üres sor megengedett)
+            top_k (int): query-nként visszaadott találatok száma
+            mask (np.ndarray[bool]): opcionális sorszűrő
+
+        Visszatér:
+            query-nként List[(chunk_id, similarity)], a bemenet sorrendjében
+        """
+        results: List[List[Tuple[int, float]]] = [[] for _ in query_vectors]
+        if len(self) == 0 or top_k <= 0:
+            return results
+
+        # Érvényes (nem üres, egyező dimenziójú) query-k normalizálása
+        valid = []
+        normalized = []
+        for pos, vector in enumerate(query_vectors):
+            query = normalize_vector(vector) if vector is not None else None
+            if query is not None and query.shape[0] == self.dim:
+                valid.append(pos)
+                normalized.append(query)
+
+        if not valid:
+            return results
+
+        # Sűrű maszk: teljes pontozás, a kiszűrt sorok -inf; ritka maszk: a sorai
+        mask = self._live_mask(mask)
+        rows = None
+        if mask is not None and not self._dense_mask(mask):
+            rows, mask = np.flatnonzero(mask), None
+
+        live = int(np.count_nonzero(mask)) if mask is not None else len(self)
+        if (rows is not None and rows.size == 0) or live == 0:
+            return results
+
+        matrix = self.matrix[rows] if rows is not None else self.matrix
+        queries = np.vstack(normalized)
+        k = min(top_k, matrix.shape[0], live)
+
+        block = max(1, SEARCH_MANY_BLOCK_CELLS // max(matrix.shape[0], 1))
+        for start in range(0, len(valid), block):
+            # (N, b) szorzat transzponálva – overlay (StackedRows) mátrixszal is működik
+            scores = (matrix @ queries[start:start + block].T).T
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            positions = rows[top] if rows is not None else top
+            chunk_ids = self.chunk_ids[positions]
+
+            for offset in range(top.shape[0]):
+                results[valid[start + offset]] = list(zip(
+                    chunk_ids[offset].tolist(), top_scores[offset].tolist()
+                ))
+
+        return results
+
+
+# -------------------------------------------------------------------------
+# Folyamat-szintű példány – egyszer töltjük be, utána újrahasznosítjuk
+# -------------------------------------------------------------------------
+_index: Optional[VectorIndex] = None
+_index_lock = threading.Lock()
+
+# Az utolsó változásnapló-ellenőrzés ideje (time.monotonic())
+_index_checked_at = 0.0
+
+
+def get_vector_index() -> VectorIndex:
+    """
+    A folyamat közös vektorindexét adja vissza.
+    Első híváskor (vagy invalidálás után) snapshotból vagy adatbázisból töltjük be.
+    Legfeljebb RAG_SETTINGS["sync_interval"] másodpercenként megnézzük a
+    változásnaplót, és a más workerekben történt írások deltáját alkalmazzuk.
+    """
+    global _index, _index_checked_at
+
+    interval = getattr(settings, "RAG_SETTINGS", {}).get("sync_interval", DEFAULT_SYNC_INTERVAL)
+
+    # Modellváltás (pl. új helyi modellfájl) után a query vektorok már az új
+    # modellből jönnek – a régi modell indexe ekkor nem használható tovább
+    model_name = get_embedding_model_name()
+
+    index = _index
+    if index is not None and index.model_name == model_name and time.monotonic() - _index_checked_at < interval:
+        return index
+
+    with _index_lock:
+        if _index is None:
+            _index = _load_index()
+        elif _index.model_name != model_name or time.monotonic() - _index_checked_at >= interval:
+            _index = _sync_index(_index)
+        _index_checked_at = time.monotonic()
+        return _index
+
+
+def _sync_index(index: VectorIndex) -> VectorIndex:
+    """
+    Delta-szinkron a változásnapló alapján (egy olcsó MAX(id) lekérdezés,
+    ha nincs változás). Túl nagy lemaradásnál – vagy ha az overlay sorok
+    száma eléri a delta-korlátot – teljes újratöltés, ami az overlay-t az
+    alap mátrixba olvasztja.
+    A generáció-kurzor feltételezéseit lásd: services.rag.index_sync.
+    Ha közben megváltozott az aktív embedding modell, szintén teljes újratöltés.
+    """
+    try:
+        if index.model_name != get_embedding_model_name():
+            print("[VectorIndex] Az aktív embedding modell megváltozott, teljes újratöltés.")
+            return _load_index()
+
+        latest = latest_generation()
+        if latest <= index.generation:
+            return index
+
+        max_delta = getattr(settings, "RAG_SETTINGS", {}).get("sync_max_delta", DEFAULT_SYNC_MAX_DELTA)
+        if latest - index.generation > max_delta or index.overlay_rows > max_delta:
+            return _load_index()
+
+        updated = index.apply_delta(changed_chunk_ids(index.generation, latest))
+        if len(index) == 0 and len(updated):
+            # Üres indexből indulva a konfigurált rétegek még nincsenek csatolva
+            _attach_configured_layers(updated)
+        updated.generation = latest
+        return updated
+    except Exception as e:
+        print(f"[VectorIndex] Hiba a delta-szinkron közben, teljes újratöltés: {e}")
+        return _load_index()
+
+
+def _load_index() -> VectorIndex:
+    """
+    Index betöltése: elsőként a memory-mappelt snapshotból (nincs
+    adatbázis-dekódolás, a lapokat a workerek megosztják), amelyre a
+    snapshot generációja óta naplózott változásokat alkalmazzuk;
+    ha nincs snapshot, vagy túl régi a naplóhoz képest, akkor az adatbázisból.
+    A generációt a vektorok olvasása előtt rögzítjük: a betöltés közbeni
+    írásokat a következő delta-szinkron (idempotensen) újra alkalmazza.
+    """
+    generation = latest_generation()
+    model_name = get_embedding_model_name()
+
+    # A snapshot a teljes tudásbázist tartalmazza – tulajdonrésszel rendelkező
+    # keresőnódus mindig az adatbázisból, szűrten tölt
+    index = None
+    if ownership_filter() is None:
+        index = _load_snapshot_index(generation, model_name)
+
+    if index is None:
+        index = VectorIndex.from_database(model_name=model_name)
+        index.load_metadata()
+
+    _attach_configured_layers(index)
+    index.generation = generation
+    return index
+
+
+def _load_snapshot_index(generation: int, model_name: str) -> Optional[VectorIndex]:
+    """
+    Snapshot + a (snapshot generációja, generation] közötti változások.
+    None, ha nincs snapshot, más modell vektoraiból készült, vagy a lemaradása
+    nagyobb a delta-korlátnál (illetve a napló már nem tartalmazza a teljes különbséget).
+    """
+    snapshot = load_snapshot(model_name)
+    if snapshot is None:
+        return None
+
+    chunk_ids, matrix, short_matrix, snapshot_generation = snapshot
+
+    max_delta = getattr(settings, "RAG_SETTINGS", {}).get("sync_max_delta", DEFAULT_SYNC_MAX_DELTA)
+    if generation - snapshot_generation > min(max_delta, CHANGE_LOG_KEEP):
+        print(
+            f"[VectorIndex] A snapshot túl régi ({generation - snapshot_generation} "
+            f"naplózott változás), betöltés az adatbázisból."
+        )
+        return None
+
+    index = VectorIndex(chunk_ids, matrix, short_matrix)
+    index.model_name = model_name
+    index.load_metadata()
+
+    if generation > snapshot_generation:
+        index = index.apply_delta(changed_chunk_ids(snapshot_generation, generation))
+
+    return index
+
+
+def _attach_configured_layers(index: VectorIndex):
+    """A beállított ANN, kvantáló és párhuzamos pontozó rétegek csatolása."""
+    _attach_configured_ann(index)
+    _attach_configured_quantizer(index)
+    _attach_configured_parallel(index)
+    _attach_configured_item_centroids(index)
+
+
+def _attach_configured_item_centroids(index: VectorIndex):
+    """
+    Kétszintű (tudáselem → chunk) keresés a RAG_SETTINGS["item_top_m"] alapján
+    (0 = kikapcsolva).
+    """
+    top_m = int(getattr(settings, "RAG_SETTINGS", {}).get("item_top_m", 0) or 0)
+    if top_m <= 0 or len(index) == 0:
+        return
+
+    index.attach_item_centroids(top_m)
+
+
+def _attach_configured_ann(index: VectorIndex):
+    """
+    Közelítő keresés bekapcsolása a RAG_SETTINGS["ann_backend"] alapján.
+    A mentett IVF indexet (manage.py build_ann_index) újratanítás nélkül
+    csatoljuk: az azóta beágyazott chunkok csak besorolódnak a klaszterekbe.
+    """
+    rag_settings = getattr(settings, "RAG_SETTINGS", {})
+    if rag_settings.get("ann_backend", "exact") != "ivf" or len(index) == 0:
+        return
+
+    nprobe = rag_settings.get("ivf_nprobe", DEFAULT_NPROBE)
+
+    ann = IVFIndex.load(get_ivf_path(), nprobe=nprobe)
+    if ann is None or ann.centroids.shape[1] != index.dim or ann.model_name != index.model_name:
+        # Snapshot + delta után csak az élő sorokon tanítunk
+        rows = index.live_rows()
+        ann = IVFIndex.train(
+            index.chunk_ids if rows is None else index.chunk_ids[rows],
+            index.matrix if rows is None else index.matrix[rows],
+            nlist=rag_settings.get("ivf_nlist", DEFAULT_NLIST),
+            nprobe=nprobe,
+            model_name=index.model_name,
+        )
+
+    index.attach_ann(ann)
+
+
+def _attach_configured_quantizer(index: VectorIndex):
+    """
+    Kvantált előszűrő réteg a RAG_SETTINGS["quantization"] alapján
+    ("none", "int8", "binary" vagy "matryoshka"), RAG_SETTINGS["oversample"] szorzóval.
+    Matryoshka módban a tárolt előtag-vektorokat használjuk, ha a méretük egyezik.
+    """
+    rag_settings = getattr(settings, "RAG_SETTINGS", {})
+    quantizer = get_quantizer(
+        rag_settings.get("quantization", "none"),
+        short_dimensions=getattr(settings, "EMBEDDING_SHORT_DIMENSIONS", 256),
+    )
+    if quantizer is None or len(index) == 0:
+        return
+
+    if (
+        quantizer.name == "matryoshka"
+        and index.short_matrix is not None
+        and index.short_matrix.shape[1] == quantizer.dimensions
+    ):
+        quantizer.codes = index.short_matrix
+
+    index.attach_quantizer(quantizer, oversample=rag_settings.get("oversample", 10))
+
+
+def _attach_configured_parallel(index: VectorIndex):
+    """
+    Többmagos pontozás a RAG_SETTINGS["parallel_workers"] alapján (0 = kikapcsolva).
+    A process pool tartós, indexcserénél csak a shared memory blokk cserélődik.
+    """
+    rag_settings = getattr(settings, "RAG_SETTINGS", {})
+    workers = int(rag_settings.get("parallel_workers", 0) or 0)
+    if workers <= 0 or len(index) == 0:
+        return
+
+    index.attach_parallel(ParallelScorer(
+        index.matrix,
+        workers=workers,
+        shard_count=rag_settings.get("parallel_shards") or workers,
+        min_rows=rag_settings.get("parallel_min_rows", DEFAULT_PARALLEL_MIN_ROWS),
+    ))
+
+
+def get_ivf_path() -> Path:
+    """A mentett IVF index helye (alapértelmezés: a snapshot könyvtárban)."""
+    rag_settings = getattr(settings, "RAG_SETTINGS", {})
+    return Path(rag_settings.get("ivf_path") or get_snapshot_dir() / "ivf_index.npz")
+
+
+def notify_index_changes(added=(), removed=(), updated=()):
+    """
+    Chunk-változások naplózása a tudásbázis signaljaiból.
+    A többi worker a következő ellenőrzéskor (sync_interval) látja a deltát,
+    a saját folyamat már a következő keresésnél.
+    """
+    global _index_checked_at
+
+    if not (added or removed or updated):
+        return
+
+    record_changes(added=added, removed=removed, updated=updated)
+    _index_checked_at = 0.0
+
+
+def invalidate_vector_index():
+    """
+    A folyamat indexének eldobása – a következő keresés teljesen újratölti.
+    Tömeges műveletek (pl. management parancsok) után hasznos; az egyedi
+    chunk-változásokat a signalok a notify_index_changes()-szel naplózzák.
+    """
+    global _index
+
+    with _index_lock:
+        _index = None
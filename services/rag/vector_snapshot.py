@@ -0,0 +1,158 @@
+#file: services/rag/vector_snapshot.py
+# Vektorindex snapshot – .npy mátrix + chunk-id oldalfájl a lemezen.
+# A workerek np.memmap-pel (np.load(mmap_mode="r")) nyitják meg, így az összes
+# folyamat ugyanazt az operációs rendszer által gyorsítótárazott példányt használja.
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+
+# -------------------------------------------------------------------------
+# Fájlnevek
+# -------------------------------------------------------------------------
+CURRENT_FILE = "CURRENT"
+VECTORS_FILE = "vectors.npy"
+CHUNK_IDS_FILE = "chunk_ids.npy"
+SHORT_VECTORS_FILE = "short_vectors.npy"
+META_FILE = "meta.json"
+
+# Ennyi régebbi snapshot könyvtárat tartunk meg (a még futó workerek miatt)
+KEEP_SNAPSHOTS = 2
+
+
+def get_snapshot_dir() -> Path:
+    """A snapshotok gyökérkönyvtára (settings.VECTOR_SNAPSHOT_DIR)."""
+    return Path(getattr(settings, "VECTOR_SNAPSHOT_DIR", settings.BASE_DIR / "vector_snapshot"))
+
+
+# -------------------------------------------------------------------------
+# Snapshot írás
+# -------------------------------------------------------------------------
+def write_snapshot(
+    chunk_ids: np.ndarray,
+    matrix: np.ndarray,
+    generation: int,
+    short_matrix: np.ndarray = None,
+    model_name: str = "",
+) -> Path:
+    """
+    Snapshot írása egy új, időbélyeges könyvtárba, majd a CURRENT mutató
+    atomikus átállítása. A régi fájlokat olvasó workerek zavartalanul futnak tovább.
+    A Matryoshka-előtag mátrix (ha van) külön fájlba kerül.
+
+    A generation a változásnapló (services.rag.index_sync) azon generációja,
+    amelyet a vektorok olvasása ELŐTT rögzítettünk: betöltéskor csak az ezutáni
+    változásokat kell a snapshotra alkalmazni. A model_name a vektorok embedding
+    modellje: modellváltás után a régi snapshotot a workerek nem töltik be.
+
+    Visszatér:
+        Path: az új snapshot könyvtár
+    """
+    root = get_snapshot_dir()
+    root.mkdir(parents=True, exist_ok=True)
+
+    name = f"snapshot_{time.time_ns()}_{os.getpid()}"
+    target = root / name
+    target.mkdir()
+
+    np.save(target / VECTORS_FILE, np.ascontiguousarray(matrix, dtype=np.float32))
+    np.save(target / CHUNK_IDS_FILE, np.asarray(chunk_ids, dtype=np.int64))
+
+    if short_matrix is not None:
+        np.save(target / SHORT_VECTORS_FILE, np.ascontiguousarray(short_matrix, dtype=np.float32))
+
+    meta = {
+        "count": int(len(chunk_ids)),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "generation": int(generation),
+        "model_name": model_name,
+        "created_at": time.time(),
+    }
+    (target / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+
+    # CURRENT mutató atomikus cseréje
+    tmp_pointer = root / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+    tmp_pointer.write_text(name, encoding="utf-8")
+    os.replace(tmp_pointer, root / CURRENT_FILE)
+
+    _cleanup_old_snapshots(root, keep=name)
+
+    return target
+
+
+def _cleanup_old_snapshots(root: Path, keep: str):
+    """A legutóbbi KEEP_SNAPSHOTS snapshoton kívül mindent törlünk."""
+    snapshots = sorted(
+        (p for p in root.iterdir() if p.is_dir() and p.name.startswith("snapshot_")),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+
+    for path in snapshots[KEEP_SNAPSHOTS:]:
+        if path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# -------------------------------------------------------------------------
+# Snapshot olvasás
+# -------------------------------------------------------------------------
+def load_snapshot(model_name: str = None) -> Optional[Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], int]]:
+    """
+    Az aktuális snapshot megnyitása memory-mappinggel.
+    Az azóta történt írásokat nem itt vetjük el: a hívó a visszaadott
+    generáció utáni változásnaplót alkalmazza rá (lásd vector_index._load_index).
+
+    Paraméterek:
+        model_name: ha megadott, csak ezzel az embedding modellel készült
+                    snapshotot töltünk be (modellnév nélküli régi snapshotot sem)
+
+    Visszatér:
+        (chunk_ids, matrix, short_matrix, generation) – a mátrixok írásvédett
+        np.memmap-ek (short_matrix None, ha nincs), vagy None, ha nincs
+        használható snapshot (generáció nélküli, régi formátumú snapshot sem).
+    """
+    root = get_snapshot_dir()
+    pointer = root / CURRENT_FILE
+
+    try:
+        target = root / pointer.read_text(encoding="utf-8").strip()
+        meta = json.loads((target / META_FILE).read_text(encoding="utf-8"))
+
+        generation = meta.get("generation")
+        if generation is None:
+            print("[VectorSnapshot] A snapshotban nincs változásnapló-generáció, kihagyva (build_vector_snapshot).")
+            return None
+
+        if model_name is not None and meta.get("model_name") != model_name:
+            print(
+                f"[VectorSnapshot] A snapshot más embedding modellhez tartozik "
+                f"({meta.get('model_name') or '?'}), kihagyva (build_vector_snapshot)."
+            )
+            return None
+
+        matrix = np.load(target / VECTORS_FILE, mmap_mode="r")
+        chunk_ids = np.load(target / CHUNK_IDS_FILE)
+
+        short_path = target / SHORT_VECTORS_FILE
+        short_matrix = np.load(short_path, mmap_mode="r") if short_path.exists() else None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[VectorSnapshot] Hiba a snapshot betöltésekor: {e}")
+        return None
+
+    if matrix.ndim != 2 or matrix.shape[0] != chunk_ids.shape[0]:
+        print("[VectorSnapshot] Sérült snapshot (eltérő méretek), kihagyva.")
+        return None
+
+    if short_matrix is not None and short_matrix.shape[0] != chunk_ids.shape[0]:
+        short_matrix = None
+
+    return chunk_ids, matrix, short_matrix, int(generation)